@@ -80,6 +80,10 @@ async def jwt_auth_middleware(request: Request):
     if not settings.JWT_AUTH_ENABLED:
         return True
         
+    # 上传预检中间件已在读取请求体之前完成验证
+    if getattr(request.state, "jwt_verified", False):
+        return True
+        
     # 从请求头中获取认证信息
     auth_header = request.headers.get("Authorization")
     if not auth_header:
@@ -92,6 +96,7 @@ async def jwt_auth_middleware(request: Request):
         
         auth = HTTPAuthorizationCredentials(scheme=scheme, credentials=credentials)
         await verify_jwt(request, auth)
+        request.state.jwt_verified = True
         
     except ValueError:
         raise HTTPException(status_code=401, detail="无效的认证格式") 
\ No newline at end of file
@@ -39,6 +39,22 @@ class Settings():
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_DB_CELERY: int = int(os.getenv("REDIS_DB_CELERY", "1")) # celery使用
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD", None)
+    REDIS_CODEC: str = os.getenv("REDIS_CODEC", "msgpack").lower()  # msgpack 或 json，未安装msgpack时使用json
+    REDIS_COMPRESSION: str = os.getenv("REDIS_COMPRESSION", "zstd").lower()  # zstd、zlib 或 none，未安装zstandard时使用zlib
+    REDIS_COMPRESS_THRESHOLD: int = int(os.getenv("REDIS_COMPRESS_THRESHOLD", "1024"))  # 编码后超过该字节数时压缩
+    REDIS_ASYNC_MAX_CONNECTIONS: int = int(os.getenv("REDIS_ASYNC_MAX_CONNECTIONS", "64"))  # API进程异步连接池上限（每个uvicorn worker）
+    REDIS_ASYNC_POOL_TIMEOUT: int = int(os.getenv("REDIS_ASYNC_POOL_TIMEOUT", "5"))  # 等待空闲连接的超时，单位：秒
+    TASK_STORE_BACKEND: str = os.getenv("TASK_STORE_BACKEND", "redis").lower()  # redis；memory 只用于单进程基准测试
+    TASK_LAZY_UPGRADE: bool = os.getenv("TASK_LAZY_UPGRADE", "True").lower() in ("true", "1", "t")  # 读取到旧格式版本的任务记录时写回升级结果
+    STORE_METRICS_FLUSH_SECONDS: int = int(os.getenv("STORE_METRICS_FLUSH_SECONDS", "30"))  # 存储延迟统计汇总到Redis的间隔，0表示不汇总
+
+    # 任务状态缓存和流式推送设置（API进程内，通过Redis发布订阅失效和唤醒）
+    TASK_STATUS_CACHE_ENABLED: bool = os.getenv("TASK_STATUS_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    TASK_STATUS_CACHE_TTL: float = float(os.getenv("TASK_STATUS_CACHE_TTL", "2"))  # 条目最长保留时间，单位：秒
+    TASK_STATUS_CACHE_SIZE: int = int(os.getenv("TASK_STATUS_CACHE_SIZE", "10000"))  # 每个API进程最多缓存的任务数
+    TASK_STREAM_MAX_CONNECTIONS: int = int(os.getenv("TASK_STREAM_MAX_CONNECTIONS", "1000"))  # 每个API进程最多的SSE/WebSocket连接数
+    TASK_STATUS_LONG_POLL_MAX_WAIT: float = float(os.getenv("TASK_STATUS_LONG_POLL_MAX_WAIT", "30"))  # get_task_status 的 wait 参数上限，单位：秒
+    TASK_STREAM_KEEPALIVE_SECONDS: float = float(os.getenv("TASK_STREAM_KEEPALIVE_SECONDS", "15"))  # 没有变化时发送心跳的间隔，单位：秒
     
     # MQTT设置
     MQTT_CLIENT_ID: str = os.getenv("MQTT_CLIENT_ID", "asr_service_111")
@@ -53,6 +69,8 @@ class Settings():
     TRANSCRIPTION_DIR: str = os.getenv("TRANSCRIPTION_DIR", "./transcriptions")
     MAX_UPLOAD_SIZE_MB: int = int(os.getenv("MAX_UPLOAD_SIZE_MB", "250"))  # 默认250MB
     MIN_UPLOAD_SIZE_BYTES: int = int(os.getenv("MIN_UPLOAD_SIZE_BYTES", "1024"))  # 默认最小1KB
+    UPLOAD_SESSION_TTL: int = int(os.getenv("UPLOAD_SESSION_TTL", "86400"))  # 断点续传会话有效期，单位：秒
+    UPLOAD_CHUNK_LOCK_TIMEOUT: int = int(os.getenv("UPLOAD_CHUNK_LOCK_TIMEOUT", "600"))  # 上传锁超时，接收数据期间自动续期，单位：秒
     
     # 用户限制设置 - 仅保留用于控制u_id限额的设置
     DEFAULT_USER_LIMIT_COUNT: int = int(os.getenv("DEFAULT_USER_LIMIT_COUNT", "10"))
@@ -73,6 +91,7 @@ class Settings():
     
     # Webhook设置
     WEBHOOK_TRANSCRIPTION_URL: str = os.getenv("WEBHOOK_TRANSCRIPTION_URL", "http://123.57.134.165/api/v1/webhook/transcription")
+    WEBHOOK_BATCH_URL: str = os.getenv("WEBHOOK_BATCH_URL", WEBHOOK_TRANSCRIPTION_URL)  # 批次完成汇总通知地址
     WEBHOOK_TIMEOUT: int = int(os.getenv("WEBHOOK_TIMEOUT", "10"))  # 默认10秒超时
 
     # Celery设置
@@ -80,13 +99,46 @@ class Settings():
     CELERY_TASK_TIME_LIMIT: int = int(os.getenv("CELERY_TASK_TIME_LIMIT", "3600"))
     CELERY_WORKER_MAX_TASKS_PER_CHILD: int = int(os.getenv("CELERY_WORKER_MAX_TASKS_PER_CHILD", "50"))
 
+    # 音频预处理设置（CPU队列中预解码为16kHz PCM，需要启动 celery_preprocess_worker.py）
+    AUDIO_PREPROCESS_ENABLED: bool = os.getenv("AUDIO_PREPROCESS_ENABLED", "False").lower() in ("true", "1", "t")  # 开启前先部署预处理Worker，否则任务会一直排队
+    PREPROCESS_QUEUE: str = os.getenv("PREPROCESS_QUEUE", "preprocess")
+    PREPROCESS_WORKER_CONCURRENCY: int = int(os.getenv("PREPROCESS_WORKER_CONCURRENCY", str(os.cpu_count() or 2)))
+    ECM_STORAGE_FORMAT: str = os.getenv("ECM_STORAGE_FORMAT", "ecm").lower()  # ecm: 保留原始文件；ogg: 上传时封装为Ogg/Opus（不解码）
+    ECM_DECODE_WORKERS: int = int(os.getenv("ECM_DECODE_WORKERS", "2"))  # ECM解码进程池大小（API进程或预处理Worker），也是长录音的分段数
+    ECM_PARALLEL_MIN_FRAMES: int = int(os.getenv("ECM_PARALLEL_MIN_FRAMES", "15000"))  # 超过该帧数（默认5分钟）时分段并行解码
+    ECM_DECODE_WARMUP_FRAMES: int = int(os.getenv("ECM_DECODE_WARMUP_FRAMES", "50"))  # 每段开头用于预热解码器状态的重叠帧数
+
     WHISPER_MODEL_NAME= "base" if DEBUG else os.getenv("WHISPER_MODEL_NAME", "large-v3-turbo")
 
     CLEAN_FILE_TIMEOUT= int(os.getenv("CLEAN_FILE_TIMEOUT", "12"))
+    CLEANUP_INTERVAL_SECONDS: int = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "3600"))  # 定期清理任务的执行间隔
+
+    # 任务记录保留设置（结束的任务记录按保留时间过期，与文件清理对齐）
+    TASK_RECORD_TTL_HOURS: int = int(os.getenv("TASK_RECORD_TTL_HOURS", str(CLEAN_FILE_TIMEOUT)))  # 0表示不过期
+    TASK_ARCHIVE_ENABLED: bool = os.getenv("TASK_ARCHIVE_ENABLED", "False").lower() in ("true", "1", "t")
+    TASK_ARCHIVE_DIR: str = os.getenv("TASK_ARCHIVE_DIR", "archive")  # 过期任务摘要的JSONL归档目录
+
+    # 结果缓存设置（相同内容+相同转写参数复用已有结果）
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    RESULT_CACHE_TTL_HOURS: int = int(os.getenv("RESULT_CACHE_TTL_HOURS", str(CLEAN_FILE_TIMEOUT)))  # 不应超过结果文件保留时间
+
+    # 准入控制设置（按积压音频时长和worker处理能力估计排队时间，超过上限时拒绝上传）
+    ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "True").lower() in ("true", "1", "t")
+    ADMISSION_MAX_WAIT_SECONDS: int = int(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "1800"))  # 预计排队时间上限
+    ADMISSION_DEFAULT_RTF: float = float(os.getenv("ADMISSION_DEFAULT_RTF", "0.1"))  # 还没有完成记录时假定的实时率
+    ADMISSION_RTF_ALPHA: float = float(os.getenv("ADMISSION_RTF_ALPHA", "0.2"))  # 实时率指数加权平均的平滑系数
+    ADMISSION_DEFAULT_AUDIO_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_AUDIO_SECONDS", "600"))  # 无法得知时长时的估计值
+    ADMISSION_RESERVATION_MAX_AGE_SECONDS: int = int(os.getenv("ADMISSION_RESERVATION_MAX_AGE_SECONDS", str(ADMISSION_MAX_WAIT_SECONDS + CELERY_TASK_TIME_LIMIT)))  # 超过该时间仍未释放的预留（worker被强制终止、消息丢失）不再计入积压
+    WORKER_HEARTBEAT_INTERVAL: int = int(os.getenv("WORKER_HEARTBEAT_INTERVAL", "15"))  # 转写worker心跳间隔（秒）
+
+    # 批量提交设置
+    BATCH_MAX_FILES: int = int(os.getenv("BATCH_MAX_FILES", "50"))  # 单次批量提交的最大文件数
+    BATCH_MAX_UPLOAD_SIZE_MB: int = int(os.getenv("BATCH_MAX_UPLOAD_SIZE_MB", "1024"))  # 单次批量提交的文件总大小上限（MB）
 
 
     # 转写任务配置
     MAX_TRANSCRIPTION_RETRY: int = int(os.getenv("MAX_TRANSCRIPTION_RETRY", "3"))  # 转写任务最大重试次数
+    TASK_PROGRESS_MIN_INTERVAL: float = float(os.getenv("TASK_PROGRESS_MIN_INTERVAL", "1"))  # 两次进度写入的最小间隔（秒），期间的进度合并，完成时总是写入
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,97 @@
+import logging
+from typing import Iterable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.auth import jwt_auth_middleware
+from app.services.admission_service import get_admission_service
+
+logger = logging.getLogger(__name__)
+
+# multipart表单中除文件外的开销（boundary、extra_params等），超出上限前留出余量
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadPreflightMiddleware:
+    """
+    上传请求的预检中间件
+
+    FastAPI会在依赖项执行前完整接收并缓存multipart请求体，因此 /api/uploadfile 的鉴权和大小检查
+    原本都发生在文件传输之后。本中间件在读取请求体之前检查声明的Content-Length、JWT和转写队列积压，
+    不通过时直接返回错误。uvicorn只有在应用第一次读取请求体时才发送 100 Continue，
+    所以携带 Expect: 100-continue 的客户端在被拒绝时不会发送任何文件数据。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: Iterable[str] = ("/api/uploadfile",),
+        batch_paths: Iterable[str] = ()
+    ):
+        """
+        Args:
+            app: 下层ASGI应用
+            paths: 需要预检的单文件上传路径
+            batch_paths: 需要预检的批量上传路径（大小上限为 BATCH_MAX_UPLOAD_SIZE_MB）
+        """
+        self.app = app
+        max_file_size = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        max_batch_size = settings.BATCH_MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        self.max_body_sizes = {path: max_file_size + MULTIPART_OVERHEAD_BYTES for path in paths}
+        self.max_body_sizes.update({
+            path: max_batch_size + MULTIPART_OVERHEAD_BYTES * settings.BATCH_MAX_FILES for path in batch_paths
+        })
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.max_body_sizes:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        try:
+            self.check_content_length(request, self.max_body_sizes[scope["path"]])
+            await jwt_auth_middleware(request)
+            # 准入检查读取Redis（同步客户端），放到线程池执行，不阻塞事件循环
+            await run_in_threadpool(get_admission_service().check_admission)
+        except HTTPException as e:
+            logger.warning(f"上传预检未通过 {scope['path']}: {e.status_code} {e.detail}")
+            # 请求体没有被读取，关闭连接，不再复用
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail},
+                headers={**(e.headers or {}), "Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        # 标记已鉴权，路由中的依赖项不再重复请求验证服务
+        scope.setdefault("state", {})["jwt_verified"] = True
+        await self.app(scope, receive, send)
+
+    def check_content_length(self, request: Request, max_body_size: int) -> None:
+        """
+        检查声明的请求体大小，未声明（分块传输）时交给入库阶段边读边检查
+
+        Args:
+            request: 请求对象（只读取请求头）
+            max_body_size: 请求体大小上限（字节）
+
+        Raises:
+            HTTPException: 请求体过大或过小
+        """
+        content_length = request.headers.get("Content-Length")
+        if content_length is None:
+            return
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的Content-Length")
+        if content_length > max_body_size:
+            raise HTTPException(status_code=413, detail="文件大小超过限制")
+        if content_length < settings.MIN_UPLOAD_SIZE_BYTES:
+            raise HTTPException(status_code=400, detail="文件大小过小，无法处理")
@@ -1,6 +1,9 @@
 import os
+import re
+import sys
 import json
 import logging
+import contextlib
 import torch
 import whisperx
 from typing import Dict, Any, Optional, Tuple, Callable
@@ -8,6 +11,8 @@ from datetime import datetime
 from faster_whisper import transcribe
 from app.core.config import settings
 from app.utils.time import convert_to_time_format
+from app.utils.audio_pcm import load_pcm
+from app.utils.ecm_decoder import is_ecm_file, decode_ecm_file
 import time
 
 logger = logging.getLogger(__name__)
@@ -16,6 +21,58 @@ logger = logging.getLogger(__name__)
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 logger.info(f"WhisperX使用设备: {DEVICE}")
 
+# 转写阶段在总进度中的范围（百分比）
+TRANSCRIBE_PROGRESS_START = 20
+TRANSCRIBE_PROGRESS_END = 50
+
+
+class TranscribeProgress:
+    """
+    把转写的分段进度转为进度回调
+
+    FasterWhisperPipeline.transcribe 没有进度回调，print_progress=True 时每完成一个VAD分段向标准输出打印
+    "Progress: xx.xx%..."（已完成的分段数/总分段数）。转写期间把标准输出重定向到本对象，
+    解析这一行并按比例映射到 [start, end] 后调用回调，其他输出原样写入原来的标准输出。
+    """
+
+    PATTERN = re.compile(r"^Progress: ([\d.]+)%")
+
+    def __init__(self, callback: Callable[[int, str], None], start: int, end: int, stream):
+        """
+        Args:
+            callback: 进度回调函数，接收进度百分比和消息参数
+            start: 转写开始时的总进度
+            end: 转写完成时的总进度
+            stream: 原来的标准输出
+        """
+        self.callback = callback
+        self.start = start
+        self.end = end
+        self.stream = stream
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            self._handle_line(line)
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._handle_line(self._buffer)
+            self._buffer = ""
+        self.stream.flush()
+
+    def _handle_line(self, line: str) -> None:
+        match = self.PATTERN.match(line)
+        if not match:
+            self.stream.write(line + "\n")
+            return
+        percent = min(float(match.group(1)), 100.0)
+        progress = self.start + int((self.end - self.start) * percent / 100)
+        self.callback(progress, f"正在转写音频（{percent:.0f}%）...")
+
 class WhisperXProcessor:
     """
     WhisperX音频处理器，用于处理音频文件并转写为文本
@@ -67,6 +124,24 @@ class WhisperXProcessor:
             logger.error(f"加载模型失败 {model_size}: {str(e)}")
             return False
     
+    @contextlib.contextmanager
+    def _transcribe_progress(self, callback: Optional[Callable[[int, str], None]]):
+        """
+        转写期间把 print_progress 的输出转为进度回调（没有回调时不做处理）
+
+        Args:
+            callback: 进度回调函数
+        """
+        if callback is None:
+            yield
+            return
+        progress = TranscribeProgress(callback, TRANSCRIBE_PROGRESS_START, TRANSCRIBE_PROGRESS_END, sys.stdout)
+        try:
+            with contextlib.redirect_stdout(progress):
+                yield
+        finally:
+            progress.flush()
+
     def process_audio(
         self, 
         file_path: str, 
@@ -75,7 +150,8 @@ class WhisperXProcessor:
         language: Optional[str] = None,
         speaker_diarization: bool = False,
         callback: Optional[Callable[[int, str], None]] = None,
-        whisper_arch: str = settings.WHISPER_MODEL_NAME
+        whisper_arch: str = settings.WHISPER_MODEL_NAME,
+        pcm_path: Optional[str] = None
     ) -> Tuple[Dict[str, Any], float, Dict[str, float]]:
         """
         处理音频文件
@@ -88,6 +164,7 @@ class WhisperXProcessor:
             speaker_diarization: 是否启用说话人分离
             callback: 进度回调函数，接收进度百分比和消息参数
             whisper_arch: Whisper模型名，具体见 whisper_arch.py
+            pcm_path: 预解码的PCM文件路径，存在时内存映射读取，否则解码原始文件
             
         Returns:
             Tuple[Dict[str, Any], float, Dict[str, float]]: 转写结果、音频时长和各阶段耗时
@@ -98,6 +175,7 @@ class WhisperXProcessor:
         start_time = time.time()
         timing_stats = {
             "model_loading_time": 0,
+            "audio_loading_time": 0,
             "transcription_time": 0,
             "diarization_time": 0,
             "post_processing_time": 0
@@ -110,7 +188,7 @@ class WhisperXProcessor:
         try:
             # 步骤1: 加载模型并转写
             if callback:
-                callback(20, "正在转写音频...")
+                callback(TRANSCRIBE_PROGRESS_START, "正在转写音频...")
             
             logger.info(f"加载whisper模型: {whisper_arch}")
             # 加载whisper模型
@@ -118,15 +196,27 @@ class WhisperXProcessor:
             model = self._get_model(whisper_arch)
             timing_stats["model_loading_time"] = time.time() - model_loading_start
 
+            # 加载音频：优先内存映射预解码的PCM，否则解码一次，转写和说话人分离共用
+            audio_loading_start = time.time()
+            audio = load_pcm(pcm_path)
+            if audio is None:
+                # ffmpeg无法解码ECM，直接解码其中的Opus帧
+                audio = decode_ecm_file(file_path) if is_ecm_file(file_path) else whisperx.load_audio(file_path)
+            else:
+                logger.info(f"使用预解码的PCM文件: {pcm_path}")
+            timing_stats["audio_loading_time"] = time.time() - audio_loading_start
+
             logger.info(f"开始转写...")
             
-            # 转写音频，如果指定了语言则传入
+            # 转写音频，如果指定了语言则传入；按已完成的VAD分段报告转写进度
             transcription_start = time.time()
-            transcription = model.transcribe(
-                file_path, 
-                batch_size=16,
-                language=language,
-            )
+            with self._transcribe_progress(callback):
+                transcription = model.transcribe(
+                    audio, 
+                    batch_size=16,
+                    language=language,
+                    print_progress=callback is not None,
+                )
             timing_stats["transcription_time"] = time.time() - transcription_start
 
             logger.info(f"转写完成...")
@@ -136,7 +226,7 @@ class WhisperXProcessor:
             audio_duration = transcription.get("segments", [{}])[-1].get("end", 0) if transcription.get("segments") else 0
             
             if callback:
-                callback(50, "正在对齐时间戳...")
+                callback(TRANSCRIBE_PROGRESS_END, "正在对齐时间戳...")
             
             # 启用说话人分离
             if speaker_diarization and audio_duration > 1.0:
@@ -155,7 +245,7 @@ class WhisperXProcessor:
                     
                     # 执行说话人分离
                     diarize_segments = diarize_model(
-                        file_path,
+                        audio,
                         min_speakers=1,
                         max_speakers=5
                     )
@@ -3,6 +3,7 @@ from typing import Generator
 
 from app.services.task_status_service import TaskStatusService
 from app.services.transcription_service import TranscriptionService
+from app.services.upload_session_service import UploadSessionService
 
 @lru_cache()
 def get_task_status_service() -> TaskStatusService:
@@ -25,4 +26,11 @@ def get_worker_transcription_service() -> TranscriptionService:
     获取TranscriptionService的单例实例，用于Celery worker进程
     将预加载large-v3-turbo模型
     """
-    return TranscriptionService(preload_model=True, is_worker=True) 
\ No newline at end of file
+    return TranscriptionService(preload_model=True, is_worker=True)
+
+@lru_cache()
+def get_upload_session_service() -> UploadSessionService:
+    """
+    获取UploadSessionService的单例实例
+    """
+    return UploadSessionService()
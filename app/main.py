@@ -10,8 +10,11 @@ from functools import lru_cache
 
 from app.routes import api_app_router, web_app_router
 from app.core.config import settings
+from app.core.upload_preflight import UploadPreflightMiddleware
 from app.utils.logging_config import setup_logging
 from app.dependencies.services import get_task_status_service, get_transcription_service
+from app.services.redis_service import AsyncRedisService
+from app.services.task_events import get_task_event_hub
 
 # 标记为supervisor环境（如果通过supervisor启动）
 if "SUPERVISOR_PROCESS_NAME" in os.environ:
@@ -41,6 +44,13 @@ def create_app() -> FastAPI:
         openapi_url="/api/openapi.json",
     )
     
+    # 上传预检：在接收文件之前检查大小和鉴权（先添加，位于CORS内层，错误响应也带CORS头）
+    app.add_middleware(
+        UploadPreflightMiddleware,
+        paths=("/api/uploadfile",),
+        batch_paths=("/api/batch/uploadfile",)
+    )
+    
     # 设置CORS
     app.add_middleware(
         CORSMiddleware,
@@ -76,6 +86,8 @@ def create_app() -> FastAPI:
         logger.info("应用启动，初始化服务...")
         # 预热服务实例，但不加载模型
         get_task_status_service()
+        # 订阅任务变化事件：使进程内的任务状态缓存失效，并推送给SSE/WebSocket连接
+        get_task_event_hub().start()
         logger.info("初始化转写服务（无模型预加载）...")
         get_transcription_service()  # 此调用现在不会预加载模型
         logger.info("服务初始化完成")
@@ -89,6 +101,8 @@ def create_app() -> FastAPI:
         # 清理缓存的服务实例
         get_task_status_service.cache_clear()
         get_transcription_service.cache_clear()
+        await get_task_event_hub().stop()
+        await AsyncRedisService().close()
         logger.info("资源清理完成")
     
     return app
@@ -19,4 +19,52 @@ async def health_check():
     cpu_percent = psutil.cpu_percent()
     mem_percent = psutil.virtual_memory().percent
 
-    return {'status': 'ok', 'cpu_percent': cpu_percent, 'mem_percent': mem_percent, 'message': '系统正常'} 
\ No newline at end of file
+    return {'status': 'ok', 'cpu_percent': cpu_percent, 'mem_percent': mem_percent, 'message': '系统正常'} 
+
+# 结果缓存统计路由
+@api_app_router.get("/cache/stats", tags=["系统"])
+def result_cache_stats():
+    """结果缓存命中统计，用于评估缓存保留时间"""
+    from app.services.result_cache_service import get_result_cache_service
+    return get_result_cache_service().get_stats()
+
+# 任务状态缓存统计路由
+@api_app_router.get("/cache/task_status", tags=["系统"])
+async def task_status_cache_stats():
+    """本进程任务状态缓存的命中率和Redis读取减少比例（每个API进程单独统计）"""
+    from app.services.task_status_cache import get_task_status_cache
+    return get_task_status_cache().get_stats()
+
+# 任务事件推送统计路由
+@api_app_router.get("/events/stats", tags=["系统"])
+async def task_event_stats():
+    """本进程的任务变化事件订阅状态和SSE/WebSocket连接数"""
+    from app.services.task_events import get_task_event_hub
+    return get_task_event_hub().get_stats()
+
+# 转写队列状态路由
+@api_app_router.get("/queue/status", tags=["系统"])
+def queue_status():
+    """转写队列积压、实时率和预计排队时间（准入控制使用的估计值）"""
+    from app.services.admission_service import get_admission_service
+    return get_admission_service().get_status()
+
+# 任务存储内存统计路由
+@api_app_router.get("/storage/stats", tags=["系统"])
+def storage_stats():
+    """按状态统计任务记录的数量和内存占用，以及列表索引的内存占用（同步SCAN，普通函数在线程池中执行）"""
+    from app.services.task_retention_service import get_task_retention_service
+    return get_task_retention_service().memory_report()
+
+# 任务存储延迟统计路由
+@api_app_router.get("/storage/latency", tags=["系统"])
+def storage_latency():
+    """任务存储各操作的延迟直方图和错误次数：本进程的统计，以及所有进程汇总到Redis的统计"""
+    from app.core.config import settings
+    from app.services.store_metrics import get_store_metrics
+    metrics = get_store_metrics()
+    return {
+        "backend": settings.TASK_STORE_BACKEND,
+        "process": metrics.snapshot(),
+        "cluster": metrics.cluster_snapshot() if metrics.flush_interval > 0 else None
+    }
@@ -1,10 +1,14 @@
 from fastapi import APIRouter
 from app.routes.api import transcription
 from app.routes.api import task_status
+from app.routes.api import resumable_upload
+from app.routes.api import batch
 
 # 创建API路由器
 router = APIRouter()
 
 # 包含其他路由
 router.include_router(transcription.router, tags=["语音转写"])
-router.include_router(task_status.router, tags=["任务状态"]) 
\ No newline at end of file
+router.include_router(task_status.router, tags=["任务状态"])
+router.include_router(resumable_upload.router, tags=["断点续传"])
+router.include_router(batch.router, tags=["批量转写"])
\ No newline at end of file
@@ -0,0 +1,163 @@
+import json
+import logging
+import uuid
+from typing import List, Dict, Any
+
+from fastapi import APIRouter, UploadFile, File, Form, status, Request, Response, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.auth import jwt_auth_middleware
+from app.dependencies.services import get_transcription_service
+from app.services.transcription_service import TranscriptionService
+from app.services.batch_service import get_batch_service
+from app.schemas.transcription import BatchUploadItem, BatchUploadResponse
+from app.tasks.transcription_tasks import enqueue_transcriptions, notify_batch_complete
+from app.utils.upload_ingest import UploadRejectedError
+from app.utils.error_codes import SUCCESS, ERROR_PROCESSING_FAILED
+from app.routes.api.transcription import (
+    validate_params, reject_upload, ingest_upload_file, build_task_spec, prepare_created_task, add_rate_limit_headers
+)
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+@router.post("/batch/uploadfile", status_code=status.HTTP_200_OK, response_model=BatchUploadResponse)
+async def create_batch_transcription_tasks(
+    request: Request,
+    response: Response,
+    files: List[UploadFile] = File(..., description="音频文件，可以有多个"),
+    extra_params: str = Form(..., description="JSON对象：所有文件共用的参数，items 为与文件顺序一致的逐个文件参数"),
+    batch_webhook: bool = Form(True, description="所有任务结束时发送一次批次汇总webhook"),
+    item_webhook: bool = Form(False, description="每个任务结束时单独发送webhook"),
+    _: bool = Depends(jwt_auth_middleware),
+    transcription_service: TranscriptionService = Depends(get_transcription_service)
+):
+    """
+    批量创建转写任务
+
+    一次请求提交多个文件：只验证一次JWT，所有任务记录通过一个Redis pipeline写入，
+    作为一个Celery group入队。被拒绝的文件不影响其他文件，在响应的 items 中返回原因。
+    """
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多提交{settings.BATCH_MAX_FILES}个文件")
+    # 分块传输的请求没有经过预检的Content-Length检查，这里按实际接收的文件大小再检查一次
+    if sum(file.size or 0 for file in files) > settings.BATCH_MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"文件总大小超过限制（{settings.BATCH_MAX_UPLOAD_SIZE_MB}MB）")
+    try:
+        shared_params = json.loads(extra_params)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="extra_params不是有效的JSON")
+    if not isinstance(shared_params, dict):
+        raise HTTPException(status_code=400, detail="extra_params必须是JSON对象")
+    item_params = shared_params.pop("items", None) or [{}] * len(files)
+    if len(item_params) != len(files):
+        raise HTTPException(status_code=400, detail="items的数量与文件数量不一致")
+
+    # 提取JWT token
+    jwt_token = None
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        jwt_token = auth_header.split(" ")[1]
+
+    logger.info(f"收到批量提交请求，文件数: {len(files)}，共用参数为：{shared_params}")
+
+    # 逐个入库，被拒绝的文件只记录原因
+    items: List[BatchUploadItem] = []
+    accepted = []
+    rejected: List[Dict[str, Any]] = []
+    for index, (file, own_params) in enumerate(zip(files, item_params)):
+        params = {**shared_params, **own_params}
+        validated_params = validate_params(params)
+        message = None
+        if not validated_params:
+            message = "参数验证失败"
+        else:
+            uni_key = transcription_service.new_uni_key()
+            try:
+                ingestor = await ingest_upload_file(file, uni_key, validated_params)
+            except UploadRejectedError as e:
+                logger.error(f"批量提交中的文件验证失败 {file.filename}: {str(e)}")
+                message = "参数验证失败"
+            except Exception as e:
+                logger.error(f"批量提交中的文件保存失败 {file.filename}: {str(e)}")
+                message = f"保存文件失败: {str(e)}"
+
+        if message:
+            if item_webhook:
+                reject_upload(params, file.filename, message, jwt_token)
+            rejected.append({"index": index, "filename": file.filename, "task_id": params.get("task_id"), "message": message})
+            items.append(BatchUploadItem(
+                index=index, filename=file.filename, task_id=params.get("task_id"),
+                code=ERROR_PROCESSING_FAILED, message=message
+            ))
+            continue
+
+        accepted.append((index, file.filename, uni_key, validated_params, ingestor))
+        items.append(BatchUploadItem(
+            index=index, filename=file.filename, uni_key=uni_key, task_id=validated_params.get("task_id"),
+            code=SUCCESS, message="任务创建成功"
+        ))
+
+    # 先写入批次记录，任务结束（包括下面直接命中缓存的任务）时才能记入批次
+    batch_id = f"batch_{uuid.uuid4()}"
+    client_id = str(shared_params.get("u_id"))
+    batch_service = get_batch_service()
+    batch = await run_in_threadpool(
+        batch_service.create_batch,
+        batch_id,
+        client_id=client_id,
+        uni_keys=[uni_key for _, _, uni_key, _, _ in accepted],
+        rejected=rejected,
+        batch_webhook=batch_webhook,
+        jwt_token=jwt_token
+    )
+
+    # 一个pipeline写入所有任务记录
+    tasks = await run_in_threadpool(transcription_service.create_tasks, [
+        build_task_spec(ingestor, uni_key, params, filename, jwt_token, batch_id=batch_id, item_webhook=item_webhook)
+        for _, filename, uni_key, params, ingestor in accepted
+    ])
+
+    to_enqueue = []
+    for task, (_, filename, _, _, ingestor) in zip(tasks, accepted):
+        task, needs_enqueue = await prepare_created_task(transcription_service, task, ingestor, filename)
+        if needs_enqueue:
+            to_enqueue.append(task.uni_key)
+    await run_in_threadpool(enqueue_transcriptions, to_enqueue)
+
+    if not accepted:
+        # 没有任何任务，批次直接完成
+        batch = await run_in_threadpool(batch_service.complete_batch, batch)
+        await run_in_threadpool(notify_batch_complete, batch)
+
+    await add_rate_limit_headers(response, client_id)
+    logger.info(f"批次 {batch_id} 已受理 {len(accepted)} 个文件，拒绝 {len(rejected)} 个，入队 {len(to_enqueue)} 个")
+    return BatchUploadResponse(
+        batch_id=batch_id,
+        total=len(files),
+        accepted=len(accepted),
+        rejected=len(rejected),
+        items=items,
+        code=SUCCESS if accepted else ERROR_PROCESSING_FAILED,
+        message="批次创建成功" if accepted else "没有文件被受理"
+    )
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(
+    batch_id: str,
+    _: bool = Depends(jwt_auth_middleware),
+    transcription_service: TranscriptionService = Depends(get_transcription_service)
+) -> Dict[str, Any]:
+    """
+    查询批次状态：各状态的任务数和每个文件的结果
+    """
+    batch_service = get_batch_service()
+    batch = await run_in_threadpool(batch_service.get_batch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="批次不存在或已过期")
+    tasks = await run_in_threadpool(transcription_service.get_tasks, batch["uni_keys"])
+    return batch_service.summarize(batch, tasks)
@@ -0,0 +1,304 @@
+import json
+import logging
+from typing import Dict, Any, Optional
+
+from fastapi import APIRouter, Request, Response, Form, Header, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from app.core.config import settings
+from app.core.auth import jwt_auth_middleware
+from app.dependencies.services import get_transcription_service, get_upload_session_service
+from app.services.transcription_service import TranscriptionService
+from app.services.upload_session_service import UploadSessionService, UploadOffsetMismatchError, UploadLockLostError
+from app.services.admission_service import get_admission_service, queue_headers
+from app.schemas.transcription import SimplifiedTranscriptionTask
+from app.utils.upload_ingest import UploadIngestor, UploadRejectedError, build_upload_path, is_audio_header
+from app.routes.api.transcription import (
+    validate_params, reject_upload, submit_ingested_upload, build_upload_response, add_rate_limit_headers
+)
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def get_bearer_token(request: Request) -> Optional[str]:
+    """
+    从请求头中提取JWT token
+
+    Args:
+        request: FastAPI请求对象
+
+    Returns:
+        Optional[str]: JWT token，没有时返回None
+    """
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        return auth_header.split(" ")[1]
+    return None
+
+
+async def get_session_or_404(upload_session_service: UploadSessionService, uni_key: str) -> Dict[str, Any]:
+    """
+    获取上传会话，不存在时返回404
+    """
+    session = await upload_session_service.get_session(uni_key)
+    if not session:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return session
+
+
+def build_session_ingestor(uni_key: str, session: Dict[str, Any]) -> UploadIngestor:
+    """
+    按上传会话中已验证的参数创建入库器，校验规则与 /api/uploadfile 一致
+    
+    Args:
+        uni_key: 任务唯一标识符
+        session: 上传会话
+        
+    Returns:
+        UploadIngestor: 入库器，最大大小为会话声明的文件大小
+    """
+    params = session["params"]
+    return UploadIngestor(
+        build_upload_path(uni_key, session["filename"]),
+        u_id=params.get("u_id"),
+        expected_content_id=params.get("content_id"),
+        max_size_bytes=session["file_size"],
+        header_validator=is_audio_header
+    )
+
+
+@router.post("/uploads")
+async def init_resumable_upload(
+    request: Request,
+    response: Response,
+    extra_params: str = Form(...),
+    filename: str = Form(...),
+    file_size: int = Form(..., description="文件总大小（字节）"),
+    _: bool = Depends(jwt_auth_middleware),
+    transcription_service: TranscriptionService = Depends(get_transcription_service),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+) -> Dict[str, Any]:
+    """
+    初始化上传（预检），返回uni_key和当前偏移量
+
+    鉴权、参数、文件大小和转写队列积压在传输文件之前完成校验，不通过时不产生任何上传流量。
+    队列积压超过上限时返回503和 Retry-After。之后可以：
+    - 通过 PUT /api/uploads/{uni_key} 一次性上传整个文件并直接创建转写任务；
+    - 或通过 PATCH /api/uploads/{uni_key} 追加分块，全部上传完成后调用
+      POST /api/uploads/{uni_key}/finalize 创建转写任务。
+    """
+    try:
+        params = json.loads(extra_params)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="extra_params不是有效的JSON")
+
+    logger.info(f"收到断点续传初始化请求，extra_params参数为：{params}")
+
+    validated_params = validate_params(params)
+    if not validated_params:
+        raise HTTPException(status_code=400, detail="参数验证失败")
+
+    if file_size > settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail="文件大小超过限制")
+    if file_size < settings.MIN_UPLOAD_SIZE_BYTES:
+        raise HTTPException(status_code=400, detail="文件大小过小，无法处理")
+
+    queue_status = await run_in_threadpool(get_admission_service().check_admission)
+    if queue_status:
+        response.headers.update(queue_headers(queue_status))
+
+    uni_key = transcription_service.new_uni_key()
+    session = await upload_session_service.create_session(
+        uni_key=uni_key,
+        params=validated_params,
+        filename=filename,
+        file_size=file_size,
+        jwt_token=get_bearer_token(request)
+    )
+
+    return {
+        "code": 0,
+        "message": "ok",
+        "uni_key": uni_key,
+        "offset": session["offset"],
+        "file_size": file_size,
+        "upload_url": f"{settings.BASE_URL}/api/uploads/{uni_key}"
+    }
+
+
+@router.head("/uploads/{uni_key}")
+async def get_resumable_upload_offset(
+    uni_key: str,
+    _: bool = Depends(jwt_auth_middleware),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+) -> Response:
+    """
+    查询已上传的偏移量，断线后客户端从 Upload-Offset 继续上传
+    """
+    session = await get_session_or_404(upload_session_service, uni_key)
+    return Response(
+        status_code=status.HTTP_200_OK,
+        headers={
+            "Upload-Offset": str(session["offset"]),
+            "Upload-Length": str(session["file_size"]),
+            "Cache-Control": "no-store"
+        }
+    )
+
+
+@router.get("/uploads/{uni_key}")
+async def get_resumable_upload(
+    uni_key: str,
+    _: bool = Depends(jwt_auth_middleware),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+) -> Dict[str, Any]:
+    """
+    查询上传会话状态
+    """
+    session = await get_session_or_404(upload_session_service, uni_key)
+    return {
+        "uni_key": uni_key,
+        "offset": session["offset"],
+        "file_size": session["file_size"],
+        "filename": session["filename"],
+        "created_at": session["created_at"]
+    }
+
+
+@router.put("/uploads/{uni_key}", response_model=SimplifiedTranscriptionTask)
+async def put_upload(
+    uni_key: str,
+    request: Request,
+    response: Response,
+    content_length: Optional[int] = Header(None, alias="Content-Length"),
+    _: bool = Depends(jwt_auth_middleware),
+    transcription_service: TranscriptionService = Depends(get_transcription_service),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    一次性上传整个文件（请求体为原始字节）并创建转写任务
+
+    会话和Content-Length在读取请求体之前校验，携带 Expect: 100-continue 的客户端被拒绝时不会发送文件。
+    """
+    session = await get_session_or_404(upload_session_service, uni_key)
+    if session["offset"] != 0:
+        raise HTTPException(status_code=409, detail="已通过分块上传部分数据，请使用PATCH继续上传")
+    if content_length is None:
+        raise HTTPException(status_code=411, detail="需要提供Content-Length")
+    if content_length != session["file_size"]:
+        raise HTTPException(status_code=400, detail="Content-Length与声明的文件大小不一致")
+
+    lock_token = await upload_session_service.lock(uni_key)
+    if not lock_token:
+        raise HTTPException(status_code=409, detail="该文件正在上传或完成中")
+
+    params = session["params"]
+    filename = session["filename"]
+    jwt_token = session.get("jwt_token")
+    ingestor = build_session_ingestor(uni_key, session)
+    try:
+        async with ingestor:
+            await ingestor.write_stream(upload_session_service.hold_lock(uni_key, lock_token, request.stream()))
+    except UploadLockLostError as e:
+        logger.warning(f"上传文件时锁已失效: {uni_key}")
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadRejectedError as e:
+        logger.error(f"文件验证失败: {str(e)}")
+        await upload_session_service.delete_session(uni_key)
+        return reject_upload(params, filename, "参数验证失败", jwt_token)
+    except ClientDisconnect:
+        logger.warning(f"上传文件时客户端断开连接: {uni_key}")
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+    else:
+        await upload_session_service.delete_session(uni_key)
+    finally:
+        await upload_session_service.unlock(uni_key, lock_token)
+
+    task = await submit_ingested_upload(
+        transcription_service, ingestor, uni_key, params, filename, jwt_token
+    )
+    await add_rate_limit_headers(response, task.client_id)
+    return build_upload_response(task)
+
+
+@router.patch("/uploads/{uni_key}")
+async def append_resumable_upload(
+    uni_key: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset", description="本分块在文件中的起始偏移量"),
+    _: bool = Depends(jwt_auth_middleware),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+) -> Response:
+    """
+    追加一个分块，请求体为原始字节
+
+    偏移量必须与服务器记录一致，否则返回409和服务器当前的偏移量。
+    """
+    session = await get_session_or_404(upload_session_service, uni_key)
+
+    try:
+        offset = await upload_session_service.append_chunk(session, upload_offset, request.stream())
+    except UploadOffsetMismatchError as e:
+        return Response(
+            status_code=status.HTTP_409_CONFLICT,
+            headers={"Upload-Offset": str(e.expected_offset)}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ClientDisconnect:
+        logger.warning(f"上传分块时客户端断开连接: {uni_key}，已保存偏移量 {session['offset']}")
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={"Upload-Offset": str(offset)}
+    )
+
+
+@router.post("/uploads/{uni_key}/finalize", response_model=SimplifiedTranscriptionTask)
+async def finalize_resumable_upload(
+    uni_key: str,
+    response: Response,
+    _: bool = Depends(jwt_auth_middleware),
+    transcription_service: TranscriptionService = Depends(get_transcription_service),
+    upload_session_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    """
+    完成上传：执行与 /api/uploadfile 相同的文件校验，创建转写任务并加入队列
+    """
+    session = await get_session_or_404(upload_session_service, uni_key)
+    if session["offset"] != session["file_size"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"文件尚未上传完成: {session['offset']}/{session['file_size']}"
+        )
+
+    lock_token = await upload_session_service.lock(uni_key)
+    if not lock_token:
+        raise HTTPException(status_code=409, detail="该文件正在上传或完成中")
+
+    params = session["params"]
+    filename = session["filename"]
+    jwt_token = session.get("jwt_token")
+    ingestor = build_session_ingestor(uni_key, session)
+    try:
+        await ingestor.adopt_file(upload_session_service.get_part_path(uni_key))
+    except UploadRejectedError as e:
+        logger.error(f"文件验证失败: {str(e)}")
+        await upload_session_service.delete_session(uni_key)
+        return reject_upload(params, filename, "参数验证失败", jwt_token)
+    else:
+        await upload_session_service.delete_session(uni_key, remove_part=False)
+    finally:
+        await upload_session_service.unlock(uni_key, lock_token)
+
+    task = await submit_ingested_upload(
+        transcription_service, ingestor, uni_key, params, filename, jwt_token
+    )
+    await add_rate_limit_headers(response, task.client_id)
+    return build_upload_response(task)
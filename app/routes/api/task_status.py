@@ -1,59 +1,201 @@
-from fastapi import APIRouter, Query, Depends
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Query, Depends, Header, Response, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional, AsyncIterator
 
+from app.core.config import settings
 from app.dependencies.services import get_task_status_service
 from app.services.task_status_service import TaskStatusService
 from app.schemas.transcription import TranscriptionTask
+from app.utils.redis_codec import dumps_json
 
 router = APIRouter()
 
+
+def set_etag(response: Response, etag: Optional[str]) -> None:
+    """设置ETag响应头，要求客户端每次使用缓存前重新验证"""
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    """If-None-Match 与当前ETag一致时的304响应（不含响应体）"""
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+
 @router.get("/get_task_status", response_model=Dict[str, Any])
 async def get_task_status(
+    response: Response,
     uni_key: str = Query(..., description="任务唯一标识符"),
+    wait: float = Query(0, ge=0, le=settings.TASK_STATUS_LONG_POLL_MAX_WAIT, description="长轮询的最长等待时间（秒），需同时提供since_version"),
+    since_version: Optional[int] = Query(None, description="上一次响应的version，任务没有新的变化时等待"),
+    if_none_match: Optional[str] = Header(None, description="上一次响应的ETag，任务没有变化时返回304"),
     task_status_service: TaskStatusService = Depends(get_task_status_service)
 ) -> Dict[str, Any]:
     """
     获取任务状态
+
+    提供 since_version 和 wait 时为长轮询：任务的版本号大于 since_version 时立即返回，否则等待任务变化，
+    最多 wait 秒后返回当前状态（version 不变）。
+    响应头 ETag 由任务的版本号计算，请求带上 If-None-Match 且任务没有变化时返回304（不含响应体）。
     :param uni_key: 任务唯一标识符
+    :param wait: 长轮询的最长等待时间（秒）
+    :param since_version: 客户端已知的版本号
+    :param if_none_match: If-None-Match 请求头
     :param task_status_service: 任务状态服务
     :return: 任务状态信息
     """
-    return await task_status_service.get_task_status(uni_key)
+    status, etag = await task_status_service.get_task_status(uni_key, wait, since_version, if_none_match)
+    if status is None:
+        return not_modified(etag)
+    set_etag(response, etag)
+    return status
 
 @router.get("/tasks", response_model=List[TranscriptionTask])
 async def list_tasks(
+    response: Response,
     uni_keys: Optional[List[str]] = Query(None, description="任务唯一标识符列表，不提供则返回所有任务"),
-    limit: int = Query(10, description="每页返回的任务数量"),
-    offset: int = Query(0, description="分页偏移量"),
+    limit: int = Query(10, ge=1, le=100, description="每页返回的任务数量"),
+    offset: int = Query(0, ge=0, description="分页偏移量（与cursor同时使用时，在游标之后再跳过的条数）"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+    client_id: Optional[str] = Query(None, description="按客户端ID筛选"),
+    status: Optional[str] = Query(None, description="按状态筛选：pending, processing, completed, failed"),
+    if_none_match: Optional[str] = Header(None, description="上一次响应的ETag，本页没有变化时返回304"),
     task_status_service: TaskStatusService = Depends(get_task_status_service)
 ) -> List[TranscriptionTask]:
     """
-    获取任务列表
+    获取任务列表，按创建时间倒序
+    
+    下一页的游标在响应头 X-Next-Cursor 中返回，没有更多任务时不返回该响应头。
+    响应头 ETag 由本页任务的版本号和下一页游标计算，本页没有变化时对 If-None-Match 返回304。
     
     Args:
         uni_keys: 任务唯一标识符列表，不提供则返回所有任务
         limit: 每页返回的任务数量，默认10
         offset: 分页偏移量，默认0
+        cursor: 分页游标
+        client_id: 客户端ID
+        status: 任务状态
+        if_none_match: If-None-Match 请求头
         task_status_service: 任务状态服务
         
     Returns:
         List[TranscriptionTask]: 任务列表
     """
-    return await task_status_service.get_tasks(uni_keys, limit, offset)
+    tasks, next_cursor, etag = await task_status_service.get_tasks(
+        uni_keys, limit, offset, cursor, client_id, status, if_none_match
+    )
+    if tasks is None:
+        response = not_modified(etag)
+    else:
+        set_etag(response, etag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response if tasks is None else tasks
 
 @router.get("/task/{uni_key}", response_model=TranscriptionTask)
 async def get_task_detail(
     uni_key: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None, description="上一次响应的ETag，任务没有变化时返回304"),
     task_status_service: TaskStatusService = Depends(get_task_status_service)
 ) -> TranscriptionTask:
     """
     获取单个任务的详细信息
+
+    响应头 ETag 与 /api/get_task_status 相同，任务没有变化时对 If-None-Match 返回304。
     
     Args:
         uni_key: 任务唯一标识符
+        response: 响应（用于设置ETag）
+        if_none_match: If-None-Match 请求头
         task_status_service: 任务状态服务
         
     Returns:
         TranscriptionTask: 任务详细信息
     """
-    return await task_status_service.get_task_detail(uni_key) 
\ No newline at end of file
+    task, etag = await task_status_service.get_task_detail(uni_key, if_none_match)
+    if task is None:
+        return not_modified(etag)
+    set_etag(response, etag)
+    return task
+
+@router.get("/task_events")
+async def stream_task_events(
+    uni_key: Optional[str] = Query(None, description="只推送该任务"),
+    client_id: Optional[str] = Query(None, description="只推送该客户端的任务（两者都不提供时推送所有任务）"),
+    task_status_service: TaskStatusService = Depends(get_task_status_service)
+) -> StreamingResponse:
+    """
+    通过Server-Sent Events推送任务状态变化，代替轮询 /api/get_task_status
+
+    连接建立时先推送当前状态（指定任务，或排队中和处理中的任务），之后每次任务写入（创建、进度、状态转换、删除）
+    推送一条 `event: task` 消息，data 为包含 status、progress、progress_message、version 的JSON；
+    没有变化时每 TASK_STREAM_KEEPALIVE_SECONDS 秒发送一条注释作为心跳。
+
+    Args:
+        uni_key: 任务唯一标识符
+        client_id: 客户端ID
+        task_status_service: 任务状态服务
+
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    subscription = task_status_service.open_task_stream(uni_key, client_id)
+
+    async def event_source() -> AsyncIterator[bytes]:
+        events = task_status_service.stream_task_events(subscription)
+        try:
+            async for event in events:
+                if event is None:
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"event: task\ndata: " + dumps_json(event) + b"\n\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws/task_events")
+async def websocket_task_events(
+    websocket: WebSocket,
+    uni_key: Optional[str] = Query(None, description="只推送该任务"),
+    client_id: Optional[str] = Query(None, description="只推送该客户端的任务（两者都不提供时推送所有任务）"),
+    task_status_service: TaskStatusService = Depends(get_task_status_service)
+) -> None:
+    """
+    通过WebSocket推送任务状态变化，消息内容与 /api/task_events 相同
+
+    每条消息为 {"type": "task", "data": {...}}；没有变化时每 TASK_STREAM_KEEPALIVE_SECONDS 秒发送 {"type": "ping"}。
+    流式推送不可用时以1013关闭连接。
+
+    Args:
+        websocket: WebSocket连接
+        uni_key: 任务唯一标识符
+        client_id: 客户端ID
+        task_status_service: 任务状态服务
+    """
+    await websocket.accept()
+    try:
+        subscription = task_status_service.open_task_stream(uni_key, client_id)
+    except HTTPException as e:
+        await websocket.close(code=1013, reason=str(e.detail))
+        return
+    events = task_status_service.stream_task_events(subscription)
+    try:
+        # 客户端断开后在下一次发送（最迟为下一次心跳）时结束
+        async for event in events:
+            if event is None:
+                await websocket.send_json({"type": "ping"})
+            else:
+                await websocket.send_json({"type": "task", "data": event})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await events.aclose()
@@ -1,10 +1,11 @@
 import logging
 import os
 import json
-import shutil
+import asyncio
 import uuid
 import httpx
-from fastapi import APIRouter, UploadFile, File, Form, status, Request, Response, Depends, Query, HTTPException
+from fastapi import APIRouter, UploadFile, status, Request, Response, Depends, Query, HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
@@ -13,9 +14,11 @@ from app.core.config import settings
 from app.services.transcription_service import TranscriptionService
 from app.services.cloud_stats import CloudStatsService
 from app.services.webhook_service import get_webhook_service
-from app.utils.files import validate_audio_file, save_upload_file, get_file_size_bytes, get_file_size_mb
-from app.utils.file_validation import validate_content_id
-from app.utils.ecm_to_wav import ecm_to_wav  # 导入ecm转wav函数
+from app.utils.upload_ingest import UploadIngestor, UploadRejectedError, build_upload_path, is_audio_header
+from app.utils.multipart_stream import MultipartStreamError, PART_BEGIN, PART_DATA, iter_multipart
+from app.utils.ecm_decoder import ecm_to_pcm_async
+from app.utils.ecm_ogg import ecm_to_ogg, get_ogg_path
+from app.utils.audio_pcm import get_pcm_path
 from app.utils.error_codes import (
     SUCCESS, ERROR_FILE_NOT_FOUND, ERROR_PROCESSING_FAILED, 
     ERROR_INVALID_FILE_FORMAT, ERROR_FILE_TOO_LARGE, ERROR_FILE_TOO_SMALL,
@@ -23,7 +26,9 @@ from app.utils.error_codes import (
     ERROR_MESSAGES, get_error_message
 )
 from app.schemas.transcription import TranscriptionTask, RateLimitInfo, TranscriptionExtraParams, SimplifiedTranscriptionTask
-from app.tasks.transcription_tasks import process_transcription
+from app.tasks.transcription_tasks import enqueue_transcription, finish_cached_task
+from app.services.result_cache_service import get_result_cache_service, STATS_HITS, STATS_MISSES, STATS_COALESCED
+from app.services.admission_service import get_admission_service, queue_headers
 from app.utils.whisper_arch import ARCH_LIST
 from app.core.auth import jwt_auth_middleware
 from app.dependencies.services import get_transcription_service
@@ -36,17 +41,45 @@ router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-@router.post("/uploadfile", status_code=status.HTTP_200_OK, response_model=SimplifiedTranscriptionTask)
+# 表单中非文件字段（extra_params等）的大小上限
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+# /api/uploadfile 自行解析请求体，表单结构只用于接口文档
+UPLOAD_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "extra_params"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary", "description": "音频文件"},
+                        "extra_params": {"type": "string", "description": "JSON字符串：转写参数"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+@router.post(
+    "/uploadfile",
+    status_code=status.HTTP_200_OK,
+    response_model=SimplifiedTranscriptionTask,
+    openapi_extra=UPLOAD_FORM_OPENAPI
+)
 async def create_transcription_task(
     request: Request,
     response: Response,
-    file: UploadFile = File(...),
-    extra_params: str = Form(...),
     _: bool = Depends(jwt_auth_middleware),
     transcription_service: TranscriptionService = Depends(get_transcription_service)
 ):
     """
     创建一个新的转写任务。所有请求都返回200 OK，错误通过webhook通知。
+    
+    请求体从 request.stream() 流式解析，文件直接写入最终路径，不经过Starlette的临时文件。
+    表单格式错误或缺少 file、extra_params 字段时返回422。
     """
     # 初始化变量
     u_id = None
@@ -68,9 +101,20 @@ async def create_transcription_task(
     # 获取webhook服务实例
     webhook_service = get_webhook_service()
     
+    # 流式接收表单，文件在读取过程中写入最终路径
+    uni_key = transcription_service.new_uni_key()
+    try:
+        fields, filename, ingestor, rejection = await receive_upload_form(request, uni_key)
+    except MultipartStreamError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if "extra_params" not in fields or ingestor is None:
+        if ingestor is not None:
+            ingestor.discard()
+        raise HTTPException(status_code=422, detail="缺少file或extra_params字段")
+    
     try:
         # 解析 extra_params JSON 字符串
-        params = json.loads(extra_params)
+        params = json.loads(fields["extra_params"])
         
         # 提取基本参数
         u_id = params.get("u_id")
@@ -86,130 +130,52 @@ async def create_transcription_task(
         
         logger.info(f"收到 POST 请求，extra_params参数为：{params}")
         
-        # 验证参数和文件
-        validated_params = await validate_params_and_file(file, params)
+        # 验证参数
+        validated_params = validate_params(params)
         if not validated_params:
-            # 发送webhook错误通知
-            webhook_service.send_transcription_complete(
-                extra_params=params,
-                result="参数验证失败",
-                code=ERROR_PROCESSING_FAILED,
-                use_time=0,
-                jwt_token=jwt_token
-            )
-            
-            # 返回错误响应
-            return SimplifiedTranscriptionTask(
-                task_id=task_id if task_id else "unknown",
-                client_id=str(u_id) if u_id else "unknown",
-                filename=file.filename,
-                file_path="",
-                file_size=None,
-                result_path="",
-                created_at=datetime.now().isoformat(),
-                extra_params=params,
-                code=ERROR_PROCESSING_FAILED,
-                message="参数验证失败"
-            )
+            ingestor.discard()
+            return reject_upload(params, filename, "参数验证失败", jwt_token)
         
         # 提取验证后的参数
         whisper_arch = validated_params.get("whisper_arch")
-        file_size_bytes = validated_params.get("file_size_bytes")
-
-        # 保存上传的文件
-        filename = file.filename
-        client_id = str(u_id)
 
-        # 创建任务以获取uni_key
-        task = transcription_service.create_task(
-            task_id=task_id,
-            file_path="",
-            result_path="",
-            original_filename=filename,
-            client_id=client_id,
-            language=language,
-            u_id=u_id,
-            mode_id=mode_id,
-            ai_mode=ai_mode,
-            speaker=speaker,
-            whisper_arch=whisper_arch,
-            content_id=content_id,
-            server_id=server_id,
-            duration=duration,
-            file_size=file_size_bytes,
-            jwt_token=jwt_token
-        )
-        
-        # 保存文件并处理ECM格式
+        # 接收时已计算哈希、识别文件头并检查大小，这里补充依赖参数的content_id校验和音频探测
         try:
-            file_path = await save_upload_file_with_ecm_check(file, task.uni_key)
+            if rejection:
+                raise rejection
+            ingestor.bind_params(validated_params.get("u_id"), validated_params.get("content_id"))
+            await ingestor.finish()
+        except UploadRejectedError as e:
+            logger.error(f"文件验证失败: {str(e)}")
+            return reject_upload(params, filename, "参数验证失败", jwt_token)
         except Exception as e:
             error_msg = f"保存文件失败: {str(e)}"
             logger.error(error_msg)
-            
-            # 发送webhook错误通知
-            webhook_service.send_transcription_complete(
-                extra_params=params,
-                result=error_msg,
-                code=ERROR_PROCESSING_FAILED,
-                use_time=0,
-                jwt_token=jwt_token
-            )
-            
-            # 返回错误响应
-            return SimplifiedTranscriptionTask(
-                task_id=task.task_id,
-                client_id=task.client_id,
-                filename=task.filename,
-                file_path="",
-                file_size=file_size_bytes,
-                result_path="",
-                created_at=task.created_at,
-                extra_params=task.extra_params,
-                code=ERROR_PROCESSING_FAILED,
-                message=error_msg
-            )
-        
-        # 创建结果文件路径
-        result_path = os.path.join(settings.TRANSCRIPTION_DIR, f"{task.uni_key}.json")
+            return reject_upload(params, filename, error_msg, jwt_token)
         
-        # 更新任务路径
-        task = transcription_service.update_task(
-            uni_key=task.uni_key,
-            file_path=file_path,
-            result_path=result_path
+        # 创建任务并加入队列
+        task = await submit_ingested_upload(
+            transcription_service, ingestor, uni_key, validated_params, filename, jwt_token
         )
         
-        # 添加到Celery队列
-        process_transcription.delay(task.uni_key)
-        
         # 添加速率限制信息
-        add_rate_limit_headers(response, client_id)
+        await add_rate_limit_headers(response, task.client_id)
         
         # 返回成功响应
-        return SimplifiedTranscriptionTask(
-            task_id=task.task_id,
-            client_id=task.client_id,
-            filename=task.filename,
-            file_path=task.file_path,
-            file_size=task.file_size,
-            result_path=task.result_path,
-            created_at=task.created_at,
-            extra_params=task.extra_params,
-            code=SUCCESS,
-            message="任务创建成功"
-        )
+        return build_upload_response(task)
 
     except Exception as e:
         error_msg = f"处理请求失败: {str(e)}"
         logger.error(error_msg)
+        if 'task' not in locals():
+            ingestor.discard()
         
         # 发送webhook错误通知
         webhook_service.send_transcription_complete(
             extra_params={
                 "u_id": u_id,
                 "task_id": task_id,
-                "filename": file.filename if file else "unknown",
+                "filename": filename or "unknown",
                 "mode_id": mode_id,
                 "language": language,
                 "ai_mode": ai_mode,
@@ -228,7 +194,7 @@ async def create_transcription_task(
         return SimplifiedTranscriptionTask(
             task_id=task_id if task_id else "unknown",
             client_id=str(u_id) if u_id else "unknown",
-            filename=file.filename if file else "unknown",
+            filename=filename or "unknown",
             file_path="",
             file_size=None,
             result_path="",
@@ -270,7 +236,7 @@ async def download_result_file(
             )
     else:
         # 获取任务信息
-        task = transcription_service.get_task(uni_key)
+        task = await run_in_threadpool(transcription_service.get_task, uni_key)
         
         # 如果任务不存在
         if not task:
@@ -349,7 +315,7 @@ async def get_server_id(uni_key: str, content_id: str,
         Dict: 包含server_id的响应结果
     """
     # 获取任务信息
-    task = transcription_service.get_task(uni_key)
+    task = await run_in_threadpool(transcription_service.get_task, uni_key)
     
     # 任务不存在
     if not task:
@@ -500,66 +466,407 @@ def create_error_response(
         extra_params=extra_params
     )
 
-async def save_upload_file_with_ecm_check(file: UploadFile, uni_key: str) -> str:
+def reject_upload(
+    params: Dict[str, Any],
+    filename: str,
+    message: str,
+    jwt_token: Optional[str] = None
+) -> SimplifiedTranscriptionTask:
     """
-    保存上传的文件，并检查是否为ECM格式，如果是则转换为WAV
+    上传失败时发送webhook错误通知，并构造错误响应
     
     Args:
-        file: 上传的文件对象
+        params: extra_params参数字典
+        filename: 原始文件名
+        message: 错误信息
+        jwt_token: JWT令牌
+        
+    Returns:
+        SimplifiedTranscriptionTask: 错误响应
+    """
+    # 发送webhook错误通知
+    get_webhook_service().send_transcription_complete(
+        extra_params=params,
+        result=message,
+        code=ERROR_PROCESSING_FAILED,
+        use_time=0,
+        jwt_token=jwt_token
+    )
+    
+    task_id = params.get("task_id")
+    u_id = params.get("u_id")
+    return SimplifiedTranscriptionTask(
+        task_id=task_id if task_id else "unknown",
+        client_id=str(u_id) if u_id else "unknown",
+        filename=filename,
+        file_path="",
+        file_size=None,
+        result_path="",
+        created_at=datetime.now().isoformat(),
+        extra_params=params,
+        code=ERROR_PROCESSING_FAILED,
+        message=message
+    )
+
+def build_upload_response(task: TranscriptionTask) -> SimplifiedTranscriptionTask:
+    """
+    构造任务创建成功的响应
+    
+    Args:
+        task: 转写任务
+        
+    Returns:
+        SimplifiedTranscriptionTask: 成功响应
+    """
+    return SimplifiedTranscriptionTask(
+        task_id=task.task_id,
+        client_id=task.client_id,
+        filename=task.filename,
+        file_path=task.file_path,
+        file_size=task.file_size,
+        result_path=task.result_path,
+        created_at=task.created_at,
+        extra_params=task.extra_params,
+        code=SUCCESS,
+        message="任务创建成功"
+    )
+
+async def submit_ingested_upload(
+    transcription_service: TranscriptionService,
+    ingestor: UploadIngestor,
+    uni_key: str,
+    params: Dict[str, Any],
+    filename: str,
+    jwt_token: Optional[str] = None
+) -> TranscriptionTask:
+    """
+    为已入库并通过校验的文件创建任务，并加入Celery队列
+    
+    相同内容和转写参数已有结果时直接完成任务；相同内容正在转写时挂靠到该任务，不重复入队。
+    任务存储、结果缓存和入队都使用同步Redis客户端，在线程池中执行，不阻塞事件循环。
+    
+    Args:
+        transcription_service: 转写服务
+        ingestor: 入库结果
         uni_key: 任务唯一标识符
+        params: 验证后的参数字典
+        filename: 原始文件名
+        jwt_token: JWT令牌
         
     Returns:
-        str: 保存的文件路径（对于ECM格式会返回转换后的WAV路径）
-    """
-    # 获取原始文件名和后缀
-    original_filename = file.filename
-    filename_without_ext, file_ext = os.path.splitext(original_filename)
-    
-    # 保存原始文件以检查格式
-    temp_path = os.path.join(settings.UPLOAD_DIR, f"{uni_key}_temp")
-    with open(temp_path, "wb") as buffer:
-        # 读取文件的前20个字节来检查是否为ECM格式
-        header = await file.read(20)
-        await file.seek(0)  # 重置文件指针
+        TranscriptionTask: 创建的任务
+    """
+    # 创建任务，文件已就位，一次写入完整的任务信息
+    task = await run_in_threadpool(
+        transcription_service.create_task, **build_task_spec(ingestor, uni_key, params, filename, jwt_token)
+    )
+    
+    task, needs_enqueue = await prepare_created_task(transcription_service, task, ingestor, filename)
+    if needs_enqueue:
+        # 添加到Celery队列
+        await run_in_threadpool(enqueue_transcription, task.uni_key)
+    
+    return task
+
+def build_task_spec(
+    ingestor: UploadIngestor,
+    uni_key: str,
+    params: Dict[str, Any],
+    filename: str,
+    jwt_token: Optional[str] = None,
+    **extra
+) -> Dict[str, Any]:
+    """
+    由入库结果和验证后的参数构造 create_task 的参数
+    
+    Args:
+        ingestor: 入库结果
+        uni_key: 任务唯一标识符
+        params: 验证后的参数字典
+        filename: 原始文件名
+        jwt_token: JWT令牌
+        **extra: 其他任务字段（如batch_id）
         
-        # 写入临时文件
-        shutil.copyfileobj(file.file, buffer)
+    Returns:
+        Dict[str, Any]: create_task 的参数
+    """
+    u_id = params.get("u_id")
+    return dict(
+        task_id=params.get("task_id"),
+        file_path=ingestor.target_path,
+        result_path=os.path.join(settings.TRANSCRIPTION_DIR, f"{uni_key}.json"),
+        original_filename=filename,
+        client_id=str(u_id),
+        language=params.get("language", "auto"),
+        u_id=u_id,
+        mode_id=params.get("mode_id"),
+        ai_mode=params.get("ai_mode"),
+        speaker=params.get("speaker", False),
+        whisper_arch=params.get("whisper_arch"),
+        content_id=params.get("content_id"),
+        server_id=params.get("server_id"),
+        duration=params.get("duration"),
+        file_size=ingestor.size,
+        jwt_token=jwt_token,
+        uni_key=uni_key,
+        content_hash=ingestor.content_hash,
+        audio_info=ingestor.audio_info,
+        **extra
+    )
+
+async def prepare_created_task(
+    transcription_service: TranscriptionService,
+    task: TranscriptionTask,
+    ingestor: UploadIngestor,
+    filename: str
+) -> Tuple[TranscriptionTask, bool]:
+    """
+    任务创建后、入队前的处理：查询结果缓存，处理ECM格式
     
-    # 检查是否为ECM格式 (0x45, 0x43, 0x4D 对应 'E', 'C', 'M')
-    is_ecm = (header[0] == 0x45 and header[1] == 0x43 and header[2] == 0x4D)
+    相同内容和转写参数已有结果时直接完成任务；相同内容正在转写时挂靠到该任务，不需要入队。
+    读写Redis的步骤在线程池中执行。
     
-    if is_ecm:
-        logger.info(f"检测到ECM格式文件: {file.filename}")
-        # 为转换后的WAV文件创建路径，使用格式 taskid_filename.wav
-        wav_path = os.path.join(settings.UPLOAD_DIR, f"{uni_key}_{filename_without_ext}.wav")
-        # 调用转换函数
-        try:
-            ecm_to_wav(temp_path, wav_path)
-            logger.info(f"ECM文件已成功转换为WAV: {wav_path}")
-            # 删除临时的ECM文件
-            os.remove(temp_path)
-            return wav_path
-        except Exception as e:
-            logger.error(f"ECM转WAV失败: {str(e)}")
-            # 转换失败时，仍然使用原始文件但保持指定的命名格式
-            final_path = os.path.join(settings.UPLOAD_DIR, f"{uni_key}_{filename_without_ext}{file_ext}")
-            os.rename(temp_path, final_path)
-            return final_path
+    Args:
+        transcription_service: 转写服务
+        task: 已创建的任务
+        ingestor: 入库结果
+        filename: 原始文件名
+        
+    Returns:
+        Tuple[TranscriptionTask, bool]: (最新的任务信息, 是否需要加入转写队列)
+    """
+    uni_key = task.uni_key
+    cached_task = await run_in_threadpool(resolve_cached_task, transcription_service, task)
+    if cached_task:
+        return cached_task, False
+    
+    # 处理ECM格式：封装为Ogg/Opus交给worker解码，或直接解码为PCM
+    ogg_path = await remux_ecm_upload(ingestor, filename)
+    if ogg_path:
+        task = await run_in_threadpool(transcription_service.update_task, uni_key, file_path=ogg_path) or task
     else:
-        # 如果不是ECM格式，使用标准命名格式
-        final_path = os.path.join(settings.UPLOAD_DIR, f"{uni_key}_{filename_without_ext}{file_ext}")
-        os.rename(temp_path, final_path)
-        return final_path
+        pcm_path = await decode_ecm_upload(ingestor, uni_key, filename)
+        if pcm_path:
+            task = await run_in_threadpool(transcription_service.update_task, uni_key, pcm_path=pcm_path) or task
+    
+    return task, True
 
-async def validate_params_and_file(
+def resolve_cached_task(
+    transcription_service: TranscriptionService,
+    task: TranscriptionTask
+) -> Optional[TranscriptionTask]:
+    """
+    查询结果缓存（同步读写Redis，在线程池中调用）
+    
+    命中缓存时直接完成任务；相同内容正在转写时挂靠到进行中的任务；都不是时本任务成为该内容的转写者。
+    
+    Args:
+        transcription_service: 转写服务
+        task: 已创建的任务
+        
+    Returns:
+        Optional[TranscriptionTask]: 已完成或已挂靠的最新任务信息，需要转写时返回None
+    """
+    uni_key = task.uni_key
+    result_cache = get_result_cache_service()
+    cache_key = result_cache.cache_key_for_task(task)
+    if not cache_key:
+        return None
+    
+    # 命中缓存，直接完成任务
+    entry = result_cache.lookup(cache_key)
+    if entry and finish_cached_task(uni_key, entry):
+        result_cache.record(STATS_HITS)
+        return transcription_service.get_task(uni_key) or task
+    
+    # 相同内容正在转写，挂靠到进行中的任务，完成时一起返回结果
+    owner = result_cache.claim_or_attach(cache_key, uni_key)
+    if owner:
+        result_cache.record(STATS_COALESCED)
+        logger.info(f"任务 {uni_key} 与进行中的任务 {owner} 内容相同，等待其结果")
+        return transcription_service.update_task(
+            uni_key,
+            cached_from=owner,
+            progress_message="等待相同内容的任务完成"
+        ) or task
+    result_cache.record(STATS_MISSES)
+    return None
+
+async def receive_upload_form(
+    request: Request,
+    uni_key: str
+) -> Tuple[Dict[str, str], Optional[str], Optional[UploadIngestor], Optional[UploadRejectedError]]:
+    """
+    流式接收 /api/uploadfile 的表单：file 字段直接写入最终路径，其他字段保存在内存中
+    
+    写入时计算哈希、识别文件头并检查大小上限。表单中的文件可能在 extra_params 之前，
+    content_id 校验和音频探测由调用方得到参数后通过 ingestor.finish() 完成。
+    文件被拒绝时删除已写入的数据，并继续读取剩余的表单字段（用于错误通知）。
+    
+    Args:
+        request: 请求对象
+        uni_key: 任务唯一标识符
+        
+    Returns:
+        Tuple: (表单字段, 文件名, 已写入待校验的入库对象（没有file字段时为None）, 文件被拒绝的原因)
+        
+    Raises:
+        MultipartStreamError: 请求体格式错误、字段过大或包含多个文件
+    """
+    fields: Dict[str, str] = {}
+    value = bytearray()
+    filename = None
+    ingestor = None
+    rejection = None
+    try:
+        async for event, part, data in iter_multipart(request.headers, request.stream()):
+            if not part.is_file:
+                if event == PART_DATA:
+                    value += data
+                    if len(value) > MAX_FORM_FIELD_BYTES:
+                        raise MultipartStreamError(f"表单字段 {part.name} 过大")
+                elif event != PART_BEGIN:
+                    fields[part.name] = value.decode("utf-8", errors="replace")
+                    value.clear()
+                continue
+            if part.name != "file":
+                continue
+            if event == PART_BEGIN:
+                if ingestor is not None:
+                    raise MultipartStreamError("只能上传一个文件")
+                filename = part.filename
+                ingestor = UploadIngestor(
+                    build_upload_path(uni_key, filename),
+                    header_validator=lambda header: check_upload_header(header, filename)
+                )
+                await ingestor.open()
+            elif rejection:
+                # 已被拒绝的文件不再写入
+                continue
+            elif event == PART_DATA:
+                try:
+                    await ingestor.write(data)
+                except UploadRejectedError as e:
+                    rejection = e
+                    await ingestor.close()
+                    ingestor.discard()
+            else:
+                await ingestor.close()
+    except BaseException:
+        if ingestor is not None:
+            await ingestor.close()
+            ingestor.discard()
+        raise
+    if ingestor is not None:
+        await ingestor.close()
+    return fields, filename, ingestor, rejection
+
+def check_upload_header(header: bytes, filename: Optional[str]) -> bool:
+    """
+    按文件头魔数判断格式，不信任扩展名和客户端声明的MIME类型
+    
+    Args:
+        header: 文件开头的字节
+        filename: 原始文件名（用于日志）
+        
+    Returns:
+        bool: 是否为支持的音频格式
+    """
+    if is_audio_header(header):
+        return True
+    logger.error(f"无效的文件格式: {filename}")
+    return False
+
+async def ingest_upload_file(
     file: UploadFile,
+    uni_key: str,
     params_dict: Dict[str, Any]
-) -> Optional[Dict[str, Any]]:
+) -> UploadIngestor:
     """
-    验证参数和文件
+    单次读取上传文件并写入最终路径，同时完成content_id、文件格式和大小的校验
     
     Args:
         file: 上传的文件对象
+        uni_key: 任务唯一标识符
+        params_dict: 验证后的参数字典
+        
+    Returns:
+        UploadIngestor: 入库结果（路径、大小、是否ECM等）
+        
+    Raises:
+        UploadRejectedError: 文件未通过校验，已写入的数据会被删除
+    """
+    ingestor = UploadIngestor(
+        build_upload_path(uni_key, file.filename),
+        u_id=params_dict.get("u_id"),
+        expected_content_id=params_dict.get("content_id"),
+        header_validator=lambda header: check_upload_header(header, file.filename)
+    )
+    async with ingestor:
+        await ingestor.write_upload_file(file)
+    return ingestor
+
+async def remux_ecm_upload(ingestor: UploadIngestor, filename: str) -> Optional[str]:
+    """
+    如果上传的是ECM格式且 ECM_STORAGE_FORMAT=ogg，将Opus帧重新封装为Ogg/Opus（不解码）
+    
+    封装只是复制帧数据，在线程池中执行；成功后删除原始ECM文件，解码只在worker的音频加载阶段进行一次。
+    
+    Args:
+        ingestor: 入库结果
+        filename: 原始文件名
+        
+    Returns:
+        Optional[str]: Ogg/Opus文件路径，不需要或封装失败时返回None（保留原始ECM文件）
+    """
+    if not ingestor.is_ecm or settings.ECM_STORAGE_FORMAT != "ogg":
+        return None
+    
+    ogg_path = get_ogg_path(ingestor.target_path)
+    try:
+        loop = asyncio.get_running_loop()
+        duration = await loop.run_in_executor(None, ecm_to_ogg, ingestor.target_path, ogg_path)
+    except Exception as e:
+        logger.error(f"ECM封装为Ogg/Opus失败，保留原始文件 {filename}: {str(e)}")
+        return None
+    
+    os.remove(ingestor.target_path)
+    logger.info(f"ECM文件已封装为Ogg/Opus: {ogg_path}, 时长: {duration:.2f}秒")
+    return ogg_path
+
+async def decode_ecm_upload(ingestor: UploadIngestor, uni_key: str, filename: str) -> Optional[str]:
+    """
+    如果上传的是ECM格式，直接解码为16kHz PCM（不生成WAV）
+    
+    启用预处理时由CPU预处理队列解码，这里不做处理；否则在进程池中解码，不阻塞事件循环。
+    原始ECM文件保留为任务的file_path。
+    
+    Args:
+        ingestor: 入库结果
+        uni_key: 任务唯一标识符
+        filename: 原始文件名
+        
+    Returns:
+        Optional[str]: PCM文件路径，不需要或解码失败时返回None（worker会直接解码ECM）
+    """
+    if not ingestor.is_ecm or settings.AUDIO_PREPROCESS_ENABLED:
+        return None
+    
+    logger.info(f"检测到ECM格式文件: {filename}")
+    pcm_path = get_pcm_path(uni_key)
+    try:
+        duration = await ecm_to_pcm_async(ingestor.target_path, pcm_path)
+        logger.info(f"ECM文件已解码为PCM: {pcm_path}, 时长: {duration:.2f}秒")
+        return pcm_path
+    except Exception as e:
+        logger.error(f"ECM解码失败: {str(e)}")
+        return None
+
+def validate_params(params_dict: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    验证上传参数（不读取文件）
+    
+    Args:
         params_dict: 参数字典
     
     Returns:
@@ -568,13 +875,9 @@ async def validate_params_and_file(
     # 提取参数
     u_id = params_dict.get("u_id")
     task_id = params_dict.get("task_id")
-    language = params_dict.get("language", "auto")
     mode_id = params_dict.get("mode_id")
     ai_mode = params_dict.get("ai_mode")
-    speaker = params_dict.get("speaker", False)
     whisper_arch = params_dict.get("whisper_arch")
-    content_id = params_dict.get("content_id")
-    server_id = params_dict.get("server_id")
     
     # 验证whisper_arch
     if whisper_arch not in ARCH_LIST:
@@ -586,57 +889,25 @@ async def validate_params_and_file(
         logger.error("缺少必要的参数")
         return None
     
-    # 验证内容ID
-    if content_id and settings.CONTENT_ID_VERIFICATION_ENABLED:
-        # 读取文件内容
-        file_content = await file.read()
-        is_valid = validate_content_id(file_content, u_id, content_id)
-        # 重置文件指针
-        await file.seek(0)
-        
-        if not is_valid:
-            logger.error(f"内容验证失败: {content_id}")
-            return None
-    
-    # 检查文件前20个字节，判断是否为ECM格式
-    header = await file.read(20)
-    await file.seek(0)  # 重置文件指针
-    
-    is_ecm = (len(header) >= 3 and header[0] == 0x45 and header[1] == 0x43 and header[2] == 0x4D)
-    
-    # 如果是ECM格式，不需要继续验证音频格式
-    if not is_ecm:
-        # 验证文件格式
-        if not await validate_audio_file(file):
-            logger.error(f"无效的文件格式: {file.filename}")
-            return None
-    
-    # 检查文件大小
-    file_size_bytes = await get_file_size_bytes(file)
-    file_size_mb = file_size_bytes / (1024 * 1024)
-    
-    # 检查文件是否太小
-    if file_size_bytes < settings.MIN_UPLOAD_SIZE_BYTES:
-        logger.error(f"文件太小: {file_size_bytes} 字节")
-        return None
-    
-    # 检查文件是否太大
-    if file_size_mb > settings.MAX_UPLOAD_SIZE_MB:
-        logger.error(f"文件太大: {file_size_mb} MB")
-        return None
-    
-    # 返回验证通过的参数和文件大小
-    params_dict["file_size_bytes"] = file_size_bytes
     return params_dict
 
-def add_rate_limit_headers(response: Response, client_id: str) -> None:
+async def add_rate_limit_headers(response: Response, client_id: str) -> None:
     """
-    向响应头添加速率限制信息
+    向响应头添加速率限制信息和转写队列状态（X-Queue-*）
+    
+    队列状态通过同步Redis客户端读取，在线程池中执行。
     
     Args:
         response: FastAPI响应对象
         client_id: 客户端ID
     """
+    admission_service = get_admission_service()
+    if admission_service.enabled:
+        try:
+            response.headers.update(queue_headers(await run_in_threadpool(admission_service.get_status)))
+        except Exception as e:
+            logger.error(f"读取队列状态失败: {str(e)}")
+    
     # rate_limit_info = cloud_stats_service.get_rate_limit_info(client_id)
     # if rate_limit_info:
     #     response.headers["X-Rate-Limit-Audio-Seconds"] = str(rate_limit_info.limit_audio_seconds)
@@ -660,7 +931,7 @@ async def delete_task(
         uni_key: 任务唯一标识符
     """
     # 尝试删除任务
-    success = transcription_service.delete_task(uni_key)
+    success = await run_in_threadpool(transcription_service.delete_task, uni_key)
     
     if not success:
         raise HTTPException(
@@ -682,7 +953,7 @@ async def retry_task(
         uni_key: 任务唯一标识符
     """
     # 重置任务状态
-    task = transcription_service.reset_task(uni_key)
+    task = await run_in_threadpool(transcription_service.reset_task, uni_key)
     
     if not task:
         raise HTTPException(
@@ -691,6 +962,6 @@ async def retry_task(
         )
     
     # 将任务添加到Celery队列
-    process_transcription.delay(uni_key)
+    await run_in_threadpool(enqueue_transcription, uni_key)
     
     return {"success": True, "message": "任务已重新提交处理"}
\ No newline at end of file
@@ -21,6 +21,15 @@ class TranscriptionExtraParams(BaseModel):
     free_gpu_memory: Optional[float] = Field(None, description="剩余显存（MB）")
     concurrency: Optional[int] = Field(None, description="Celery并发进程数")
 
+class ResultSummary(BaseModel):
+    """
+    转写结果摘要（完整结果只保存在结果文件中）
+    """
+    segments: int = Field(0, description="分段数")
+    characters: int = Field(0, description="文本字符数")
+    speakers: int = Field(0, description="说话人数")
+    language: Optional[str] = Field(None, description="识别出的语言")
+
 class TranscriptionTask(BaseModel):
     """
     转写任务详情
@@ -40,13 +49,24 @@ class TranscriptionTask(BaseModel):
     progress: Optional[int] = Field(0, description="处理进度（0-100）")
     progress_message: Optional[str] = Field(None, description="进度信息")
     error_message: Optional[str] = Field(None, description="错误信息（如果失败）")
-    audio_duration: Optional[float] = Field(None, description="音频时长（秒）")
+    audio_duration: Optional[float] = Field(None, description="音频时长（秒），上传时由文件头探测得出，转写完成后更新")
+    codec: Optional[str] = Field(None, description="音频编码（上传时探测）")
+    sample_rate: Optional[int] = Field(None, description="采样率（Hz，上传时探测）")
+    channels: Optional[int] = Field(None, description="声道数（上传时探测）")
+    pcm_path: Optional[str] = Field(None, description="预解码的16kHz单声道float32 PCM文件路径")
     processing_time: Optional[float] = Field(None, description="处理用时（秒）")
+    result_summary: Optional[ResultSummary] = Field(None, description="转写结果摘要，完整结果见 result_path")
     extra_params: Optional[TranscriptionExtraParams] = Field(None, description="额外参数")
     code: int = Field(0, description="状态码：0表示成功，其他值表示失败")
     message: str = Field("", description="状态消息，成功时为空，失败时为错误信息")
     retry_count: int = Field(0, description="重试次数，用于追踪任务被重试的次数")
     jwt_token: Optional[str] = Field(None, description="JWT令牌，用于webhook回调认证")
+    content_hash: Optional[str] = Field(None, description="全文件SHA-256，用于结果缓存")
+    cached_from: Optional[str] = Field(None, description="复用结果的来源任务uni_key（命中缓存或合并到进行中的任务时）")
+    batch_id: Optional[str] = Field(None, description="所属批次ID（批量提交时）")
+    item_webhook: bool = Field(True, description="是否为本任务单独发送webhook（批量提交时可只发送批次汇总webhook）")
+    claimed_by: Optional[str] = Field(None, description="正在处理本任务的Celery任务ID")
+    version: int = Field(0, description="版本号，每次写入加1")
 
     class Config:
         json_schema_extra = {
@@ -140,6 +160,17 @@ class RateLimitInfo(BaseModel):
     reset_requests: float  # 请求次数限制重置时间（小时）
     retry_after: Optional[float] = None  # 如果被限制，需要等待的时间（秒）
 
+class QueueStatus(BaseModel):
+    """
+    转写队列状态（准入控制）
+    """
+    backlog_audio_seconds: float = Field(..., description="已入队未完成任务的音频总时长（秒）")
+    rtf: float = Field(..., description="实时率：处理耗时/音频时长的指数加权平均")
+    workers: int = Field(..., description="心跳在线的转写worker并发数之和")
+    estimated_wait_seconds: float = Field(..., description="新任务的预计排队时间（秒）")
+    max_wait_seconds: int = Field(..., description="允许的最大排队时间（秒）")
+    retry_after: Optional[int] = Field(None, description="超过上限时建议的重试等待时间（秒）")
+
 class TranscriptionResponse(BaseModel):
     """
     转写任务响应，包含任务信息和速率限制信息
@@ -174,4 +205,26 @@ class RateLimitConfig(BaseModel):
     rpm: int = Field(20, description="每分钟请求数")
     rpd: int = Field(2000, description="每日请求数")
     ash: int = Field(7200, description="每小时音频秒数")
-    asd: int = Field(28800, description="每日音频秒数") 
\ No newline at end of file
+    asd: int = Field(28800, description="每日音频秒数") 
+class BatchUploadItem(BaseModel):
+    """
+    批量提交中单个文件的受理结果
+    """
+    index: int = Field(..., description="文件在请求中的序号（从0开始）")
+    filename: str = Field(..., description="原始文件名")
+    uni_key: Optional[str] = Field(None, description="任务唯一标识符，文件被拒绝时为空")
+    task_id: Optional[str] = Field(None, description="任务ID")
+    code: int = Field(0, description="状态码：0表示已受理，其他值表示被拒绝")
+    message: str = Field("", description="状态消息")
+
+class BatchUploadResponse(BaseModel):
+    """
+    批量提交的响应
+    """
+    batch_id: str = Field(..., description="批次ID，用于查询批次状态")
+    total: int = Field(..., description="文件总数")
+    accepted: int = Field(..., description="已创建任务的文件数")
+    rejected: int = Field(..., description="被拒绝的文件数")
+    items: List[BatchUploadItem] = Field(..., description="每个文件的受理结果")
+    code: int = Field(0, description="状态码：0表示至少有一个文件被受理")
+    message: str = Field("", description="状态消息")
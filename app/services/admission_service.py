@@ -0,0 +1,373 @@
+import json
+import math
+import os
+import socket
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+from app.schemas.transcription import QueueStatus, TranscriptionTask
+
+logger = logging.getLogger(__name__)
+
+# 为任务预留积压时长（同一任务只预留一次，重试或重新入队不会重复计入），同时记录预留时间
+# KEYS[1]: 预留表  KEYS[2]: 积压总时长  KEYS[3]: 预留时间（有序集合）
+# ARGV[1]: 任务uni_key  ARGV[2]: 音频时长（秒）  ARGV[3]: 当前时间戳
+RESERVE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('INCRBYFLOAT', KEYS[2], ARGV[2])
+    redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+end
+return 1
+"""
+
+# 任务结束时释放预留的积压时长
+# KEYS[1]: 预留表  KEYS[2]: 积压总时长  KEYS[3]: 预留时间
+# ARGV[1]: 任务uni_key
+RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[3], ARGV[1])
+local seconds = redis.call('HGET', KEYS[1], ARGV[1])
+if not seconds then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+if tonumber(redis.call('INCRBYFLOAT', KEYS[2], -tonumber(seconds))) < 0 then
+    redis.call('SET', KEYS[2], 0)
+end
+return 1
+"""
+
+# 更新实时率（处理耗时/音频时长）的指数加权平均
+# KEYS[1]: 实时率键
+# ARGV[1]: 本次实时率  ARGV[2]: 平滑系数
+RTF_EWMA_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+local value = tonumber(ARGV[1])
+if current then
+    value = tonumber(current) + tonumber(ARGV[2]) * (value - tonumber(current))
+end
+redis.call('SET', KEYS[1], tostring(value))
+return tostring(value)
+"""
+
+BACKLOG_KEY = "backlog_seconds"
+RESERVED_KEY = "reserved"
+RESERVED_AT_KEY = "reserved_at"
+RTF_KEY = "rtf"
+WORKERS_KEY = "workers"
+# 每次核对或释放的预留数
+RECONCILE_BATCH_SIZE = 500
+
+
+class AdmissionService:
+    """
+    基于处理能力的上传准入控制
+
+    积压量以音频秒数计：任务入队时按探测到的时长预留，任务结束或被删除时释放。
+    worker被强制终止、消息丢失等情况下任务不会走到结束处理，预留会一直留在积压中：
+    读取队列状态时释放超过 ADMISSION_RESERVATION_MAX_AGE_SECONDS 的预留，定期清理任务中释放任务已不存在或已结束的预留。
+    转写worker完成任务时更新实时率（处理耗时/音频时长）的指数加权平均，并定期上报心跳和并发数。
+    预计等待时间 = 积压音频秒数 × 实时率 / 在线并发数，超过上限时拒绝新的上传并给出 Retry-After。
+    """
+
+    def __init__(self):
+        redis_service = RedisService()
+        self.storage = redis_service.get_client(prefix="admission:")
+        self.enabled = settings.ADMISSION_CONTROL_ENABLED
+        self.max_wait_seconds = settings.ADMISSION_MAX_WAIT_SECONDS
+        self.heartbeat_ttl = settings.WORKER_HEARTBEAT_INTERVAL * 3
+        self.reservation_max_age = settings.ADMISSION_RESERVATION_MAX_AGE_SECONDS
+        self._reserve = self.storage.redis.register_script(RESERVE_SCRIPT)
+        self._release = self.storage.redis.register_script(RELEASE_SCRIPT)
+        self._rtf_ewma = self.storage.redis.register_script(RTF_EWMA_SCRIPT)
+
+    def _keys(self, *names: str) -> List[str]:
+        return [self.storage.get_full_key(name) for name in names]
+
+    @staticmethod
+    def estimate_audio_seconds(task: TranscriptionTask) -> float:
+        """
+        估计任务的音频时长：优先使用上传时探测的时长，其次是客户端声明的时长
+
+        Args:
+            task: 转写任务
+
+        Returns:
+            float: 音频时长（秒）
+        """
+        if task.audio_duration:
+            return task.audio_duration
+        if task.extra_params and task.extra_params.duration:
+            return task.extra_params.duration
+        return settings.ADMISSION_DEFAULT_AUDIO_SECONDS
+
+    def reserve(self, tasks: List[Optional[TranscriptionTask]]) -> None:
+        """
+        任务入队时计入积压
+
+        Args:
+            tasks: 入队的任务
+        """
+        try:
+            keys = self._keys(RESERVED_KEY, BACKLOG_KEY, RESERVED_AT_KEY)
+            now = time.time()
+            pipe = self.storage.redis.pipeline(transaction=False)
+            for task in tasks:
+                if task:
+                    self._reserve(keys=keys, args=[task.uni_key, self.estimate_audio_seconds(task), now], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"计入积压失败: {str(e)}")
+
+    def release(self, uni_key: str) -> None:
+        """
+        任务结束时从积压中扣除（没有预留过的任务不受影响）
+
+        Args:
+            uni_key: 任务唯一标识符
+        """
+        self.release_many([uni_key])
+
+    def release_many(self, uni_keys: List[str]) -> int:
+        """
+        通过一个pipeline从积压中扣除多个任务
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            int: 实际释放的预留数
+        """
+        if not uni_keys:
+            return 0
+        try:
+            keys = self._keys(RESERVED_KEY, BACKLOG_KEY, RESERVED_AT_KEY)
+            pipe = self.storage.redis.pipeline(transaction=False)
+            for uni_key in uni_keys:
+                self._release(keys=keys, args=[uni_key], client=pipe)
+            return sum(pipe.execute())
+        except Exception as e:
+            logger.error(f"扣除积压失败 {uni_keys[:10]}: {str(e)}")
+            return 0
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        释放任务已不存在（被删除或过期）或已结束的预留（定期清理任务中调用）
+
+        Returns:
+            Dict[str, int]: 检查和释放的预留数
+        """
+        from app.services.task_store import get_task_store
+        from app.services.transcription_service import TERMINAL_STATUSES
+
+        store = get_task_store()
+        stats = {"checked": 0, "released": 0}
+        uni_keys = [
+            uni_key.decode() for uni_key in
+            self.storage.redis.hkeys(self.storage.get_full_key(RESERVED_KEY))
+        ]
+        for start in range(0, len(uni_keys), RECONCILE_BATCH_SIZE):
+            batch = uni_keys[start:start + RECONCILE_BATCH_SIZE]
+            statuses = store.load_statuses(batch)
+            leaked = [
+                uni_key for uni_key, status in zip(batch, statuses)
+                if status is None or status in TERMINAL_STATUSES
+            ]
+            stats["checked"] += len(batch)
+            stats["released"] += self.release_many(leaked)
+        if stats["released"]:
+            logger.warning(f"释放了 {stats['released']} 个任务已不存在或已结束的积压预留")
+        return stats
+
+    def record_throughput(self, audio_seconds: float, processing_seconds: float) -> None:
+        """
+        转写完成时更新实时率
+
+        Args:
+            audio_seconds: 音频时长（秒）
+            processing_seconds: 处理耗时（秒）
+        """
+        if not audio_seconds or audio_seconds <= 0 or processing_seconds <= 0:
+            return
+        try:
+            self._rtf_ewma(
+                keys=self._keys(RTF_KEY),
+                args=[processing_seconds / audio_seconds, settings.ADMISSION_RTF_ALPHA]
+            )
+        except Exception as e:
+            logger.error(f"更新实时率失败: {str(e)}")
+
+    def heartbeat(self, worker_id: str, slots: int) -> None:
+        """
+        上报转写worker心跳
+
+        Args:
+            worker_id: worker标识
+            slots: 并发数
+        """
+        try:
+            self.storage.redis.hset(
+                self.storage.get_full_key(WORKERS_KEY),
+                worker_id,
+                json.dumps({"slots": slots, "ts": time.time()})
+            )
+        except Exception as e:
+            logger.error(f"上报worker心跳失败 {worker_id}: {str(e)}")
+
+    def get_status(self) -> QueueStatus:
+        """
+        读取积压、实时率和在线并发数，计算预计等待时间
+
+        Returns:
+            QueueStatus: 队列状态，超过等待上限时 retry_after 不为空
+        """
+        pipe = self.storage.redis.pipeline(transaction=False)
+        pipe.get(self.storage.get_full_key(BACKLOG_KEY))
+        pipe.get(self.storage.get_full_key(RTF_KEY))
+        pipe.hgetall(self.storage.get_full_key(WORKERS_KEY))
+        pipe.zrangebyscore(
+            self.storage.get_full_key(RESERVED_AT_KEY), "-inf", time.time() - self.reservation_max_age,
+            start=0, num=RECONCILE_BATCH_SIZE
+        )
+        backlog, rtf, workers, stale = pipe.execute()
+
+        if stale:
+            # 预留时间过长的任务（worker被强制终止、消息丢失等）不再计入积压
+            released = self.release_many([uni_key.decode() for uni_key in stale])
+            if released:
+                logger.warning(f"释放了 {released} 个超过 {self.reservation_max_age}秒 的积压预留")
+            backlog = self.storage.redis.get(self.storage.get_full_key(BACKLOG_KEY))
+
+        backlog = max(float(backlog or 0), 0.0)
+        rtf = float(rtf) if rtf else settings.ADMISSION_DEFAULT_RTF
+        slots = self._count_live_slots(workers)
+        # 没有心跳时（例如worker未上报）按配置的并发数估计，不因为缺少心跳拒绝所有上传
+        effective_slots = slots or settings.CELERY_WORKER_CONCURRENCY
+        wait = backlog * rtf / max(effective_slots, 1)
+
+        retry_after = None
+        if self.enabled and wait > self.max_wait_seconds:
+            # 积压每秒减少 effective_slots/rtf 音频秒，预计等待时间每秒减少1秒
+            retry_after = max(math.ceil(wait - self.max_wait_seconds), 1)
+        return QueueStatus(
+            backlog_audio_seconds=round(backlog, 1),
+            rtf=round(rtf, 4),
+            workers=slots,
+            estimated_wait_seconds=round(wait, 1),
+            max_wait_seconds=self.max_wait_seconds,
+            retry_after=retry_after
+        )
+
+    def _count_live_slots(self, workers: Dict[bytes, bytes]) -> int:
+        """统计心跳未过期的worker并发数之和，顺便删除过期的心跳"""
+        now = time.time()
+        slots = 0
+        stale = []
+        for worker_id, value in workers.items():
+            try:
+                info = json.loads(value)
+            except ValueError:
+                stale.append(worker_id)
+                continue
+            if now - info.get("ts", 0) > self.heartbeat_ttl:
+                stale.append(worker_id)
+            else:
+                slots += int(info.get("slots", 0))
+        if stale:
+            self.storage.redis.hdel(self.storage.get_full_key(WORKERS_KEY), *stale)
+        return slots
+
+    def check_admission(self) -> Optional[QueueStatus]:
+        """
+        检查是否接受新的上传
+
+        Returns:
+            Optional[QueueStatus]: 队列状态，未启用或读取失败时返回None（不影响上传）
+
+        Raises:
+            HTTPException: 预计等待时间超过上限，状态码503，带 Retry-After 和 X-Queue-* 响应头
+        """
+        if not self.enabled:
+            return None
+        try:
+            status = self.get_status()
+        except Exception as e:
+            logger.error(f"读取队列状态失败，跳过准入检查: {str(e)}")
+            return None
+        if status.retry_after:
+            logger.warning(
+                f"队列积压过多，拒绝上传：积压 {status.backlog_audio_seconds}秒音频，"
+                f"预计等待 {status.estimated_wait_seconds}秒"
+            )
+            raise HTTPException(
+                status_code=503,
+                detail="转写队列繁忙，请稍后重试",
+                headers=queue_headers(status)
+            )
+        return status
+
+
+def queue_headers(status: QueueStatus) -> Dict[str, str]:
+    """
+    队列状态响应头
+
+    Args:
+        status: 队列状态
+
+    Returns:
+        Dict[str, str]: 响应头
+    """
+    headers = {
+        "X-Queue-Backlog-Seconds": str(status.backlog_audio_seconds),
+        "X-Queue-Estimated-Wait": str(status.estimated_wait_seconds),
+        "X-Queue-Workers": str(status.workers)
+    }
+    if status.retry_after:
+        headers["Retry-After"] = str(status.retry_after)
+    return headers
+
+
+def start_worker_heartbeat(slots: int) -> threading.Thread:
+    """
+    在转写worker主进程中启动心跳线程
+
+    Args:
+        slots: worker并发数
+
+    Returns:
+        threading.Thread: 心跳线程（守护线程）
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    service = get_admission_service()
+
+    def run():
+        while True:
+            service.heartbeat(worker_id, slots)
+            time.sleep(settings.WORKER_HEARTBEAT_INTERVAL)
+
+    thread = threading.Thread(target=run, name="worker-heartbeat", daemon=True)
+    thread.start()
+    logger.info(f"已启动worker心跳: {worker_id}，并发数: {slots}")
+    return thread
+
+
+# 单例模式
+_admission_service = None
+
+
+def get_admission_service() -> AdmissionService:
+    """
+    获取AdmissionService实例（单例模式）
+
+    Returns:
+        AdmissionService: 准入控制服务实例
+    """
+    global _admission_service
+    if _admission_service is None:
+        _admission_service = AdmissionService()
+    return _admission_service
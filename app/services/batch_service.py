@@ -0,0 +1,223 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+from app.schemas.transcription import TranscriptionTask
+from app.utils import get_download_url
+from app.utils.error_codes import SUCCESS, ERROR_TASK_NOT_FOUND, get_error_message
+
+logger = logging.getLogger(__name__)
+
+# 记录一个任务已结束，所有任务都结束时返回1（只有最后一个结束的任务会得到1）
+# 同时刷新批次记录和已结束集合的过期时间，批次在最后一个任务结束后保留 TASK_RECORD_TTL_HOURS
+# KEYS[1]: 已结束任务集合键  KEYS[2]: 批次记录键
+# ARGV[1]: 任务uni_key  ARGV[2]: 批次任务总数  ARGV[3]: 过期时间（秒），0表示不过期
+MARK_DONE_SCRIPT = """
+local added = redis.call('SADD', KEYS[1], ARGV[1])
+local ttl = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+if added == 0 then
+    return 0
+end
+if redis.call('SCARD', KEYS[1]) == tonumber(ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
+class BatchService:
+    """
+    批量提交的批次记录
+
+    批次记录保存本批次的任务列表、被拒绝的文件和回调设置；每个任务结束时记入已结束集合，
+    最后一个任务结束时由调用方发送一次汇总webhook。
+    批次记录和已结束集合与任务记录一样保留 TASK_RECORD_TTL_HOURS，每个任务结束时刷新过期时间。
+    """
+
+    def __init__(self):
+        redis_service = RedisService()
+        self.storage = redis_service.get_client(prefix="batch:")
+        self._mark_done = self.storage.redis.register_script(MARK_DONE_SCRIPT)
+        # 0表示不过期
+        self.ttl = settings.TASK_RECORD_TTL_HOURS * 3600
+
+    def create_batch(
+        self,
+        batch_id: str,
+        client_id: str,
+        uni_keys: List[str],
+        rejected: List[Dict[str, Any]],
+        batch_webhook: bool,
+        jwt_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        创建批次记录（在任务入队之前调用，保证任务结束时能找到批次）
+
+        Args:
+            batch_id: 批次ID
+            client_id: 客户端ID
+            uni_keys: 本批次创建的任务
+            rejected: 未通过校验、没有创建任务的文件
+            batch_webhook: 是否在批次完成时发送汇总webhook
+            jwt_token: JWT令牌，用于webhook回调认证
+
+        Returns:
+            Dict[str, Any]: 批次记录
+        """
+        batch = {
+            "batch_id": batch_id,
+            "client_id": client_id,
+            "uni_keys": uni_keys,
+            "rejected": rejected,
+            "batch_webhook": batch_webhook,
+            "jwt_token": jwt_token,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": None
+        }
+        self.storage.save(batch_id, batch, ttl=self.ttl or None)
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取批次记录
+
+        Args:
+            batch_id: 批次ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 批次记录，不存在或已过期时返回None
+        """
+        batch = self.storage.get(batch_id)
+        if batch and self.is_expired(batch):
+            # 设置过期时间之前写入的记录不会自动过期
+            self.storage.delete(batch_id)
+            self.storage.delete(f"{batch_id}:done")
+            return None
+        return batch
+
+    def is_expired(self, batch: Dict[str, Any]) -> bool:
+        """
+        已完成的批次是否超过保留时间
+
+        Args:
+            batch: 批次记录
+
+        Returns:
+            bool: 是否已过期
+        """
+        completed_at = batch.get("completed_at")
+        if not self.ttl or not completed_at:
+            return False
+        return datetime.fromisoformat(completed_at) + timedelta(seconds=self.ttl) < datetime.now()
+
+    def mark_done(self, batch_id: str, uni_key: str) -> Optional[Dict[str, Any]]:
+        """
+        记录批次中的一个任务已结束
+
+        同一任务重复记录不会重复计数，因此批次完成只会被触发一次。
+
+        Args:
+            batch_id: 批次ID
+            uni_key: 已结束的任务
+
+        Returns:
+            Optional[Dict[str, Any]]: 本次调用使批次完成时返回批次记录，否则返回None
+        """
+        batch = self.get_batch(batch_id)
+        if not batch:
+            logger.warning(f"批次不存在: {batch_id}")
+            return None
+        try:
+            finished = self._mark_done(
+                keys=[self.storage.get_full_key(f"{batch_id}:done"), self.storage.get_full_key(batch_id)],
+                args=[uni_key, len(batch["uni_keys"]), self.ttl]
+            )
+        except Exception as e:
+            logger.error(f"记录批次任务结束失败 {batch_id}/{uni_key}: {str(e)}")
+            return None
+        if not finished:
+            return None
+        return self.complete_batch(batch)
+
+    def complete_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        记录批次完成时间，批次从此时起保留 TASK_RECORD_TTL_HOURS
+
+        Args:
+            batch: 批次记录
+
+        Returns:
+            Dict[str, Any]: 更新后的批次记录
+        """
+        batch["completed_at"] = datetime.now().isoformat()
+        self.storage.save(batch["batch_id"], batch, ttl=self.ttl or None)
+        return batch
+
+    def summarize(self, batch: Dict[str, Any], tasks: List[Optional[TranscriptionTask]]) -> Dict[str, Any]:
+        """
+        汇总批次中每个文件的状态，用于批次webhook和批次查询接口
+
+        Args:
+            batch: 批次记录
+            tasks: 与 batch["uni_keys"] 顺序一致的任务信息
+
+        Returns:
+            Dict[str, Any]: 批次汇总（不包含JWT令牌）
+        """
+        items = []
+        counts = {"completed": 0, "failed": 0, "pending": 0}
+        for uni_key, task in zip(batch["uni_keys"], tasks):
+            if not task:
+                counts["failed"] += 1
+                items.append({
+                    "uni_key": uni_key, "task_id": None, "filename": None, "status": "failed",
+                    "code": ERROR_TASK_NOT_FOUND, "message": get_error_message(ERROR_TASK_NOT_FOUND), "result": ""
+                })
+                continue
+            status = task.status if task.status in ("completed", "failed") else "pending"
+            counts[status] += 1
+            items.append({
+                "uni_key": uni_key,
+                "task_id": task.task_id,
+                "filename": task.filename,
+                "status": task.status,
+                "code": task.code,
+                "message": task.message,
+                "result": get_download_url(task.result_path) if task.status == "completed" and task.code == SUCCESS else ""
+            })
+        return {
+            "batch_id": batch["batch_id"],
+            "client_id": batch.get("client_id"),
+            "total": len(batch["uni_keys"]) + len(batch["rejected"]),
+            "completed": counts["completed"],
+            "failed": counts["failed"],
+            "pending": counts["pending"],
+            "rejected": len(batch["rejected"]),
+            "created_at": batch["created_at"],
+            "completed_at": batch.get("completed_at"),
+            "items": items,
+            "rejected_items": batch["rejected"]
+        }
+
+
+# 单例模式
+_batch_service = None
+
+
+def get_batch_service() -> BatchService:
+    """
+    获取BatchService实例（单例模式）
+
+    Returns:
+        BatchService: 批次服务实例
+    """
+    global _batch_service
+    if _batch_service is None:
+        _batch_service = BatchService()
+    return _batch_service
@@ -0,0 +1,71 @@
+import time
+import logging
+from typing import Callable, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressWriter:
+    """
+    合并转写进度的写入
+
+    处理器每完成一个VAD分段都会报告进度，逐条写入任务存储会产生大量写入和推送事件。
+    两次写入间隔小于 min_interval 时只记住最新的进度，在下一次报告时（已超过间隔）写入，中间的进度被合并；
+    完成（100%）和 flush() 总是立即写入，失败前调用 flush() 保留最后的进度。
+    写入返回False（任务已不属于本worker或已结束）后不再写入。
+    """
+
+    __slots__ = ("_write", "min_interval", "_last_write", "_written", "_pending", "active", "writes", "coalesced")
+
+    def __init__(self, write: Callable[[int, str], bool], min_interval: Optional[float] = None):
+        """
+        Args:
+            write: 写入进度的函数，接收进度百分比和消息，返回是否已写入
+            min_interval: 两次写入的最小间隔（秒），默认为 TASK_PROGRESS_MIN_INTERVAL，0表示不合并
+        """
+        self._write = write
+        self.min_interval = settings.TASK_PROGRESS_MIN_INTERVAL if min_interval is None else min_interval
+        self._last_write: Optional[float] = None
+        self._written: Optional[Tuple[int, str]] = None
+        self._pending: Optional[Tuple[int, str]] = None
+        self.active = True
+        self.writes = 0
+        self.coalesced = 0
+
+    def __call__(self, progress: int, message: str) -> None:
+        """报告进度（可直接作为 WhisperXProcessor.process_audio 的 callback）"""
+        self.update(progress, message)
+
+    def update(self, progress: int, message: str) -> None:
+        """
+        报告进度，未超过写入间隔时合并
+
+        Args:
+            progress: 进度百分比
+            message: 进度消息
+        """
+        if not self.active or (progress, message) == self._written:
+            return
+        if self._pending is not None:
+            self.coalesced += 1
+        now = time.monotonic()
+        if progress >= 100 or self._last_write is None or now - self._last_write >= self.min_interval:
+            self._flush((progress, message), now)
+        else:
+            self._pending = (progress, message)
+
+    def flush(self) -> None:
+        """立即写入尚未写入的进度"""
+        if self.active and self._pending is not None:
+            self._flush(self._pending, time.monotonic())
+
+    def _flush(self, state: Tuple[int, str], now: float) -> None:
+        self._pending = None
+        self._last_write = now
+        self._written = state
+        self.writes += 1
+        if not self._write(*state):
+            self.active = False
+            logger.info(f"任务已不在本worker处理中，停止写入进度（{state[0]}%）")
@@ -1,13 +1,33 @@
-import json
+import uuid
 import logging
 import redis
+import redis.asyncio as aioredis
 from redis import ConnectionPool
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Any, Optional
 
 from app.core.config import settings
+from app.utils.redis_codec import get_record_codec
 
 logger = logging.getLogger(__name__)
 
+# 持有者令牌一致时删除锁（释放）
+# KEYS[1]: 锁键  ARGV[1]: 持有者令牌
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 持有者令牌一致时重新设置锁的过期时间（续期）
+# KEYS[1]: 锁键  ARGV[1]: 持有者令牌  ARGV[2]: 过期时间（秒）
+REFRESH_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
 class RedisService:
     """
     Redis服务单例类，管理Redis连接池
@@ -61,6 +81,7 @@ class RedisClient:
         """
         self.prefix = prefix
         self.redis = redis.Redis(connection_pool=pool)
+        self.codec = get_record_codec()
     
     def _get_key(self, key: str) -> str:
         """
@@ -74,21 +95,21 @@ class RedisClient:
         """
         return f"{self.prefix}{key}"
     
-    def save(self, key: str, data: Any) -> bool:
+    def save(self, key: str, data: Any, ttl: Optional[int] = None) -> bool:
         """
         保存数据到Redis
         
         Args:
             key: 键名
-            data: 要存储的数据，将会被JSON序列化
+            data: 要存储的数据，将会按配置的编解码器序列化
+            ttl: 过期时间（秒），不提供则永不过期
             
         Returns:
             bool: 是否成功保存
         """
         try:
-            json_data = json.dumps(data, ensure_ascii=False)
             redis_key = self._get_key(key)
-            self.redis.set(redis_key, json_data)
+            self.redis.set(redis_key, self.codec.encode(data), ex=ttl)
             return True
         except Exception as e:
             logger.error(f"保存数据到Redis失败 {key}: {str(e)}")
@@ -108,12 +129,52 @@ class RedisClient:
             redis_key = self._get_key(key)
             data = self.redis.get(redis_key)
             if data:
-                return json.loads(data)
+                return self.codec.decode(data)
             return None
         except Exception as e:
             logger.error(f"从Redis获取数据失败 {key}: {str(e)}")
             return None
     
+    def save_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """
+        通过一个pipeline批量保存数据
+        
+        Args:
+            items: 键名到数据的映射，数据将会按配置的编解码器序列化
+            ttl: 过期时间（秒），不提供则永不过期
+            
+        Returns:
+            bool: 是否成功保存
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, data in items.items():
+                pipe.set(self._get_key(key), self.codec.encode(data), ex=ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"批量保存数据到Redis失败 {list(items)}: {str(e)}")
+            return False
+    
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取数据（MGET）
+        
+        Args:
+            keys: 键名列表
+            
+        Returns:
+            List[Optional[Any]]: 与键名顺序一致的数据列表，不存在的键为None
+        """
+        if not keys:
+            return []
+        try:
+            values = self.redis.mget([self._get_key(key) for key in keys])
+            return [self.codec.decode(value) if value else None for value in values]
+        except Exception as e:
+            logger.error(f"从Redis批量获取数据失败 {keys}: {str(e)}")
+            return [None] * len(keys)
+    
     def delete(self, key: str) -> bool:
         """
         从Redis删除数据
@@ -151,4 +212,342 @@ class RedisClient:
             return [k.decode('utf-8') for k in keys]
         except Exception as e:
             logger.error(f"从Redis获取键列表失败 {pattern}: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+    
+    def scan_keys(self, pattern: str, count: int = 500) -> Iterator[str]:
+        """
+        用SCAN增量遍历符合模式的键（不会像KEYS一样阻塞Redis）
+        
+        Args:
+            pattern: 键模式，例如"task:*"
+            count: 每次SCAN的建议数量
+            
+        Yields:
+            str: 去除前缀后的键名
+        """
+        for k in self.redis.scan_iter(match=self._get_key(pattern), count=count):
+            k = k.decode('utf-8')
+            yield k.replace(self.prefix, '', 1) if self.prefix else k
+    
+    def acquire_lock(self, key: str, ttl: int) -> Optional[str]:
+        """
+        获取互斥锁（SET NX），锁的值为随机的持有者令牌
+        
+        Args:
+            key: 锁的键名
+            ttl: 锁的过期时间（秒），防止持有者崩溃后死锁
+            
+        Returns:
+            Optional[str]: 持有者令牌（释放和续期时使用），未获取到锁时返回None
+        """
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(self._get_key(key), token, nx=True, ex=ttl):
+                return token
+        except Exception as e:
+            logger.error(f"获取Redis锁失败 {key}: {str(e)}")
+        return None
+    
+    def release_lock(self, key: str, token: str) -> bool:
+        """
+        释放互斥锁，只删除自己持有的锁（锁已过期并被其他请求获取时不删除）
+        
+        Args:
+            key: 锁的键名
+            token: acquire_lock 返回的持有者令牌
+            
+        Returns:
+            bool: 是否已释放
+        """
+        try:
+            release = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+            return bool(release(keys=[self._get_key(key)], args=[token]))
+        except Exception as e:
+            logger.error(f"释放Redis锁失败 {key}: {str(e)}")
+            return False
+    
+    def refresh_lock(self, key: str, token: str, ttl: int) -> bool:
+        """
+        为自己持有的锁续期
+        
+        Args:
+            key: 锁的键名
+            token: acquire_lock 返回的持有者令牌
+            ttl: 新的过期时间（秒）
+            
+        Returns:
+            bool: 是否仍持有锁
+        """
+        try:
+            refresh = self.redis.register_script(REFRESH_LOCK_SCRIPT)
+            return bool(refresh(keys=[self._get_key(key)], args=[token, ttl]))
+        except Exception as e:
+            logger.error(f"Redis锁续期失败 {key}: {str(e)}")
+            return False
+    
+    def get_full_key(self, key: str) -> str:
+        """
+        获取带前缀的完整键名，供Lua脚本等需要直接传入键名的场景使用
+        
+        Args:
+            key: 原始键名
+            
+        Returns:
+            str: 带前缀的键名
+        """
+        return self._get_key(key)
+    
+    def incr(self, key: str, amount: int = 1) -> Optional[int]:
+        """
+        计数器自增
+        
+        Args:
+            key: 键名
+            amount: 增量
+            
+        Returns:
+            Optional[int]: 自增后的值，出错时返回None
+        """
+        try:
+            return self.redis.incrby(self._get_key(key), amount)
+        except Exception as e:
+            logger.error(f"Redis计数器自增失败 {key}: {str(e)}")
+            return None
+    
+    def get_counters(self, keys: List[str]) -> Dict[str, int]:
+        """
+        批量读取计数器
+        
+        Args:
+            keys: 键名列表
+            
+        Returns:
+            Dict[str, int]: 键名到计数值的映射，不存在的计数器为0
+        """
+        try:
+            values = self.redis.mget([self._get_key(key) for key in keys])
+            return {key: int(value or 0) for key, value in zip(keys, values)}
+        except Exception as e:
+            logger.error(f"从Redis读取计数器失败 {keys}: {str(e)}")
+            return {key: 0 for key in keys}
+
+
+class AsyncRedisService:
+    """
+    基于 redis.asyncio 的Redis服务单例类，供API进程的 async 接口使用，不阻塞事件循环
+
+    连接池有上限（REDIS_ASYNC_MAX_CONNECTIONS），连接用完时请求等待空闲连接而不是新建连接。
+    连接在第一次使用时创建并绑定到当前事件循环，因此只应在API进程（每个uvicorn worker一个事件循环）中使用，
+    Celery worker继续使用同步的 RedisService。
+    """
+    _instance = None
+    _pool = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncRedisService, cls).__new__(cls)
+            cls._pool = aioredis.BlockingConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD,
+                db=settings.REDIS_DB,
+                max_connections=settings.REDIS_ASYNC_MAX_CONNECTIONS,
+                timeout=settings.REDIS_ASYNC_POOL_TIMEOUT,
+                decode_responses=False
+            )
+            logger.info(f"Redis异步连接池已初始化: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        return cls._instance
+
+    def get_client(self, prefix: str = "") -> "AsyncRedisClient":
+        """
+        获取异步Redis客户端
+
+        Args:
+            prefix: 键前缀，用于区分不同类型的数据
+
+        Returns:
+            AsyncRedisClient: 异步Redis客户端实例
+        """
+        return AsyncRedisClient(self._pool, prefix)
+
+    async def close(self) -> None:
+        """关闭连接池中的所有连接（应用关闭时调用）"""
+        await self._pool.disconnect()
+
+
+class AsyncRedisClient:
+    """
+    异步Redis客户端类，接口与 RedisClient 一致，方法均为协程
+    """
+
+    def __init__(self, pool: "aioredis.ConnectionPool", prefix: str = ""):
+        """
+        初始化异步Redis客户端
+
+        Args:
+            pool: 异步Redis连接池
+            prefix: 键前缀，用于区分不同类型的数据
+        """
+        self.prefix = prefix
+        self.redis = aioredis.Redis(connection_pool=pool)
+        self.codec = get_record_codec()
+
+    def _get_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def get_full_key(self, key: str) -> str:
+        """
+        获取带前缀的完整键名，供Lua脚本等需要直接传入键名的场景使用
+
+        Args:
+            key: 原始键名
+
+        Returns:
+            str: 带前缀的键名
+        """
+        return self._get_key(key)
+
+    async def save(self, key: str, data: Any, ttl: Optional[int] = None) -> bool:
+        """
+        保存数据到Redis
+
+        Args:
+            key: 键名
+            data: 要存储的数据，将会按配置的编解码器序列化
+            ttl: 过期时间（秒），不提供则永不过期
+
+        Returns:
+            bool: 是否成功保存
+        """
+        try:
+            await self.redis.set(self._get_key(key), self.codec.encode(data), ex=ttl)
+            return True
+        except Exception as e:
+            logger.error(f"保存数据到Redis失败 {key}: {str(e)}")
+            return False
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        从Redis获取数据
+
+        Args:
+            key: 键名
+
+        Returns:
+            Any: 获取的数据，如果不存在或出错则返回None
+        """
+        try:
+            data = await self.redis.get(self._get_key(key))
+            if data:
+                return self.codec.decode(data)
+            return None
+        except Exception as e:
+            logger.error(f"从Redis获取数据失败 {key}: {str(e)}")
+            return None
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量获取数据（MGET）
+
+        Args:
+            keys: 键名列表
+
+        Returns:
+            List[Optional[Any]]: 与键名顺序一致的数据列表，不存在的键为None
+        """
+        if not keys:
+            return []
+        try:
+            values = await self.redis.mget([self._get_key(key) for key in keys])
+            return [self.codec.decode(value) if value else None for value in values]
+        except Exception as e:
+            logger.error(f"从Redis批量获取数据失败 {keys}: {str(e)}")
+            return [None] * len(keys)
+
+    async def delete(self, key: str) -> bool:
+        """
+        从Redis删除数据
+
+        Args:
+            key: 键名
+
+        Returns:
+            bool: 是否成功删除
+        """
+        try:
+            await self.redis.delete(self._get_key(key))
+            return True
+        except Exception as e:
+            logger.error(f"从Redis删除数据失败 {key}: {str(e)}")
+            return False
+
+    async def scan_keys(self, pattern: str, count: int = 500) -> AsyncIterator[str]:
+        """
+        用SCAN增量遍历符合模式的键
+
+        Args:
+            pattern: 键模式，例如"task:*"
+            count: 每次SCAN的建议数量
+
+        Yields:
+            str: 去除前缀后的键名
+        """
+        async for k in self.redis.scan_iter(match=self._get_key(pattern), count=count):
+            k = k.decode('utf-8')
+            yield k.replace(self.prefix, '', 1) if self.prefix else k
+
+    async def acquire_lock(self, key: str, ttl: int) -> Optional[str]:
+        """
+        获取互斥锁（SET NX），锁的值为随机的持有者令牌
+
+        Args:
+            key: 锁的键名
+            ttl: 锁的过期时间（秒），防止持有者崩溃后死锁
+
+        Returns:
+            Optional[str]: 持有者令牌（释放和续期时使用），未获取到锁时返回None
+        """
+        token = uuid.uuid4().hex
+        try:
+            if await self.redis.set(self._get_key(key), token, nx=True, ex=ttl):
+                return token
+        except Exception as e:
+            logger.error(f"获取Redis锁失败 {key}: {str(e)}")
+        return None
+
+    async def release_lock(self, key: str, token: str) -> bool:
+        """
+        释放互斥锁，只删除自己持有的锁（锁已过期并被其他请求获取时不删除）
+
+        Args:
+            key: 锁的键名
+            token: acquire_lock 返回的持有者令牌
+
+        Returns:
+            bool: 是否已释放
+        """
+        try:
+            release = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+            return bool(await release(keys=[self._get_key(key)], args=[token]))
+        except Exception as e:
+            logger.error(f"释放Redis锁失败 {key}: {str(e)}")
+            return False
+
+    async def refresh_lock(self, key: str, token: str, ttl: int) -> bool:
+        """
+        为自己持有的锁续期
+
+        Args:
+            key: 锁的键名
+            token: acquire_lock 返回的持有者令牌
+            ttl: 新的过期时间（秒）
+
+        Returns:
+            bool: 是否仍持有锁
+        """
+        try:
+            refresh = self.redis.register_script(REFRESH_LOCK_SCRIPT)
+            return bool(await refresh(keys=[self._get_key(key)], args=[token, ttl]))
+        except Exception as e:
+            logger.error(f"Redis锁续期失败 {key}: {str(e)}")
+            return False
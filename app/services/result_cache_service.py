@@ -0,0 +1,322 @@
+import os
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+from app.schemas.transcription import TranscriptionTask
+
+logger = logging.getLogger(__name__)
+
+# 认领或挂靠进行中的任务
+# KEYS[1]: inflight键  KEYS[2]: waiters键
+# ARGV[1]: 当前任务uni_key  ARGV[2]: 过期时间（秒）
+# 返回: 已在处理的任务uni_key（当前任务已挂靠），或nil（当前任务成为主任务）
+CLAIM_OR_ATTACH_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if owner then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return owner
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+# 主任务成功：写入缓存条目，释放inflight并取出所有挂靠的任务
+# KEYS[1]: 缓存条目键  KEYS[2]: inflight键  KEYS[3]: waiters键
+# ARGV[1]: 缓存条目JSON  ARGV[2]: 条目过期时间（秒）  ARGV[3]: 主任务uni_key
+CLAIM_COMPLETE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+if redis.call('GET', KEYS[2]) ~= ARGV[3] then
+    return {}
+end
+redis.call('DEL', KEYS[2])
+local waiters = redis.call('LRANGE', KEYS[3], 0, -1)
+redis.call('DEL', KEYS[3])
+return waiters
+"""
+
+# 主任务失败：把第一个挂靠的任务提升为新的主任务
+# KEYS[1]: inflight键  KEYS[2]: waiters键
+# ARGV[1]: 主任务uni_key  ARGV[2]: 过期时间（秒）
+# 返回: 新的主任务uni_key，没有挂靠任务时返回nil
+CLAIM_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+local next_owner = redis.call('LPOP', KEYS[2])
+if next_owner then
+    redis.call('SET', KEYS[1], next_owner, 'EX', ARGV[2])
+    return next_owner
+end
+redis.call('DEL', KEYS[1])
+return false
+"""
+
+# 主任务已不存在或已结束（被删除、worker被强制结束、消息丢失后认领过期）：把第一个挂靠的任务提升为新的主任务
+# KEYS[1]: inflight键  KEYS[2]: waiters键
+# ARGV[1]: 检查时的主任务uni_key（认领已过期时为空字符串）  ARGV[2]: 过期时间（秒）
+# 返回: 新的主任务uni_key；检查后主任务已变化或没有挂靠任务时返回nil
+CLAIM_RECLAIM_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return false
+end
+local next_owner = redis.call('LPOP', KEYS[2])
+if next_owner then
+    redis.call('SET', KEYS[1], next_owner, 'EX', ARGV[2])
+    return next_owner
+end
+redis.call('DEL', KEYS[1])
+return false
+"""
+
+# 统计计数器
+STATS_HITS = "stats:hits"
+STATS_MISSES = "stats:misses"
+STATS_COALESCED = "stats:coalesced"
+
+
+class ResultCacheService:
+    """
+    内容寻址的转写结果缓存
+
+    缓存键由全文件SHA-256、whisper_arch、语言和说话人分离开关组成，指向已完成任务的结果文件。
+    相同内容的任务正在处理时，新任务挂靠到进行中的任务上，等其完成后直接复用结果，不再重复转写。
+    """
+
+    def __init__(self):
+        redis_service = RedisService()
+        self.storage = redis_service.get_client(prefix="result_cache:")
+        self.enabled = settings.RESULT_CACHE_ENABLED
+        self.entry_ttl = settings.RESULT_CACHE_TTL_HOURS * 3600
+        # 进行中的认领最长保留到所有重试都超时
+        self.inflight_ttl = settings.CELERY_TASK_TIME_LIMIT * (settings.MAX_TRANSCRIPTION_RETRY + 1)
+        self._claim_or_attach = self.storage.redis.register_script(CLAIM_OR_ATTACH_SCRIPT)
+        self._claim_complete = self.storage.redis.register_script(CLAIM_COMPLETE_SCRIPT)
+        self._claim_release = self.storage.redis.register_script(CLAIM_RELEASE_SCRIPT)
+        self._claim_reclaim = self.storage.redis.register_script(CLAIM_RECLAIM_SCRIPT)
+
+    @staticmethod
+    def build_cache_key(content_hash: str, whisper_arch: str, language: Optional[str], speaker: bool) -> str:
+        """
+        生成缓存键
+
+        Args:
+            content_hash: 全文件SHA-256
+            whisper_arch: Whisper模型名
+            language: 语言代码
+            speaker: 是否启用说话人分离
+
+        Returns:
+            str: 缓存键
+        """
+        return f"{content_hash}:{whisper_arch}:{language or 'auto'}:{int(bool(speaker))}"
+
+    def cache_key_for_task(self, task: TranscriptionTask) -> Optional[str]:
+        """
+        根据任务参数生成缓存键
+
+        Args:
+            task: 转写任务
+
+        Returns:
+            Optional[str]: 缓存键，未启用缓存或任务没有内容哈希时返回None
+        """
+        if not self.enabled or not task.content_hash:
+            return None
+        extra_params = task.extra_params
+        whisper_arch = (extra_params.whisper_arch if extra_params else None) or settings.WHISPER_MODEL_NAME
+        language = (extra_params.language if extra_params else None) or task.language
+        speaker = bool(extra_params.speaker) if extra_params else False
+        return self.build_cache_key(task.content_hash, whisper_arch, language, speaker)
+
+    def lookup(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        查询缓存，结果文件已被清理的条目视为未命中并删除
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            Optional[Dict[str, Any]]: 缓存条目（uni_key, result_path, audio_duration）
+        """
+        entry = self.storage.get(f"entry:{cache_key}")
+        if not entry:
+            return None
+        if not os.path.exists(entry.get("result_path", "")):
+            self.storage.delete(f"entry:{cache_key}")
+            return None
+        return entry
+
+    def claim_or_attach(self, cache_key: str, uni_key: str) -> Optional[str]:
+        """
+        认领缓存键的处理权；已有相同内容的任务在处理时，将当前任务挂靠上去
+
+        Args:
+            cache_key: 缓存键
+            uni_key: 当前任务uni_key
+
+        Returns:
+            Optional[str]: 正在处理的任务uni_key（当前任务已挂靠，不需要入队），None表示当前任务需要处理
+        """
+        try:
+            owner = self._claim_or_attach(
+                keys=[self.storage.get_full_key(f"inflight:{cache_key}"), self.storage.get_full_key(f"waiters:{cache_key}")],
+                args=[uni_key, self.inflight_ttl]
+            )
+        except Exception as e:
+            logger.error(f"认领结果缓存失败 {cache_key}: {str(e)}")
+            return None
+        return owner.decode("utf-8") if owner else None
+
+    def complete(self, cache_key: str, uni_key: str, result_path: str, audio_duration: Optional[float]) -> List[str]:
+        """
+        主任务成功完成：写入缓存条目并取出挂靠的任务
+
+        Args:
+            cache_key: 缓存键
+            uni_key: 主任务uni_key
+            result_path: 结果文件路径
+            audio_duration: 音频时长（秒）
+
+        Returns:
+            List[str]: 挂靠在该任务上、需要用缓存结果完成的任务uni_key列表
+        """
+        entry = {"uni_key": uni_key, "result_path": result_path, "audio_duration": audio_duration}
+        try:
+            waiters = self._claim_complete(
+                keys=[
+                    self.storage.get_full_key(f"entry:{cache_key}"),
+                    self.storage.get_full_key(f"inflight:{cache_key}"),
+                    self.storage.get_full_key(f"waiters:{cache_key}")
+                ],
+                args=[json.dumps(entry, ensure_ascii=False), self.entry_ttl, uni_key]
+            )
+        except Exception as e:
+            logger.error(f"写入结果缓存失败 {cache_key}: {str(e)}")
+            return []
+        return [waiter.decode("utf-8") for waiter in waiters]
+
+    def release(self, cache_key: str, uni_key: str) -> Optional[str]:
+        """
+        主任务最终失败：释放处理权，并把第一个挂靠的任务提升为新的主任务
+
+        Args:
+            cache_key: 缓存键
+            uni_key: 主任务uni_key
+
+        Returns:
+            Optional[str]: 需要重新入队处理的任务uni_key
+        """
+        try:
+            next_owner = self._claim_release(
+                keys=[self.storage.get_full_key(f"inflight:{cache_key}"), self.storage.get_full_key(f"waiters:{cache_key}")],
+                args=[uni_key, self.inflight_ttl]
+            )
+        except Exception as e:
+            logger.error(f"释放结果缓存认领失败 {cache_key}: {str(e)}")
+            return None
+        return next_owner.decode("utf-8") if next_owner else None
+
+    def detach(self, cache_key: str, uni_key: str) -> None:
+        """
+        挂靠的任务被删除：从等待列表中移除，主任务完成时不再处理它
+
+        Args:
+            cache_key: 缓存键
+            uni_key: 挂靠的任务uni_key
+        """
+        try:
+            self.storage.redis.lrem(self.storage.get_full_key(f"waiters:{cache_key}"), 0, uni_key)
+        except Exception as e:
+            logger.error(f"移除挂靠任务失败 {cache_key}/{uni_key}: {str(e)}")
+
+    def reclaim_orphans(self) -> List[str]:
+        """
+        为主任务已不存在或已结束的等待列表提升新的主任务（定期清理任务中调用）
+
+        主任务被强制结束或消息丢失时不会走到结束处理，挂靠的任务没有Celery消息，会一直等待。
+
+        Returns:
+            List[str]: 被提升为主任务、需要重新入队的任务uni_key列表
+        """
+        from app.services.task_store import get_task_store
+        from app.services.transcription_service import TERMINAL_STATUSES
+
+        store = get_task_store()
+
+        def is_alive(uni_key: Optional[str]) -> bool:
+            if not uni_key:
+                return False
+            status = store.load_statuses([uni_key])[0]
+            return status is not None and status not in TERMINAL_STATUSES
+
+        promoted = []
+        for waiters_key in self.storage.scan_keys("waiters:*"):
+            cache_key = waiters_key[len("waiters:"):]
+            keys = [self.storage.get_full_key(f"inflight:{cache_key}"), self.storage.get_full_key(waiters_key)]
+            owner = self.storage.redis.get(keys[0])
+            owner = owner.decode("utf-8") if owner else ""
+            # 跳过已被删除或已结束的挂靠任务，直到找到仍在等待的任务
+            while not is_alive(owner):
+                try:
+                    next_owner = self._claim_reclaim(keys=keys, args=[owner, self.inflight_ttl])
+                except Exception as e:
+                    logger.error(f"提升挂靠任务失败 {cache_key}: {str(e)}")
+                    break
+                if not next_owner:
+                    break
+                owner = next_owner.decode("utf-8")
+                if is_alive(owner):
+                    promoted.append(owner)
+        if promoted:
+            logger.warning(f"{len(promoted)} 个挂靠任务的主任务已不存在或已结束，重新入队: {promoted}")
+        return promoted
+
+    def record(self, counter: str) -> None:
+        """
+        记录一次命中/未命中/合并
+
+        Args:
+            counter: STATS_HITS / STATS_MISSES / STATS_COALESCED
+        """
+        self.storage.incr(counter)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict[str, Any]: 命中、未命中、合并次数和命中率
+        """
+        counters = self.storage.get_counters([STATS_HITS, STATS_MISSES, STATS_COALESCED])
+        hits = counters[STATS_HITS]
+        misses = counters[STATS_MISSES]
+        coalesced = counters[STATS_COALESCED]
+        total = hits + misses + coalesced
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_ratio": round((hits + coalesced) / total, 4) if total else 0.0,
+            "entry_ttl_seconds": self.entry_ttl
+        }
+
+
+# 单例模式
+_result_cache_service = None
+
+def get_result_cache_service() -> ResultCacheService:
+    """
+    获取ResultCacheService实例（单例模式）
+
+    Returns:
+        ResultCacheService: 结果缓存服务实例
+    """
+    global _result_cache_service
+    if _result_cache_service is None:
+        _result_cache_service = ResultCacheService()
+    return _result_cache_service
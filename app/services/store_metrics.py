@@ -0,0 +1,240 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的桶上界（毫秒），最后一个桶为 +inf
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+METRICS_PREFIX = "store_metrics:"
+
+
+class OperationStats:
+    """单个操作的调用次数、错误次数、总耗时和延迟直方图"""
+
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms: float, error: bool) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+
+def summarize(count: int, errors: int, total_ms: float, buckets: List[int], max_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    由计数和直方图计算摘要（分位数取所在桶的上界）
+
+    Args:
+        count: 调用次数
+        errors: 错误次数
+        total_ms: 总耗时（毫秒）
+        buckets: 直方图各桶的计数
+        max_ms: 最大耗时（毫秒，可选）
+
+    Returns:
+        Dict[str, Any]: 调用次数、错误次数、平均耗时、P50/P90/P99和直方图
+    """
+    def percentile(p: float) -> Optional[float]:
+        if not count:
+            return None
+        threshold = count * p
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += n
+            if seen >= threshold:
+                return bound
+        # 超过最后一个桶：本进程统计取最大耗时，汇总统计取最后一个桶的上界
+        return LATENCY_BUCKETS_MS[-1] if max_ms is None else round(max_ms, 3)
+
+    summary = {
+        "count": count,
+        "errors": errors,
+        "total_ms": round(total_ms, 3),
+        "avg_ms": round(total_ms / count, 3) if count else None,
+        "p50_ms": percentile(0.5),
+        "p90_ms": percentile(0.9),
+        "p99_ms": percentile(0.99),
+        "histogram": {
+            f"le_{bound}ms": n for bound, n in zip(LATENCY_BUCKETS_MS, buckets)
+        }
+    }
+    summary["histogram"]["gt_1000ms"] = buckets[-1]
+    if max_ms is not None:
+        summary["max_ms"] = round(max_ms, 3)
+    return summary
+
+
+class StoreMetrics:
+    """
+    任务存储操作的延迟和错误统计
+
+    每个进程在内存中累计（线程安全），后台线程每隔 STORE_METRICS_FLUSH_SECONDS 秒把增量用一个pipeline累加到Redis哈希
+    store_metrics:{操作}，API进程读取后可以看到所有进程（包括Celery worker）的汇总。
+    record() 只更新内存中的计数，不访问Redis，在事件循环中调用也不会阻塞。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, OperationStats] = {}
+        self._pending: Dict[str, OperationStats] = {}
+        # 内存存储用于没有Redis的基准测试，只在本进程统计
+        self.flush_interval = 0 if settings.TASK_STORE_BACKEND == "memory" else settings.STORE_METRICS_FLUSH_SECONDS
+        self._flusher: Optional[threading.Thread] = None
+        # 线程不会被fork复制，Celery prefork子进程第一次记录时重新启动汇总线程
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def record(self, op: str, elapsed_ms: float, error: bool = False) -> None:
+        """
+        记录一次操作
+
+        Args:
+            op: 操作名（例如 redis.load）
+            elapsed_ms: 耗时（毫秒）
+            error: 是否抛出了异常
+        """
+        with self._lock:
+            self._ops.setdefault(op, OperationStats()).add(elapsed_ms, error)
+            self._pending.setdefault(op, OperationStats()).add(elapsed_ms, error)
+            start = self.flush_interval > 0 and self._flusher is None
+            if start:
+                self._flusher = threading.Thread(target=self._run_flusher, name="store-metrics-flush", daemon=True)
+        if start:
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        """后台汇总线程：每隔 flush_interval 秒汇总一次"""
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def flush(self) -> None:
+        """把上次汇总以来的增量累加到Redis（失败时丢弃本次增量，不影响存储操作）"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        try:
+            if pending:
+                redis = RedisService().get_client(prefix=METRICS_PREFIX).redis
+                pipe = redis.pipeline(transaction=False)
+                for op, stats in pending.items():
+                    key = f"{METRICS_PREFIX}{op}"
+                    pipe.hincrby(key, "count", stats.count)
+                    pipe.hincrby(key, "errors", stats.errors)
+                    pipe.hincrbyfloat(key, "total_ms", stats.total_ms)
+                    for i, n in enumerate(stats.buckets):
+                        if n:
+                            pipe.hincrby(key, f"b{i}", n)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入存储延迟统计失败: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        本进程自启动以来的统计
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 操作名到摘要的映射
+        """
+        with self._lock:
+            return {
+                op: summarize(stats.count, stats.errors, stats.total_ms, list(stats.buckets), stats.max_ms)
+                for op, stats in sorted(self._ops.items())
+            }
+
+    def cluster_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        所有进程写入Redis的汇总统计（最多滞后一个汇总间隔）
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 操作名到摘要的映射
+        """
+        client = RedisService().get_client(prefix=METRICS_PREFIX)
+        ops = sorted(client.scan_keys("*"))
+        pipe = client.redis.pipeline(transaction=False)
+        for op in ops:
+            pipe.hgetall(client.get_full_key(op))
+        result = {}
+        for op, raw in zip(ops, pipe.execute()):
+            fields = {key.decode(): value for key, value in raw.items()}
+            buckets = [int(fields.get(f"b{i}", 0)) for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+            result[op] = summarize(
+                int(fields.get("count", 0)), int(fields.get("errors", 0)), float(fields.get("total_ms", 0)), buckets
+            )
+        return result
+
+
+def timed(op: str):
+    """
+    存储方法的装饰器：记录耗时和是否抛出异常，操作名为 "{实例的name}.{op}"，同时支持同步和异步方法
+
+    Args:
+        op: 操作名
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                start = time.perf_counter()
+                error = False
+                try:
+                    return await func(self, *args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    get_store_metrics().record(f"{self.name}.{op}", (time.perf_counter() - start) * 1000, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return func(self, *args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                get_store_metrics().record(f"{self.name}.{op}", (time.perf_counter() - start) * 1000, error)
+        return wrapper
+    return decorator
+
+
+# 单例模式
+_store_metrics = None
+
+
+def get_store_metrics() -> StoreMetrics:
+    """
+    获取StoreMetrics实例（单例模式，每个进程一个）
+
+    Returns:
+        StoreMetrics: 存储延迟统计实例
+    """
+    global _store_metrics
+    if _store_metrics is None:
+        _store_metrics = StoreMetrics()
+    return _store_metrics
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import AsyncRedisService
+from app.services.task_store import TASK_EVENTS_CHANNEL
+from app.utils.redis_codec import loads_json
+
+logger = logging.getLogger(__name__)
+
+# 订阅断开后重连的等待时间（秒）
+RESUBSCRIBE_DELAY = 1.0
+
+
+class TaskEventSubscription:
+    """
+    一个流式连接（SSE或WebSocket）的订阅
+
+    只记录有变化的任务，同一任务在被读取前的多次变化合并为一次，慢连接不会积压事件。
+    """
+
+    def __init__(self, uni_key: Optional[str] = None, client_id: Optional[str] = None):
+        """
+        Args:
+            uni_key: 只订阅该任务（可选）
+            client_id: 只订阅该客户端的任务（可选，两者都不提供时订阅所有任务）
+        """
+        self.uni_key = uni_key
+        self.client_id = client_id
+        self._changed: Dict[str, None] = {}
+        self._resync = False
+        self._wakeup = asyncio.Event()
+
+    def notify(self, uni_key: str) -> None:
+        self._changed[uni_key] = None
+        self._wakeup.set()
+
+    def notify_resync(self) -> None:
+        """事件订阅重新建立，断开期间的变化可能已丢失，需要重新发送当前状态"""
+        self._resync = True
+        self._wakeup.set()
+
+    async def wait(self, timeout: float) -> Tuple[bool, List[str]]:
+        """
+        等待任务变化
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Tuple[bool, List[str]]: (是否需要重新发送当前状态, 有变化的任务)，超时时返回 (False, [])
+        """
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False, []
+        self._wakeup.clear()
+        changed, self._changed = list(self._changed), {}
+        resync, self._resync = self._resync, False
+        return resync, changed
+
+
+class TaskEventHub:
+    """
+    API进程内的任务变化事件分发
+
+    每个API进程只订阅一次 TASK_EVENTS_CHANNEL，收到事件后先通知监听者（TaskStatusCache 删除对应条目），
+    再唤醒关心该任务的流式连接。记录任务所属的客户端（client_id 不会变化），按客户端订阅的连接
+    不会被其他客户端的任务唤醒。
+    """
+
+    def __init__(self):
+        # 内存存储不发布变化事件
+        self.enabled = settings.TASK_STORE_BACKEND != "memory"
+        self.max_streams = settings.TASK_STREAM_MAX_CONNECTIONS
+        self.subscribed = False
+        self._listeners: List[Any] = []
+        self._by_key: Dict[str, Set[TaskEventSubscription]] = {}
+        self._by_client: Set[TaskEventSubscription] = set()
+        self._owners: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._max_owners = settings.TASK_STATUS_CACHE_SIZE
+        self._subscriber: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Any) -> None:
+        """
+        注册监听者，收到事件时调用 listener.invalidate(uni_key)，订阅建立或断开时调用 listener.clear()
+
+        Args:
+            listener: 监听者（例如 TaskStatusCache）
+        """
+        self._listeners.append(listener)
+
+    @property
+    def stream_count(self) -> int:
+        return sum(len(subs) for subs in self._by_key.values()) + len(self._by_client)
+
+    def subscribe(self, uni_key: Optional[str] = None, client_id: Optional[str] = None) -> TaskEventSubscription:
+        """
+        为一个流式连接创建订阅
+
+        Args:
+            uni_key: 只订阅该任务（可选）
+            client_id: 只订阅该客户端的任务（可选）
+
+        Returns:
+            TaskEventSubscription: 订阅
+
+        Raises:
+            RuntimeError: 本进程的流式连接数达到 TASK_STREAM_MAX_CONNECTIONS
+        """
+        if self.stream_count >= self.max_streams:
+            raise RuntimeError(f"流式连接数已达上限: {self.max_streams}")
+        subscription = TaskEventSubscription(uni_key, client_id)
+        if uni_key:
+            self._by_key.setdefault(uni_key, set()).add(subscription)
+        else:
+            self._by_client.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskEventSubscription) -> None:
+        if subscription.uni_key:
+            subs = self._by_key.get(subscription.uni_key)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._by_key[subscription.uni_key]
+        else:
+            self._by_client.discard(subscription)
+
+    def owner(self, uni_key: str) -> Tuple[bool, Optional[str]]:
+        """
+        获取已知的任务所属客户端
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否已知, client_id)
+        """
+        if uni_key in self._owners:
+            return True, self._owners[uni_key]
+        return False, None
+
+    def set_owner(self, uni_key: str, client_id: Optional[str]) -> None:
+        self._owners[uni_key] = client_id
+        self._owners.move_to_end(uni_key)
+        while len(self._owners) > self._max_owners:
+            self._owners.popitem(last=False)
+
+    def start(self) -> None:
+        """启动事件订阅（应用启动时在事件循环中调用）"""
+        if self.enabled and self._subscriber is None:
+            self._subscriber = asyncio.get_running_loop().create_task(self._subscribe_loop())
+
+    async def stop(self) -> None:
+        """停止事件订阅（应用关闭时调用）"""
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            try:
+                await self._subscriber
+            except asyncio.CancelledError:
+                pass
+            self._subscriber = None
+        self._set_subscribed(False)
+
+    def _set_subscribed(self, subscribed: bool) -> None:
+        self.subscribed = subscribed
+        # 订阅建立之前或断开期间的事件可能已丢失
+        for listener in self._listeners:
+            listener.clear()
+        if subscribed:
+            for subs in self._by_key.values():
+                for subscription in subs:
+                    subscription.notify_resync()
+            for subscription in self._by_client:
+                subscription.notify_resync()
+
+    async def _subscribe_loop(self) -> None:
+        redis = AsyncRedisService().get_client().redis
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(TASK_EVENTS_CHANNEL)
+                self._set_subscribed(True)
+                logger.info(f"已订阅任务变化事件: {TASK_EVENTS_CHANNEL}")
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._handle_event(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"任务变化事件的订阅断开，{RESUBSCRIBE_DELAY}秒后重连: {str(e)}")
+            finally:
+                self._set_subscribed(False)
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def _handle_event(self, data: bytes) -> None:
+        try:
+            event = loads_json(data)
+            uni_key = event["uni_key"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"无法解析任务事件: {data!r}")
+            return
+        if "client_id" in event:
+            self.set_owner(uni_key, event["client_id"])
+
+        for listener in self._listeners:
+            listener.invalidate(uni_key)
+
+        for subscription in self._by_key.get(uni_key, ()):
+            subscription.notify(uni_key)
+        if self._by_client:
+            known, client_id = self.owner(uni_key)
+            for subscription in self._by_client:
+                if not subscription.client_id or not known or client_id == subscription.client_id:
+                    subscription.notify(uni_key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取事件订阅和流式连接的统计
+
+        Returns:
+            Dict[str, Any]: 是否已订阅、按任务和按客户端订阅的连接数
+        """
+        return {
+            "enabled": self.enabled,
+            "subscribed": self.subscribed,
+            "task_streams": sum(len(subs) for subs in self._by_key.values()),
+            "client_streams": len(self._by_client),
+            "max_streams": self.max_streams
+        }
+
+
+# 单例模式
+_task_event_hub = None
+
+
+def get_task_event_hub() -> TaskEventHub:
+    """
+    获取TaskEventHub实例（单例模式，每个API进程一个）
+
+    Returns:
+        TaskEventHub: 任务事件分发实例
+    """
+    global _task_event_hub
+    if _task_event_hub is None:
+        _task_event_hub = TaskEventHub()
+    return _task_event_hub
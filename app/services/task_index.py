@@ -0,0 +1,326 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import AsyncRedisService, RedisService
+
+logger = logging.getLogger(__name__)
+
+# 按创建时间倒序取一页
+# KEYS[1]: 索引键
+# ARGV[1]: 游标的创建时间（首页为'+inf'）  ARGV[2]: 游标的uni_key（首页为空）
+# ARGV[3]: 跳过的条数  ARGV[4]: 每页数量
+# 同一时间戳的任务按uni_key倒序排列，跳过游标之前（含游标）已返回的同分任务
+PAGE_SCRIPT = """
+local skip = tonumber(ARGV[3])
+if ARGV[2] ~= '' then
+    local ties = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[1])
+    for _, member in ipairs(ties) do
+        if member >= ARGV[2] then
+            skip = skip + 1
+        end
+    end
+end
+return redis.call('ZREVRANGEBYSCORE', KEYS[1], ARGV[1], '-inf', 'WITHSCORES', 'LIMIT', skip, ARGV[4])
+"""
+
+ALL_KEY = "created"
+
+
+def created_score(created_at: Optional[str]) -> float:
+    """
+    将任务创建时间转换为索引分数
+
+    Args:
+        created_at: ISO格式的创建时间
+
+    Returns:
+        float: 时间戳，无法解析时为0
+    """
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def index_name(client_id: Optional[str] = None, status: Optional[str] = None) -> str:
+    """
+    按筛选条件选择索引名（不带前缀）
+
+    Args:
+        client_id: 客户端ID
+        status: 任务状态
+
+    Returns:
+        str: 索引名
+    """
+    if client_id and status:
+        return f"client:{client_id}:status:{status}"
+    if client_id:
+        return f"client:{client_id}"
+    if status:
+        return f"status:{status}"
+    return ALL_KEY
+
+
+def page_result(result: List[bytes], limit: int) -> Tuple[List[str], Optional[str]]:
+    """将 PAGE_SCRIPT 的结果转换为 (uni_key列表, 下一页游标)"""
+    uni_keys = [member.decode() for member in result[0::2]]
+    if len(uni_keys) < limit:
+        return uni_keys, None
+    return uni_keys, encode_cursor(float(result[-1]), uni_keys[-1])
+
+
+def encode_cursor(score: float, uni_key: str) -> str:
+    """生成分页游标：上一页最后一个任务的创建时间和uni_key"""
+    return f"{score!r}:{uni_key}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解析分页游标
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    score, _, uni_key = cursor.partition(":")
+    float(score)
+    if not uni_key:
+        raise ValueError("无效的游标")
+    return score, uni_key
+
+
+class TaskIndex:
+    """
+    任务的二级索引
+
+    用有序集合（分数为创建时间）维护全部任务、按客户端、按状态以及按客户端+状态的索引，
+    任务列表按游标分页，每页代价为 O(log N + limit)，不再需要 KEYS * 和逐个读取所有任务。
+    """
+
+    def __init__(self):
+        redis_service = RedisService()
+        self.storage = redis_service.get_client(prefix="task_index:")
+        self._page = self.storage.redis.register_script(PAGE_SCRIPT)
+        # 内存存储（单进程基准测试）没有列表索引
+        self.enabled = settings.TASK_STORE_BACKEND != "memory"
+
+    def index_key(self, client_id: Optional[str] = None, status: Optional[str] = None) -> str:
+        """
+        按筛选条件选择索引键
+
+        Args:
+            client_id: 客户端ID
+            status: 任务状态
+
+        Returns:
+            str: 带前缀的索引键
+        """
+        return self.storage.get_full_key(index_name(client_id, status))
+
+    def _status_keys(self, client_id: Optional[str], status: Optional[str]) -> List[str]:
+        keys = [self.index_key(status=status)]
+        if client_id:
+            keys.append(self.index_key(client_id, status))
+        return keys
+
+    def add(self, uni_key: str, created_at: str, client_id: Optional[str], status: str, pipe=None) -> None:
+        """
+        新任务加入索引
+
+        Args:
+            uni_key: 任务唯一标识符
+            created_at: 创建时间
+            client_id: 客户端ID
+            status: 任务状态
+            pipe: 调用方的pipeline（可选，不提供时立即执行）
+        """
+        own_pipe = pipe is None
+        pipe = pipe if pipe is not None else self.storage.redis.pipeline(transaction=False)
+        mapping = {uni_key: created_score(created_at)}
+        pipe.zadd(self.index_key(), mapping)
+        if client_id:
+            pipe.zadd(self.index_key(client_id), mapping)
+        for key in self._status_keys(client_id, status):
+            pipe.zadd(key, mapping)
+        if own_pipe:
+            self._execute(pipe, uni_key)
+
+    def add_many(self, entries: List[Tuple[str, str, Optional[str], str]]) -> None:
+        """
+        通过一个pipeline将多个新任务加入索引
+
+        Args:
+            entries: (uni_key, created_at, client_id, status) 列表
+        """
+        if not entries:
+            return
+        pipe = self.storage.redis.pipeline(transaction=False)
+        for uni_key, created_at, client_id, status in entries:
+            self.add(uni_key, created_at, client_id, status, pipe=pipe)
+        self._execute(pipe, entries[0][0])
+
+    def move_status(self, uni_key: str, created_at: str, client_id: Optional[str], old_status: Optional[str], new_status: str) -> None:
+        """
+        任务状态变化时移动到新状态的索引
+
+        Args:
+            uni_key: 任务唯一标识符
+            created_at: 创建时间
+            client_id: 客户端ID
+            old_status: 原状态
+            new_status: 新状态
+        """
+        pipe = self.storage.redis.pipeline(transaction=False)
+        if old_status:
+            for key in self._status_keys(client_id, old_status):
+                pipe.zrem(key, uni_key)
+        mapping = {uni_key: created_score(created_at)}
+        for key in self._status_keys(client_id, new_status):
+            pipe.zadd(key, mapping)
+        self._execute(pipe, uni_key)
+
+    def remove(self, uni_key: str, client_id: Optional[str], status: Optional[str], pipe=None) -> None:
+        """
+        删除任务时从所有索引中移除
+
+        Args:
+            uni_key: 任务唯一标识符
+            client_id: 客户端ID
+            status: 任务状态
+            pipe: 调用方的pipeline（可选，不提供时立即执行）
+        """
+        own_pipe = pipe is None
+        pipe = pipe if pipe is not None else self.storage.redis.pipeline(transaction=False)
+        pipe.zrem(self.index_key(), uni_key)
+        if client_id:
+            pipe.zrem(self.index_key(client_id), uni_key)
+        if status:
+            for key in self._status_keys(client_id, status):
+                pipe.zrem(key, uni_key)
+        if own_pipe:
+            self._execute(pipe, uni_key)
+
+    def remove_everywhere(self, uni_keys: List[str]) -> None:
+        """
+        从所有索引中移除（任务记录已过期、不知道客户端和状态时使用）
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+        """
+        if not uni_keys:
+            return
+        pipe = self.storage.redis.pipeline(transaction=False)
+        for name in self.storage.scan_keys("*"):
+            pipe.zrem(self.storage.get_full_key(name), *uni_keys)
+        self._execute(pipe, uni_keys[0])
+
+    def _execute(self, pipe, uni_key: str) -> None:
+        if not self.enabled:
+            return
+        try:
+            pipe.execute()
+        except Exception as e:
+            # 索引只影响列表，不影响任务本身，失败时可用 scripts/rebuild_task_index.py 重建
+            logger.error(f"更新任务索引失败 {uni_key}: {str(e)}")
+
+    def page(
+        self,
+        client_id: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        按创建时间倒序取一页任务
+
+        Args:
+            client_id: 按客户端筛选
+            status: 按状态筛选
+            cursor: 上一页返回的游标，首页为None
+            limit: 每页数量
+            offset: 在游标之后再跳过的条数（兼容按偏移量分页）
+
+        Returns:
+            Tuple[List[str], Optional[str]]: (本页的uni_key列表, 下一页游标，没有更多时为None)
+
+        Raises:
+            ValueError: 游标格式无效
+        """
+        if not self.enabled:
+            return [], None
+        max_score, cursor_key = decode_cursor(cursor) if cursor else ("+inf", "")
+        result = self._page(
+            keys=[self.index_key(client_id, status)],
+            args=[max_score, cursor_key, max(offset, 0), limit]
+        )
+        return page_result(result, limit)
+
+
+class AsyncTaskIndex:
+    """
+    任务索引的异步只读视图，供API进程的任务列表接口使用（索引的维护仍由 TaskIndex 完成）
+    """
+
+    def __init__(self):
+        self.storage = AsyncRedisService().get_client(prefix="task_index:")
+        self._page = self.storage.redis.register_script(PAGE_SCRIPT)
+        self.enabled = settings.TASK_STORE_BACKEND != "memory"
+
+    async def page(
+        self,
+        client_id: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        按创建时间倒序取一页任务（与 TaskIndex.page 相同）
+
+        Raises:
+            ValueError: 游标格式无效
+        """
+        if not self.enabled:
+            return [], None
+        max_score, cursor_key = decode_cursor(cursor) if cursor else ("+inf", "")
+        result = await self._page(
+            keys=[self.storage.get_full_key(index_name(client_id, status))],
+            args=[max_score, cursor_key, max(offset, 0), limit]
+        )
+        return page_result(result, limit)
+
+
+# 单例模式
+_task_index = None
+
+
+def get_task_index() -> TaskIndex:
+    """
+    获取TaskIndex实例（单例模式）
+
+    Returns:
+        TaskIndex: 任务索引实例
+    """
+    global _task_index
+    if _task_index is None:
+        _task_index = TaskIndex()
+    return _task_index
+
+
+_async_task_index = None
+
+
+def get_async_task_index() -> AsyncTaskIndex:
+    """
+    获取AsyncTaskIndex实例（单例模式，仅在API进程中使用）
+
+    Returns:
+        AsyncTaskIndex: 异步任务索引实例
+    """
+    global _async_task_index
+    if _async_task_index is None:
+        _async_task_index = AsyncTaskIndex()
+    return _async_task_index
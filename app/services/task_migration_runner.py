@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.services.task_migrations import CURRENT_SCHEMA_VERSION, MIGRATIONS
+from app.services.task_store import RedisTaskStore
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("scanned", "upgraded", "converted", "current", "missing", "conflicts", "failed")
+
+
+def merge_stats(total: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    """
+    把一批的统计累加到总计
+
+    Args:
+        total: 总计（就地修改）
+        stats: RedisTaskStore.upgrade_batch 的返回值
+    """
+    for name in COUNTERS:
+        total[name] = total.get(name, 0) + stats.get(name, 0)
+    migrations = total.setdefault("migrations", {})
+    for name, count in stats.get("migrations", {}).items():
+        migrations[name] = migrations.get(name, 0) + count
+
+
+class TaskMigrationRunner:
+    """
+    把所有任务记录升级到当前格式版本（task_migrations.MIGRATIONS）
+
+    主线程用SCAN游标遍历 transcription:*，每次SCAN得到的键作为一批交给线程池，
+    由 RedisTaskStore.upgrade_batch 用pipeline读取、转换并带版本检查地写回。
+    检查点记录已全部处理完的SCAN游标（按SCAN顺序，只在之前的批次都完成后前进），中断后从检查点继续；
+    检查点记录的格式版本与当前版本不同时从头开始。全部完成后删除检查点文件。
+    """
+
+    def __init__(
+        self,
+        store: Optional[RedisTaskStore] = None,
+        batch_size: int = 500,
+        workers: int = 4,
+        dry_run: bool = False,
+        checkpoint_path: Optional[str] = None,
+        max_rate: float = 0,
+        report_interval: float = 10
+    ):
+        """
+        Args:
+            store: 任务存储（默认新建 RedisTaskStore）
+            batch_size: 每次SCAN的COUNT，也是每批的大致键数
+            workers: 并行处理批次的线程数
+            dry_run: 只统计需要升级的记录，不写入Redis，也不写入检查点
+            checkpoint_path: 检查点文件路径（None表示不使用检查点）
+            max_rate: 每秒最多扫描的键数，0表示不限制
+            report_interval: 输出进度的间隔（秒）
+        """
+        self.store = store or RedisTaskStore()
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.dry_run = dry_run
+        self.checkpoint_path = checkpoint_path
+        self.max_rate = max_rate
+        self.report_interval = report_interval
+
+    def _load_checkpoint(self) -> Tuple[int, Dict[str, Any]]:
+        """读取检查点，返回 (SCAN游标, 已累计的统计)，没有可用的检查点时从头开始"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0, {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("schema_version") != CURRENT_SCHEMA_VERSION:
+            logger.info(
+                f"检查点的格式版本 {checkpoint.get('schema_version')} 与当前版本 {CURRENT_SCHEMA_VERSION} 不同，从头开始"
+            )
+            return 0, {}
+        logger.info(f"从检查点继续: 游标 {checkpoint['cursor']}，已扫描 {checkpoint['stats'].get('scanned', 0)} 个键")
+        return int(checkpoint["cursor"]), checkpoint["stats"]
+
+    def _save_checkpoint(self, cursor: int, totals: Dict[str, Any]) -> None:
+        if not self.checkpoint_path or self.dry_run:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "cursor": cursor,
+                "schema_version": CURRENT_SCHEMA_VERSION,
+                "stats": totals,
+                "updated_at": datetime.now().isoformat()
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, resume: bool = True) -> Dict[str, Any]:
+        """
+        执行迁移
+
+        Args:
+            resume: 是否从检查点继续
+
+        Returns:
+            Dict[str, Any]: 吞吐量报告（各项计数、每个转换应用的次数、耗时和每秒扫描的键数）
+        """
+        cursor, totals = self._load_checkpoint() if resume else (0, {})
+        resumed_scanned = totals.get("scanned", 0)
+        prefix = self.store.storage.get_full_key("")
+        match = f"{prefix}*"
+        logger.info(
+            f"开始迁移任务记录到格式版本 {CURRENT_SCHEMA_VERSION}"
+            f"（{', '.join(m.name for m in MIGRATIONS)}），dry_run={self.dry_run}"
+        )
+
+        start = time.monotonic()
+        last_report = start
+        submitted = 0
+        # (批次, SCAN返回的下一个游标)，按SCAN顺序完成
+        inflight: Deque[Tuple[Optional[Future], int]] = deque()
+
+        def complete_head():
+            future, next_cursor = inflight.popleft()
+            if future is not None:
+                merge_stats(totals, future.result())
+            self._save_checkpoint(next_cursor, totals)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while True:
+                    cursor, keys = self.store.redis.scan(cursor, match=match, count=self.batch_size)
+                    uni_keys = [key.decode()[len(prefix):] for key in keys]
+                    future = executor.submit(self.store.upgrade_batch, uni_keys, self.dry_run) if uni_keys else None
+                    inflight.append((future, cursor))
+                    submitted += len(uni_keys)
+
+                    # 最多保留 workers*2 个未完成的批次；已完成的批次按顺序推进检查点
+                    while inflight and (len(inflight) > self.workers * 2 or self._done(inflight[0][0])):
+                        complete_head()
+
+                    now = time.monotonic()
+                    if self.max_rate > 0:
+                        ahead = submitted / self.max_rate - (now - start)
+                        if ahead > 0:
+                            time.sleep(ahead)
+                    if now - last_report >= self.report_interval:
+                        self._log_progress(totals, resumed_scanned, now - start)
+                        last_report = now
+                    if cursor == 0:
+                        break
+                while inflight:
+                    complete_head()
+            finally:
+                for future, _ in inflight:
+                    if future is not None:
+                        future.cancel()
+
+        if self.checkpoint_path and not self.dry_run and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        report = self._report(totals, resumed_scanned, time.monotonic() - start)
+        logger.info(f"迁移完成: {json.dumps(report, ensure_ascii=False)}")
+        return report
+
+    @staticmethod
+    def _done(future: Optional[Future]) -> bool:
+        return future is None or future.done()
+
+    def _report(self, totals: Dict[str, Any], resumed_scanned: int, elapsed: float) -> Dict[str, Any]:
+        scanned = totals.get("scanned", 0) - resumed_scanned
+        return {
+            "schema_version": CURRENT_SCHEMA_VERSION,
+            "dry_run": self.dry_run,
+            **{name: totals.get(name, 0) for name in COUNTERS},
+            "migrations": totals.get("migrations", {}),
+            "elapsed_seconds": round(elapsed, 2),
+            # 只按本次运行处理的键计算（不含检查点之前的部分）
+            "keys_per_second": round(scanned / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+    def _log_progress(self, totals: Dict[str, Any], resumed_scanned: int, elapsed: float) -> None:
+        scanned = totals.get("scanned", 0) - resumed_scanned
+        logger.info(
+            f"已扫描 {totals.get('scanned', 0)} 个键，升级 {totals.get('upgraded', 0)}，"
+            f"冲突 {totals.get('conflicts', 0)}，失败 {totals.get('failed', 0)}，"
+            f"{scanned / elapsed if elapsed > 0 else 0:.1f} 键/秒"
+        )
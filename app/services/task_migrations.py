@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.config import settings
+
+# 任务记录中保存格式版本的字段；没有该字段的记录视为版本0
+SCHEMA_VERSION_FIELD = "schema_version"
+# 旧记录中不再保存的字段：完整的转写结果（已保存在结果文件中）
+LEGACY_FIELDS = ("result",)
+TIMESTAMP_FIELDS = ("created_at", "started_at", "completed_at")
+
+
+class TaskMigration:
+    """任务记录的一个版本化转换"""
+
+    __slots__ = ("version", "name", "transform")
+
+    def __init__(self, version: int, name: str, transform: Callable[[Dict[str, Any]], None]):
+        """
+        Args:
+            version: 转换后的格式版本（从1开始递增，不能修改已发布的版本号）
+            name: 转换名称（用于日志和吞吐量报告）
+            transform: 就地修改任务数据的函数，数据为 decode_task_fields 的结果
+        """
+        self.version = version
+        self.name = name
+        self.transform = transform
+
+
+def _timestamps_to_iso(data: Dict[str, Any]) -> None:
+    """早期版本以Unix时间戳保存时间字段，转换为ISO格式字符串"""
+    for name in TIMESTAMP_FIELDS:
+        value = data.get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            data[name] = datetime.fromtimestamp(value).isoformat()
+
+
+def _default_whisper_arch(data: Dict[str, Any]) -> None:
+    """早期版本的 extra_params 没有 whisper_arch，补为当前默认模型"""
+    extra_params = data.get("extra_params")
+    if extra_params and "whisper_arch" not in extra_params:
+        extra_params["whisper_arch"] = settings.WHISPER_MODEL_NAME
+
+
+def _drop_legacy_fields(data: Dict[str, Any]) -> None:
+    """删除不再保存在任务记录中的字段"""
+    for name in LEGACY_FIELDS:
+        data.pop(name, None)
+
+
+# 按版本号升序排列，新增转换时追加到末尾
+MIGRATIONS: Tuple[TaskMigration, ...] = (
+    TaskMigration(1, "timestamps_to_iso", _timestamps_to_iso),
+    TaskMigration(2, "default_whisper_arch", _default_whisper_arch),
+    TaskMigration(3, "drop_legacy_fields", _drop_legacy_fields),
+)
+CURRENT_SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(data: Dict[str, Any]) -> int:
+    """
+    获取任务数据的格式版本
+
+    Args:
+        data: 任务数据
+
+    Returns:
+        int: 格式版本，没有版本字段的旧记录为0
+    """
+    return int(data.get(SCHEMA_VERSION_FIELD) or 0)
+
+
+def needs_upgrade(data: Dict[str, Any]) -> bool:
+    """
+    判断任务数据是否需要升级
+
+    Args:
+        data: 任务数据
+
+    Returns:
+        bool: 格式版本低于当前版本时返回True
+    """
+    return schema_version(data) < CURRENT_SCHEMA_VERSION
+
+
+def upgrade_record(data: Dict[str, Any]) -> List[str]:
+    """
+    按顺序就地应用所有未应用的转换，并把格式版本设为当前版本
+
+    Args:
+        data: 任务数据
+
+    Returns:
+        List[str]: 本次应用的转换名称
+    """
+    current = schema_version(data)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version > current:
+            migration.transform(data)
+            applied.append(migration.name)
+    data[SCHEMA_VERSION_FIELD] = CURRENT_SCHEMA_VERSION
+    return applied
@@ -0,0 +1,212 @@
+import json
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.services.task_index import get_task_index
+from app.services.task_store import RedisTaskStore, get_task_store
+from app.services.transcription_service import TASK_STATUSES, TERMINAL_STATUSES
+from app.utils.redis_codec import loads_json
+
+logger = logging.getLogger(__name__)
+
+# 归档的摘要字段（不包含JWT令牌、文件路径等）
+ARCHIVE_FIELDS = (
+    "uni_key", "task_id", "client_id", "status", "code", "message", "filename", "file_size",
+    "created_at", "started_at", "completed_at", "audio_duration", "processing_time",
+    "retry_count", "result_summary", "batch_id", "cached_from"
+)
+SWEEP_BATCH_SIZE = 500
+# 内存统计时每种状态抽样的任务数
+MEMORY_SAMPLE_SIZE = 50
+
+
+class TaskRetentionService:
+    """
+    任务记录的保留策略
+
+    任务进入结束状态（completed/failed）时设置 TASK_RECORD_TTL_HOURS 的过期时间（与文件清理对齐）。
+    定期清理任务中执行 sweep：在下一次清理之前就会过期的记录，先把摘要追加到JSONL归档（可选），
+    再删除记录和列表索引；没有过期时间的旧记录按完成时间补设过期时间。
+    """
+
+    def __init__(self):
+        self.store = get_task_store()
+        self.index = get_task_index()
+        # 内存存储（基准测试）自行处理过期，不需要清理
+        self.enabled = isinstance(self.store, RedisTaskStore)
+        self.redis = self.store.redis if self.enabled else None
+        self.ttl = settings.TASK_RECORD_TTL_HOURS * 3600
+        self.interval = settings.CLEANUP_INTERVAL_SECONDS
+        self.archive_enabled = settings.TASK_ARCHIVE_ENABLED
+        self.archive_dir = settings.TASK_ARCHIVE_DIR
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        归档并删除即将过期的任务记录，清理已过期记录的索引
+
+        Returns:
+            Dict[str, int]: 归档、删除、补设过期时间和清理索引的数量
+        """
+        stats = {"archived": 0, "deleted": 0, "expire_set": 0, "pruned": 0}
+        if not self.enabled or self.ttl <= 0:
+            return stats
+        # 过期时间 >= 创建时间 + 保留时间，只有创建时间早于该分数的记录可能在下一次清理前过期
+        max_score = time.time() + self.interval - self.ttl
+        for status in TERMINAL_STATUSES:
+            key = self.index.index_key(status=status)
+            offset = 0
+            while True:
+                uni_keys = [
+                    member.decode() for member in
+                    self.redis.zrangebyscore(key, "-inf", max_score, start=offset, num=SWEEP_BATCH_SIZE)
+                ]
+                if not uni_keys:
+                    break
+                kept = self._sweep_batch(uni_keys, stats)
+                offset += kept
+                if len(uni_keys) < SWEEP_BATCH_SIZE:
+                    break
+        logger.info(f"任务记录保留清理完成: {stats}")
+        return stats
+
+    def _sweep_batch(self, uni_keys: List[str], stats: Dict[str, int]) -> int:
+        """处理一批候选记录，返回保留在索引中的数量"""
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key in uni_keys:
+            full_key = self.store.storage.get_full_key(uni_key)
+            pipe.pttl(full_key)
+            pipe.hmget(full_key, *ARCHIVE_FIELDS)
+        results = pipe.execute(raise_on_error=False)
+
+        now = time.time()
+        expiring: List[Dict[str, Any]] = []
+        gone: List[str] = []
+        kept = 0
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key, pttl, values in zip(uni_keys, results[0::2], results[1::2]):
+            if pttl == -2:
+                gone.append(uni_key)
+                continue
+            if isinstance(values, Exception):
+                # 尚未转换的旧JSON记录，下次读写时转换后再处理
+                kept += 1
+                continue
+            summary = {
+                name: loads_json(value) if value is not None else None
+                for name, value in zip(ARCHIVE_FIELDS, values)
+            }
+            if pttl == -1:
+                # 没有过期时间的旧记录：按完成时间计算剩余保留时间
+                remaining = self.ttl - (now - self._finished_timestamp(summary))
+                if remaining > self.interval:
+                    pipe.expire(self.store.storage.get_full_key(uni_key), int(remaining))
+                    stats["expire_set"] += 1
+                    kept += 1
+                    continue
+            elif pttl > self.interval * 1000:
+                kept += 1
+                continue
+            expiring.append(summary)
+
+        if expiring:
+            if self.archive_enabled:
+                self._archive(expiring)
+                stats["archived"] += len(expiring)
+            for summary in expiring:
+                pipe.delete(self.store.storage.get_full_key(summary["uni_key"]))
+                self.index.remove(summary["uni_key"], summary["client_id"], summary["status"], pipe=pipe)
+            stats["deleted"] += len(expiring)
+        pipe.execute()
+
+        if gone:
+            # 记录已经过期，不知道客户端，从所有索引中移除
+            self.index.remove_everywhere(gone)
+            stats["pruned"] += len(gone)
+        return kept
+
+    @staticmethod
+    def _finished_timestamp(summary: Dict[str, Any]) -> float:
+        """任务结束时间（没有完成时间时使用创建时间）"""
+        for field in ("completed_at", "created_at"):
+            try:
+                return datetime.fromisoformat(summary[field]).timestamp()
+            except (TypeError, ValueError):
+                continue
+        return 0.0
+
+    def _archive(self, summaries: List[Dict[str, Any]]) -> None:
+        """将任务摘要追加到按日期分隔的JSONL文件"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"tasks-{datetime.now():%Y%m%d}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            for summary in summaries:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        按状态统计任务记录的数量和内存占用（每种状态抽样估计），以及索引的内存占用
+
+        Returns:
+            Dict[str, Any]: 内存报告
+        """
+        if not self.enabled:
+            return {"backend": self.store.name}
+        statuses = {}
+        for status in TASK_STATUSES:
+            key = self.index.index_key(status=status)
+            count = self.redis.zcard(key)
+            sample = [member.decode() for member in self.redis.zrandmember(key, min(count, MEMORY_SAMPLE_SIZE)) or []] if count else []
+            sizes = self._memory_usage([self.store.storage.get_full_key(uni_key) for uni_key in sample])
+            average = sum(sizes) / len(sizes) if sizes else 0
+            statuses[status] = {
+                "count": count,
+                "sampled": len(sizes),
+                "avg_bytes": round(average),
+                "estimated_bytes": round(average * count)
+            }
+
+        index_keys = [self.index.storage.get_full_key(name) for name in self.index.storage.scan_keys("*")]
+        index_bytes = sum(self._memory_usage(index_keys))
+        used_memory = self.redis.info("memory").get("used_memory")
+        return {
+            "statuses": statuses,
+            "total_tasks": sum(item["count"] for item in statuses.values()),
+            "estimated_task_bytes": sum(item["estimated_bytes"] for item in statuses.values()),
+            "index_keys": len(index_keys),
+            "index_bytes": index_bytes,
+            "redis_used_memory": used_memory,
+            "record_ttl_hours": settings.TASK_RECORD_TTL_HOURS,
+            "archive_enabled": self.archive_enabled
+        }
+
+    def _memory_usage(self, keys: List[str]) -> List[int]:
+        """通过一个pipeline获取多个键的内存占用（字节），不存在的键不计入"""
+        if not keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+        return [size for size in pipe.execute(raise_on_error=False) if isinstance(size, int)]
+
+
+# 单例模式
+_task_retention_service = None
+
+
+def get_task_retention_service() -> TaskRetentionService:
+    """
+    获取TaskRetentionService实例（单例模式）
+
+    Returns:
+        TaskRetentionService: 任务记录保留服务实例
+    """
+    global _task_retention_service
+    if _task_retention_service is None:
+        _task_retention_service = TaskRetentionService()
+    return _task_retention_service
@@ -0,0 +1,157 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.task_events import get_task_event_hub
+from app.schemas.transcription import TranscriptionTask
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStatusCache:
+    """
+    API进程内的任务状态缓存（LRU + 短TTL）
+
+    缓存解析后的 TranscriptionTask（任务不存在时缓存None），状态查询和任务详情的轮询不必每次读取Redis和解析。
+    TaskStore 每次写入任务时在 TASK_EVENTS_CHANNEL 上发布事件，本进程的 TaskEventHub 收到后立即删除对应的缓存条目；
+    订阅断开期间清空缓存，条目最多保留 TASK_STATUS_CACHE_TTL 秒。
+    同一个任务的并发未命中只读取一次Redis（single-flight），读取期间收到的失效事件会使本次结果不写入缓存。
+    """
+
+    def __init__(self):
+        # 内存存储不发布变化事件，不使用缓存
+        self.enabled = settings.TASK_STATUS_CACHE_ENABLED and settings.TASK_STORE_BACKEND != "memory"
+        self.ttl = settings.TASK_STATUS_CACHE_TTL
+        self.max_size = settings.TASK_STATUS_CACHE_SIZE
+        self._entries: "OrderedDict[str, Tuple[float, Optional[TranscriptionTask]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stale: Set[str] = set()
+        self.events = get_task_event_hub()
+        self.events.add_listener(self)
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "evictions": 0}
+
+    async def get(
+        self,
+        uni_key: str,
+        loader: Callable[[str], Awaitable[Optional[TranscriptionTask]]]
+    ) -> Optional[TranscriptionTask]:
+        """
+        读取任务，未命中时调用loader读取并写入缓存
+
+        Args:
+            uni_key: 任务唯一标识符
+            loader: 从Redis读取并解析任务的协程函数
+
+        Returns:
+            Optional[TranscriptionTask]: 任务（调用方不应修改），不存在时返回None
+        """
+        if not self.enabled or not self.events.subscribed:
+            # 没有失效通知时不使用缓存，避免返回过期的状态
+            return await loader(uni_key)
+
+        entry = self._entries.get(uni_key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(uni_key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+        future = self._inflight.get(uni_key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[uni_key] = future
+        try:
+            task = await loader(uni_key)
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(task)
+            if uni_key not in self._stale:
+                self._put(uni_key, task)
+            return task
+        finally:
+            self._inflight.pop(uni_key, None)
+            self._stale.discard(uni_key)
+
+    def contains(self, uni_key: str) -> bool:
+        """
+        任务是否有未过期的缓存条目（get 不需要读取Redis）
+
+        Args:
+            uni_key: 任务唯一标识符
+        """
+        if not self.enabled or not self.events.subscribed:
+            return False
+        entry = self._entries.get(uni_key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def _put(self, uni_key: str, task: Optional[TranscriptionTask]) -> None:
+        self._entries[uni_key] = (time.monotonic() + self.ttl, task)
+        self._entries.move_to_end(uni_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, uni_key: str) -> None:
+        """
+        删除任务的缓存条目，正在读取的结果也不会写入缓存
+
+        Args:
+            uni_key: 任务唯一标识符
+        """
+        self.stats["invalidations"] += 1
+        self._entries.pop(uni_key, None)
+        if uni_key in self._inflight:
+            self._stale.add(uni_key)
+
+    def clear(self) -> None:
+        """清空缓存（事件订阅建立或断开时调用）"""
+        self._entries.clear()
+        self._stale.update(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict[str, Any]: 命中、未命中、合并、失效和淘汰次数，命中率和Redis读取的减少比例
+        """
+        hits, misses, coalesced = self.stats["hits"], self.stats["misses"], self.stats["coalesced"]
+        total = hits + misses + coalesced
+        return {
+            "enabled": self.enabled,
+            "subscribed": self.events.subscribed,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            **self.stats,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            # 每次未命中读取一次Redis，其余请求（命中和合并）都没有访问Redis
+            "redis_offload_ratio": round((hits + coalesced) / total, 4) if total else 0.0
+        }
+
+
+# 单例模式
+_task_status_cache = None
+
+
+def get_task_status_cache() -> TaskStatusCache:
+    """
+    获取TaskStatusCache实例（单例模式，每个API进程一个）
+
+    Returns:
+        TaskStatusCache: 任务状态缓存实例
+    """
+    global _task_status_cache
+    if _task_status_cache is None:
+        _task_status_cache = TaskStatusCache()
+    return _task_status_cache
@@ -1,41 +1,145 @@
+import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 from fastapi import HTTPException
 from app.core.config import settings
-from app.services.redis_service import RedisService
+from app.services.task_events import TaskEventSubscription, get_task_event_hub
+from app.services.task_index import get_async_task_index
+from app.services.task_store import get_async_task_store
+from app.services.task_status_cache import get_task_status_cache
 from app.schemas.transcription import TranscriptionTask
 from app.utils import get_download_url
+from app.utils.etag import etag_matches, list_etag, task_etag
 
 logger = logging.getLogger(__name__)
 
+# 流式连接建立或重连时发送的每种状态的最多任务数（按客户端订阅时）
+STREAM_SNAPSHOT_LIMIT = 100
+
 class TaskStatusService:
+    """
+    任务查询服务（状态查询、任务列表、任务详情）
+
+    只在API进程中使用，通过 redis.asyncio 读取任务，等待Redis时不阻塞事件循环。
+    状态查询和任务详情经过进程内的 TaskStatusCache；流式推送（SSE/WebSocket）由 TaskEventHub 唤醒。
+    """
     def __init__(self):
-        redis_service = RedisService()
-        self.redis = redis_service.get_client(prefix="transcription:")
+        self.store = get_async_task_store()
+        self.index = get_async_task_index()
+        self.cache = get_task_status_cache()
+        self.events = get_task_event_hub()
+
+    async def _load_task(self, uni_key: str) -> Optional[TranscriptionTask]:
+        """从Redis读取并解析任务，不存在时返回None"""
+        task_data = await self.store.load(uni_key)
+        return TranscriptionTask(**task_data) if task_data else None
+
+    @staticmethod
+    def task_etag(task: TranscriptionTask) -> str:
+        """
+        任务的ETag（状态查询和任务详情共用，由 version 和 created_at 计算）
+
+        Args:
+            task: 任务
+
+        Returns:
+            str: ETag
+        """
+        return task_etag(task.version, task.created_at)
+
+    async def _match_etag(self, uni_key: str, if_none_match: Optional[str]) -> Optional[str]:
+        """
+        在读取和解析完整任务之前检查 If-None-Match：只读取 version、created_at 和格式版本
+
+        任务在进程内缓存中时不需要提前检查（读取缓存不访问Redis）。
+
+        Returns:
+            Optional[str]: 任务没有变化时返回ETag，否则返回None（需要完整读取）
+        """
+        if not if_none_match or self.cache.contains(uni_key):
+            return None
+        versions = await self.store.load_versions([uni_key])
+        if not versions or versions[0] is None:
+            return None
+        etag = task_etag(*versions[0])
+        return etag if etag_matches(if_none_match, etag) else None
         
-    async def get_task_status(self, uni_key: str) -> Dict[str, Any]:
+    async def _wait_for_change(self, uni_key: str, since_version: int, wait: float) -> Optional[TranscriptionTask]:
+        """
+        等待任务的版本号大于 since_version（长轮询），不占用线程
+
+        先订阅任务变化再读取任务，读取之后发生的变化不会错过。事件订阅断开期间每秒重新读取一次；
+        流式连接数达到上限时不等待，直接返回当前状态。
+
+        Args:
+            uni_key: 任务唯一标识符
+            since_version: 客户端已知的版本号
+            wait: 最长等待时间（秒）
+
+        Returns:
+            Optional[TranscriptionTask]: 最新的任务，不存在时返回None
+        """
+        try:
+            subscription = self.events.subscribe(uni_key)
+        except RuntimeError:
+            return await self.cache.get(uni_key, self._load_task)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            task = await self.cache.get(uni_key, self._load_task)
+            while task is not None and task.version <= since_version:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                if not self.events.subscribed:
+                    remaining = min(remaining, 1.0)
+                resync, changed = await subscription.wait(remaining)
+                if resync or changed or not self.events.subscribed:
+                    task = await self.cache.get(uni_key, self._load_task)
+            return task
+        finally:
+            self.events.unsubscribe(subscription)
+
+    async def get_task_status(
+        self,
+        uni_key: str,
+        wait: float = 0,
+        since_version: Optional[int] = None,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """
         获取任务状态
         :param uni_key: 任务唯一标识符
-        :return: 任务状态信息
+        :param wait: 长轮询的最长等待时间（秒），与 since_version 一起使用
+        :param since_version: 客户端已知的版本号，任务的版本号不大于该值时等待变化，最多 wait 秒
+        :param if_none_match: If-None-Match 请求头
+        :return: (任务状态信息（包含单调递增的 version），ETag)；任务没有变化（If-None-Match 匹配）时状态信息为None，
+            任务不存在时ETag为None
         """
         try:
-            # 获取任务数据
-            task_data = self.redis.get(uni_key)
-            if not task_data:
+            if wait > 0 and since_version is not None and self.events.enabled:
+                task = await self._wait_for_change(uni_key, since_version, wait)
+            else:
+                etag = await self._match_etag(uni_key, if_none_match)
+                if etag:
+                    return None, etag
+                # 获取任务（优先读取进程内缓存）
+                task = await self.cache.get(uni_key, self._load_task)
+            if task is None:
                 return {
                     "code": -4,
                     "msg": "此任务还未上传",
                     "upload_url": settings.UPLOAD_URL
-                }
-            
-            # 将Redis数据转换为TranscriptionTask对象
-            task = TranscriptionTask(**task_data)
+                }, None
+            etag = self.task_etag(task)
+            if etag_matches(if_none_match, etag):
+                return None, etag
             
             # 构建基础响应
             response = {
                 "code": task.code,
-                "task_id": task.task_id
+                "task_id": task.task_id,
+                "version": task.version
             }
             
             # 根据任务状态构建响应
@@ -79,7 +183,7 @@ class TaskStatusService:
                         "msg": task.message or "处理失败"
                     })
             
-            return response
+            return response, etag
             
         except Exception as e:
             logger.error(f"查询失败: {str(e)}")
@@ -88,39 +192,79 @@ class TaskStatusService:
                 detail=f"查询失败: {str(e)}"
             )
             
-    async def get_tasks(self, uni_keys: Optional[List[str]] = None, limit: int = 10, offset: int = 0) -> List[TranscriptionTask]:
+    async def get_tasks(
+        self,
+        uni_keys: Optional[List[str]] = None,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        client_id: Optional[str] = None,
+        status: Optional[str] = None,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[Optional[List[TranscriptionTask]], Optional[str], str]:
         """
-        获取任务列表
+        获取任务列表，按创建时间倒序
+        
+        不指定uni_keys时通过有序集合索引分页，每页只读取本页的任务（一次pipeline）。
+        ETag由本页读取的每个任务的版本信息和下一页游标计算；提供 If-None-Match 时先只读取版本信息，
+        没有变化时不读取和解析完整的任务。
         
         Args:
-            uni_keys: 指定的任务唯一标识符列表，如果为None则获取所有任务
+            uni_keys: 指定的任务唯一标识符列表，如果为None则按索引分页
             limit: 返回的最大任务数量
-            offset: 偏移量
+            offset: 偏移量（在游标之后跳过的条数）
+            cursor: 上一页返回的游标
+            client_id: 按客户端筛选
+            status: 按状态筛选
+            if_none_match: If-None-Match 请求头
             
         Returns:
-            List[TranscriptionTask]: 任务列表
+            Tuple[Optional[List[TranscriptionTask]], Optional[str], str]:
+                (任务列表（没有变化时为None）, 下一页游标（没有更多时为None）, ETag)
         """
         try:
-            # 获取所有任务
-            all_tasks = []
-            for key in self.redis.get_keys("*"):
-                task_data = self.redis.get(key)
+            next_cursor = None
+            if uni_keys:
+                page_keys = uni_keys
+            else:
+                page_keys, next_cursor = await self.index.page(client_id, status, cursor, limit, offset)
+
+            if if_none_match:
+                versions = await self.store.load_versions(page_keys)
+                if versions is not None:
+                    etag = list_etag(page_keys, versions, next_cursor)
+                    if etag_matches(if_none_match, etag):
+                        return None, next_cursor, etag
+            
+            page_data = await self.store.load_many(page_keys)
+            etag = list_etag(
+                page_keys,
+                [(data.get("version", 0), data.get("created_at")) if data else None for data in page_data],
+                next_cursor
+            )
+            if etag_matches(if_none_match, etag):
+                return None, next_cursor, etag
+
+            tasks = []
+            for key, task_data in zip(page_keys, page_data):
                 if task_data:
                     # 确保task_data包含uni_key字段
-                    if 'uni_key' not in task_data:
-                        task_data['uni_key'] = key
-                    task = TranscriptionTask(**task_data)
-                    if not uni_keys or task.uni_key in uni_keys:
-                        all_tasks.append(task)
+                    task_data.setdefault('uni_key', key)
+                    tasks.append(TranscriptionTask(**task_data))
             
-            # 按创建时间倒序排序所有任务
-            all_tasks.sort(key=lambda x: x.created_at, reverse=True)
+            if uni_keys:
+                # 指定的任务按创建时间倒序排序后分页
+                tasks = [
+                    task for task in tasks
+                    if (not client_id or task.client_id == client_id) and (not status or task.status == status)
+                ]
+                tasks.sort(key=lambda x: x.created_at, reverse=True)
+                tasks = tasks[offset:offset + limit]
             
-            # 分页
-            tasks = all_tasks[offset:offset + limit]
-            
-            return tasks
+            return tasks, next_cursor, etag
             
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"无效的游标: {cursor}") from e
         except Exception as e:
             logger.error(f"获取任务列表失败: {str(e)}")
             raise HTTPException(
@@ -128,31 +272,39 @@ class TaskStatusService:
                 detail=f"获取任务列表失败: {str(e)}"
             )
 
-    async def get_task_detail(self, uni_key: str) -> TranscriptionTask:
+    async def get_task_detail(
+        self,
+        uni_key: str,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[Optional[TranscriptionTask], str]:
         """
         获取任务详细信息
         
         Args:
             uni_key: 任务唯一标识符
+            if_none_match: If-None-Match 请求头
             
         Returns:
-            TranscriptionTask: 任务详细信息
+            Tuple[Optional[TranscriptionTask], str]: (任务详细信息（没有变化时为None）, ETag)
             
         Raises:
             HTTPException: 当任务不存在或查询失败时
         """
         try:
-            # 获取任务数据
-            task_data = self.redis.get(uni_key)
-            if not task_data:
+            etag = await self._match_etag(uni_key, if_none_match)
+            if etag:
+                return None, etag
+            # 获取任务（优先读取进程内缓存）
+            task = await self.cache.get(uni_key, self._load_task)
+            if task is None:
                 raise HTTPException(
                     status_code=404,
                     detail="任务不存在"
                 )
-            
-            # 将Redis数据转换为TranscriptionTask对象
-            task = TranscriptionTask(**task_data)
-            return task
+            etag = self.task_etag(task)
+            if etag_matches(if_none_match, etag):
+                return None, etag
+            return task, etag
             
         except HTTPException:
             raise
@@ -161,4 +313,105 @@ class TaskStatusService:
             raise HTTPException(
                 status_code=500,
                 detail=f"获取任务详情失败: {str(e)}"
-            ) 
\ No newline at end of file
+            )
+
+    @staticmethod
+    def task_event(task: TranscriptionTask) -> Dict[str, Any]:
+        """
+        流式推送的任务状态
+
+        Args:
+            task: 任务
+
+        Returns:
+            Dict[str, Any]: 状态、进度和版本号等字段
+        """
+        return {
+            "uni_key": task.uni_key,
+            "task_id": task.task_id,
+            "client_id": task.client_id,
+            "status": task.status,
+            "progress": task.progress,
+            "progress_message": task.progress_message,
+            "code": task.code,
+            "message": task.message,
+            "version": task.version
+        }
+
+    async def _stream_snapshot(self, uni_key: Optional[str], client_id: Optional[str]) -> List[Dict[str, Any]]:
+        """连接建立或事件订阅重连时发送的当前状态：指定任务，或客户端排队中和处理中的任务"""
+        if uni_key:
+            task = await self.cache.get(uni_key, self._load_task)
+            return [self.task_event(task) if task else {"uni_key": uni_key, "deleted": True}]
+        keys = []
+        for status in ("processing", "pending"):
+            page_keys, _ = await self.index.page(client_id, status, None, STREAM_SNAPSHOT_LIMIT, 0)
+            keys += page_keys
+        events = []
+        for task_data in await self.store.load_many(keys):
+            if task_data:
+                task = TranscriptionTask(**task_data)
+                self.events.set_owner(task.uni_key, task.client_id)
+                events.append(self.task_event(task))
+        return events
+
+    def open_task_stream(self, uni_key: Optional[str] = None, client_id: Optional[str] = None) -> TaskEventSubscription:
+        """
+        为流式连接创建订阅（在开始发送响应之前调用，以便返回错误状态码）
+
+        Args:
+            uni_key: 只推送该任务
+            client_id: 只推送该客户端的任务（两者都不提供时推送所有任务）
+
+        Returns:
+            TaskEventSubscription: 订阅，交给 stream_task_events
+
+        Raises:
+            HTTPException: 事件订阅不可用或流式连接数达到上限时返回503
+        """
+        if not self.events.enabled:
+            raise HTTPException(status_code=503, detail="当前任务存储不支持流式推送")
+        try:
+            return self.events.subscribe(uni_key, client_id)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def stream_task_events(self, subscription: TaskEventSubscription) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        流式获取任务状态变化，结束时取消订阅
+
+        先发送当前状态，之后每当任务被写入（创建、进度、状态转换、删除）时发送最新状态；
+        同一任务在发送前的多次变化合并为一次。任务被删除时发送 {"uni_key": ..., "deleted": true}。
+
+        Args:
+            subscription: open_task_stream 返回的订阅
+
+        Yields:
+            Optional[Dict[str, Any]]: 任务状态，None表示 TASK_STREAM_KEEPALIVE_SECONDS 内没有变化（用于发送心跳）
+        """
+        uni_key, client_id = subscription.uni_key, subscription.client_id
+        try:
+            for event in await self._stream_snapshot(uni_key, client_id):
+                yield event
+            while True:
+                resync, changed = await subscription.wait(settings.TASK_STREAM_KEEPALIVE_SECONDS)
+                if resync:
+                    for event in await self._stream_snapshot(uni_key, client_id):
+                        yield event
+                    continue
+                if not changed:
+                    yield None
+                    continue
+                for key in changed:
+                    task = await self.cache.get(key, self._load_task)
+                    if task is None:
+                        known, owner = self.events.owner(key)
+                        if uni_key or not client_id or (known and owner == client_id):
+                            yield {"uni_key": key, "deleted": True}
+                        continue
+                    self.events.set_owner(key, task.client_id)
+                    if client_id and task.client_id != client_id:
+                        continue
+                    yield self.task_event(task)
+        finally:
+            self.events.unsubscribe(subscription)
@@ -0,0 +1,1180 @@
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.services.redis_service import AsyncRedisService, RedisService
+from app.services.store_metrics import timed
+from app.services.task_migrations import (
+    CURRENT_SCHEMA_VERSION, SCHEMA_VERSION_FIELD, needs_upgrade, upgrade_record
+)
+from app.utils.redis_codec import dumps_json, get_record_codec, loads_json
+
+logger = logging.getLogger(__name__)
+
+# 以 "字段.子字段" 的形式展开存储的嵌套字段，更新时只写入变化的子字段
+NESTED_FIELDS = ("extra_params",)
+# 更新时一并返回的旧值（状态变化时用于移动列表索引）
+INDEX_FIELDS = ("status", "created_at", "client_id")
+# 计算ETag时读取的字段（不读取和解析完整记录）
+VERSION_FIELDS = ("version", "created_at", SCHEMA_VERSION_FIELD)
+
+# 只更新给定字段并递增版本号，任务不存在时不创建
+# KEYS[1]: 任务键
+# ARGV: 字段名和值交替排列
+# 返回更新前的 status、created_at、client_id，任务不存在时返回nil
+UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local old = redis.call('HMGET', KEYS[1], 'status', 'created_at', 'client_id')
+redis.call('HSET', KEYS[1], unpack(ARGV))
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return old
+"""
+
+# 状态转换（比较并设置）：当前状态在允许的状态中、处理中的任务属于同一个worker、版本号一致时才写入
+# KEYS[1]: 任务键
+# ARGV[1]: worker标识（编码后，空字符串表示不检查）  ARGV[2]: 需要加1的字段（空字符串表示没有）
+# ARGV[3]: 期望的版本号（空字符串表示不检查）  ARGV[4]: 过期时间（秒，0不变，-1取消过期）
+# ARGV[5]: 允许的当前状态数量n  ARGV[6..5+n]: 允许的当前状态（编码后）  ARGV[6+n..]: 字段名和值交替排列
+# 返回 {-1} 任务不存在；{0, 当前状态, 当前记录} 未转换；{1, 原状态, 转换后的记录} 已转换
+TRANSITION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1}
+end
+local owner = ARGV[1]
+local incr = ARGV[2]
+local ttl = tonumber(ARGV[4])
+local n = tonumber(ARGV[5])
+local current = redis.call('HGET', KEYS[1], 'status')
+local allowed = false
+for i = 6, 5 + n do
+    if current == ARGV[i] then
+        allowed = true
+        break
+    end
+end
+if allowed and owner ~= '' and current == '"processing"' and redis.call('HGET', KEYS[1], 'claimed_by') ~= owner then
+    allowed = false
+end
+if allowed and ARGV[3] ~= '' and (redis.call('HGET', KEYS[1], 'version') or '0') ~= ARGV[3] then
+    allowed = false
+end
+if not allowed then
+    return {0, current, redis.call('HGETALL', KEYS[1])}
+end
+if #ARGV >= 6 + n then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 6 + n))
+end
+if incr ~= '' then
+    redis.call('HINCRBY', KEYS[1], incr, 1)
+end
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+elseif ttl < 0 then
+    redis.call('PERSIST', KEYS[1])
+end
+return {1, current, redis.call('HGETALL', KEYS[1])}
+"""
+
+# 写入处理中任务的进度：只比较状态和worker，写入两个字段，不返回记录
+# KEYS[1]: 任务键
+# ARGV[1]: worker标识（编码后，空字符串表示不检查）  ARGV[2]: 进度（编码后）  ARGV[3]: 进度消息（编码后）
+# 返回 1 已写入，0 任务不存在、不在处理中或不属于该worker
+PROGRESS_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= '"processing"' then
+    return 0
+end
+if ARGV[1] ~= '' and redis.call('HGET', KEYS[1], 'claimed_by') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'progress', ARGV[2], 'progress_message', ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return 1
+"""
+
+# 将旧的JSON字符串记录转换为哈希（只在记录未被其他进程改写时转换，保留过期时间）
+# KEYS[1]: 任务键
+# ARGV[1]: 读取到的JSON字符串  ARGV[2..]: 字段名和值交替排列
+# 返回 1 已转换，0 已经是哈希或不存在，-1 转换期间记录被改写
+MIGRATE_SCRIPT = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'string' then
+    return 0
+end
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# 将旧格式版本的哈希记录升级为当前版本（只在版本号未变化时写入），并递增版本号
+# KEYS[1]: 任务键
+# ARGV[1]: 读取到的版本号  ARGV[2]: 需要删除的字段数量n  ARGV[3..2+n]: 需要删除的字段  ARGV[3+n..]: 字段名和值交替排列
+# 返回 1 已升级，0 读取后记录被改写，-1 任务不存在
+UPGRADE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+if (redis.call('HGET', KEYS[1], 'version') or '0') ~= ARGV[1] then
+    return 0
+end
+local n = tonumber(ARGV[2])
+if n > 0 then
+    redis.call('HDEL', KEYS[1], unpack(ARGV, 3, 2 + n))
+end
+if #ARGV >= 3 + n then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3 + n))
+end
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return 1
+"""
+
+MIGRATE_ATTEMPTS = 3
+# 任务记录变化时发布事件的频道（消息为 {"uni_key": ...}，创建时带 client_id），API进程据此使本地缓存失效并推送流式更新
+TASK_EVENTS_CHANNEL = "transcription:events"
+
+
+def encode_task_fields(data: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    将任务数据编码为哈希字段，每个字段的值单独JSON编码
+
+    字段值保持为普通JSON（不使用RecordCodec的版本头），Lua脚本需要直接比较状态、对版本号执行HINCRBY
+
+    Args:
+        data: 任务数据（可以只包含部分字段）
+
+    Returns:
+        Dict[str, bytes]: 哈希字段
+    """
+    fields = {}
+    for name, value in data.items():
+        if name in NESTED_FIELDS:
+            # 嵌套字段为None时不写入（与原先忽略 extra_params=None 的更新一致）
+            for sub_name, sub_value in (value or {}).items():
+                fields[f"{name}.{sub_name}"] = dumps_json(sub_value)
+        else:
+            fields[name] = dumps_json(value)
+    return fields
+
+
+def encode_task_record(data: Dict[str, Any]) -> Dict[str, bytes]:
+    """
+    将完整的任务记录编码为哈希字段，并标记为当前格式版本
+
+    Args:
+        data: 完整的任务数据
+
+    Returns:
+        Dict[str, bytes]: 哈希字段
+    """
+    fields = encode_task_fields(data)
+    fields[SCHEMA_VERSION_FIELD] = dumps_json(CURRENT_SCHEMA_VERSION)
+    return fields
+
+
+def build_upgrade_args(raw: Dict[bytes, bytes], data: Dict[str, Any]) -> List[Any]:
+    """
+    根据读取到的哈希字段和升级后的任务数据构造 UPGRADE_SCRIPT 的参数（只写入变化的字段）
+
+    Args:
+        raw: 升级前HGETALL的结果
+        data: 升级后的任务数据
+
+    Returns:
+        List[Any]: 脚本参数
+    """
+    fields = encode_task_fields({name: value for name, value in data.items() if name != "version"})
+    removed = [name for name in raw if name != b"version" and name.decode() not in fields]
+    args: List[Any] = [raw.get(b"version", b"0"), len(removed), *removed]
+    for name, value in fields.items():
+        if raw.get(name.encode()) != value:
+            args += [name, value]
+    return args
+
+
+def decode_task_fields(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    """
+    将哈希字段解码为任务数据
+
+    Args:
+        raw: HGETALL的结果
+
+    Returns:
+        Dict[str, Any]: 任务数据
+    """
+    data: Dict[str, Any] = {}
+    for key, value in raw.items():
+        name, dot, sub_name = key.decode().partition(".")
+        value = loads_json(value)
+        if dot and name in NESTED_FIELDS:
+            data.setdefault(name, {})[sub_name] = value
+        else:
+            data[name] = value
+    return data
+
+
+def decode_task_versions(results: List[Any]) -> Optional[List[Optional[Tuple[int, str]]]]:
+    """
+    将每个任务 VERSION_FIELDS 的HMGET结果解码为版本信息
+
+    旧的JSON字符串记录、缺少版本号或格式版本低于当前版本的记录在完整读取时会被转换或升级，版本号会变化，
+    此时无法只凭这几个字段判断记录是否变化，返回None。
+
+    Args:
+        results: 每个任务的HMGET结果（pipeline中的异常也在其中）
+
+    Returns:
+        Optional[List[Optional[Tuple[int, str]]]]: 与参数顺序一致的 (version, created_at)，不存在的任务为None；
+            有任务无法判断时返回None
+    """
+    versions: List[Optional[Tuple[int, str]]] = []
+    for fields in results:
+        if isinstance(fields, Exception):
+            if _is_wrongtype(fields):
+                return None
+            raise fields
+        version, created_at, schema_version = fields
+        if version is None and created_at is None and schema_version is None:
+            versions.append(None)
+            continue
+        if version is None or created_at is None or schema_version is None:
+            return None
+        if loads_json(schema_version) != CURRENT_SCHEMA_VERSION:
+            return None
+        versions.append((int(version), loads_json(created_at)))
+    return versions
+
+
+def _pairs_to_dict(pairs: List[bytes]) -> Dict[bytes, bytes]:
+    return dict(zip(pairs[0::2], pairs[1::2]))
+
+
+def _is_wrongtype(error: Exception) -> bool:
+    return isinstance(error, ResponseError) and "WRONGTYPE" in str(error)
+
+
+class TaskStoreBackend(ABC):
+    """
+    任务存储接口
+
+    任务数据为 TranscriptionTask.model_dump() 形式的字典，extra_params 按子字段合并更新，
+    每次写入递增 version 字段。实现：RedisTaskStore（生产）、MemoryTaskStore（单进程基准测试，不需要Redis）。
+    所有操作都通过 store_metrics.timed 记录延迟和错误次数。
+    """
+
+    # 延迟统计中的操作名前缀
+    name = ""
+
+    def migrate(self, uni_key: str) -> bool:
+        """
+        将旧格式的记录转换为当前格式（没有旧格式的实现不需要转换）
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            bool: 是否进行了转换
+        """
+        return False
+
+    @abstractmethod
+    def save(self, data: Dict[str, Any]) -> None:
+        """
+        写入完整的任务记录（覆盖已有记录）
+
+        Args:
+            data: 任务数据，必须包含 uni_key
+        """
+
+    @abstractmethod
+    def save_many(self, items: List[Dict[str, Any]]) -> None:
+        """
+        写入多个完整的任务记录
+
+        Args:
+            items: 任务数据列表
+        """
+
+    @abstractmethod
+    def load(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务记录
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务数据，不存在时返回None
+        """
+
+    @abstractmethod
+    def load_many(self, uni_keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        读取多个任务记录
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: 与参数顺序一致的任务数据，不存在的任务为None
+        """
+
+    def load_statuses(self, uni_keys: List[str]) -> List[Optional[str]]:
+        """
+        只读取多个任务的状态
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            List[Optional[str]]: 与参数顺序一致的状态，不存在的任务为None
+        """
+        return [data.get("status") if data else None for data in self.load_many(uni_keys)]
+
+    @abstractmethod
+    def update(
+        self,
+        uni_key: str,
+        updates: Dict[str, Any],
+        load: bool = False
+    ) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        只更新给定字段
+
+        Args:
+            uni_key: 任务唯一标识符
+            updates: 要更新的字段
+            load: 是否同时返回更新后的完整记录
+
+        Returns:
+            Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+                (更新前的 status、created_at、client_id, 更新后的任务数据或None)，任务不存在时返回None
+        """
+
+    @abstractmethod
+    def transition(
+        self,
+        uni_key: str,
+        expected_statuses: Tuple[str, ...],
+        updates: Dict[str, Any],
+        owner: Optional[str] = None,
+        increment: Optional[str] = None,
+        expected_version: Optional[int] = None,
+        ttl: int = 0
+    ) -> Optional[Tuple[bool, Optional[str], Dict[str, Any]]]:
+        """
+        比较并设置：当前状态在 expected_statuses 中、处理中的任务属于 owner、版本号一致时原子地写入更新
+
+        Returns:
+            Optional[Tuple[bool, Optional[str], Dict[str, Any]]]:
+                (是否已转换, 转换前的状态, 转换后的记录或未转换时的当前记录)，任务不存在时返回None
+        """
+
+    def update_progress(self, uni_key: str, progress: int, message: str, owner: Optional[str] = None) -> bool:
+        """
+        写入处理中任务的进度（任务不在处理中或不属于 owner 时不写入）
+
+        Args:
+            uni_key: 任务唯一标识符
+            progress: 进度百分比
+            message: 进度消息
+            owner: worker标识
+
+        Returns:
+            bool: 是否已写入
+        """
+        result = self.transition(
+            uni_key, ("processing",), {"progress": progress, "progress_message": message}, owner=owner
+        )
+        return bool(result and result[0])
+
+    @abstractmethod
+    def delete(self, uni_key: str) -> None:
+        """
+        删除任务记录
+
+        Args:
+            uni_key: 任务唯一标识符
+        """
+
+
+class RedisTaskStore(TaskStoreBackend):
+    """
+    转写任务的存储
+
+    每个任务保存为一个Redis哈希，字段值单独JSON编码，extra_params 展开为 "extra_params.*" 字段。
+    更新只写入变化的字段（例如进度更新为一次两个字段的写入），不再读取、合并、回写整个任务，
+    API进程和worker同时更新不同字段时也不会互相覆盖。
+    状态转换（pending→processing→completed/failed、重试计数加1）由Lua脚本在一次往返中比较并设置，
+    每次写入都会递增 version 字段，并在同一个pipeline中向 TASK_EVENTS_CHANNEL 发布变化事件。
+    旧版本保存的JSON字符串记录在第一次读写时转换为哈希；格式版本（schema_version）低于当前版本的记录
+    在读取时应用 task_migrations 中未应用的转换并写回，也可以用 scripts/migrate_tasks.py 批量升级。
+    """
+
+    name = "redis"
+
+    def __init__(self):
+        redis_service = RedisService()
+        self.storage = redis_service.get_client(prefix="transcription:")
+        self.redis = self.storage.redis
+        self._update = self.redis.register_script(UPDATE_SCRIPT)
+        self._migrate = self.redis.register_script(MIGRATE_SCRIPT)
+        self._upgrade = self.redis.register_script(UPGRADE_SCRIPT)
+        self._transition = self.redis.register_script(TRANSITION_SCRIPT)
+        self._progress = self.redis.register_script(PROGRESS_SCRIPT)
+
+    def _with_migration(self, uni_key: str, operation):
+        """执行操作，遇到旧的JSON记录（WRONGTYPE）时先转换再重试一次"""
+        try:
+            return operation()
+        except ResponseError as e:
+            if not _is_wrongtype(e):
+                raise
+        self.migrate(uni_key)
+        return operation()
+
+    @timed("migrate")
+    def migrate(self, uni_key: str) -> bool:
+        """
+        将旧的JSON字符串记录转换为哈希
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            bool: 是否进行了转换
+        """
+        key = self.storage.get_full_key(uni_key)
+        for _ in range(MIGRATE_ATTEMPTS):
+            try:
+                raw = self.redis.get(key)
+            except ResponseError as e:
+                if _is_wrongtype(e):
+                    # 已经被其他进程转换
+                    return False
+                raise
+            if raw is None:
+                return False
+            data = get_record_codec().decode(raw)
+            upgrade_record(data)
+            args = [raw]
+            for name, value in encode_task_fields(data).items():
+                args += [name, value]
+            result = self._migrate(keys=[key], args=args)
+            if result == 1:
+                logger.info(f"任务记录已转换为哈希: {uni_key}")
+                return True
+            if result == 0:
+                return False
+        raise RuntimeError(f"转换任务记录失败，记录被频繁改写: {uni_key}")
+
+    @timed("save")
+    def save(self, data: Dict[str, Any]) -> None:
+        """
+        写入完整的任务记录（覆盖已有记录）
+
+        Args:
+            data: 任务数据，必须包含 uni_key
+        """
+        pipe = self.redis.pipeline()
+        self._save(data, pipe)
+        pipe.execute()
+
+    @timed("save_many")
+    def save_many(self, items: List[Dict[str, Any]]) -> None:
+        """
+        通过一个pipeline写入多个完整的任务记录
+
+        Args:
+            items: 任务数据列表
+        """
+        if not items:
+            return
+        pipe = self.redis.pipeline()
+        for data in items:
+            self._save(data, pipe)
+        pipe.execute()
+
+    def _save(self, data: Dict[str, Any], pipe) -> None:
+        """把写入一条完整任务记录的命令加入pipeline（不计时，save和save_many共用）"""
+        key = self.storage.get_full_key(data["uni_key"])
+        pipe.delete(key)
+        pipe.hset(key, mapping=encode_task_record(data))
+        self._publish(pipe, data["uni_key"], client_id=data.get("client_id"))
+
+    @timed("load")
+    def load(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务记录
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务数据，不存在时返回None
+        """
+        key = self.storage.get_full_key(uni_key)
+        raw = self._with_migration(uni_key, lambda: self.redis.hgetall(key))
+        return self._decode(uni_key, raw)
+
+    def _decode(self, uni_key: str, raw: Dict[bytes, bytes]) -> Optional[Dict[str, Any]]:
+        """解码读取到的哈希字段，旧格式版本的记录在返回前升级"""
+        if not raw:
+            return None
+        data = decode_task_fields(raw)
+        if needs_upgrade(data):
+            self._lazy_upgrade(uni_key, raw, data)
+        return data
+
+    def _lazy_upgrade(self, uni_key: str, raw: Dict[bytes, bytes], data: Dict[str, Any]) -> None:
+        """就地升级读取到的旧格式记录，TASK_LAZY_UPGRADE 开启时写回Redis（失败时只记录日志）"""
+        upgrade_record(data)
+        if not settings.TASK_LAZY_UPGRADE:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            self._upgrade(keys=[self.storage.get_full_key(uni_key)], args=build_upgrade_args(raw, data), client=pipe)
+            self._publish(pipe, uni_key)
+            if pipe.execute()[0] == 1:
+                data["version"] = data.get("version", 0) + 1
+        except Exception as e:
+            logger.warning(f"写回升级后的任务记录失败 {uni_key}: {str(e)}")
+
+    @timed("load_many")
+    def load_many(self, uni_keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        通过一个pipeline读取多个任务记录
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: 与参数顺序一致的任务数据，不存在的任务为None
+        """
+        if not uni_keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key in uni_keys:
+            pipe.hgetall(self.storage.get_full_key(uni_key))
+        results = pipe.execute(raise_on_error=False)
+        tasks = []
+        for uni_key, raw in zip(uni_keys, results):
+            if isinstance(raw, Exception):
+                if not _is_wrongtype(raw):
+                    raise raw
+                tasks.append(self.load(uni_key))
+            else:
+                tasks.append(self._decode(uni_key, raw))
+        return tasks
+
+    @timed("load_statuses")
+    def load_statuses(self, uni_keys: List[str]) -> List[Optional[str]]:
+        """
+        通过一个pipeline只读取多个任务的 status 字段（旧的JSON字符串记录先转换）
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            List[Optional[str]]: 与参数顺序一致的状态，不存在的任务为None
+        """
+        if not uni_keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key in uni_keys:
+            pipe.hget(self.storage.get_full_key(uni_key), "status")
+        statuses = []
+        for uni_key, value in zip(uni_keys, pipe.execute(raise_on_error=False)):
+            if isinstance(value, Exception):
+                if not _is_wrongtype(value):
+                    raise value
+                data = self.load(uni_key)
+                statuses.append(data.get("status") if data else None)
+            else:
+                statuses.append(loads_json(value) if value is not None else None)
+        return statuses
+
+    @timed("upgrade_batch")
+    def upgrade_batch(self, uni_keys: List[str], dry_run: bool = False) -> Dict[str, Any]:
+        """
+        批量将任务记录升级到当前格式版本：一个pipeline读取哈希记录（旧的JSON字符串记录用MGET读取），
+        在本进程中应用转换，再用一个pipeline执行带版本检查的写入；读取后被改写的记录重新读取，最多 MIGRATE_ATTEMPTS 次
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+            dry_run: 只统计需要升级的记录，不写入
+
+        Returns:
+            Dict[str, Any]: scanned、upgraded（其中 converted 为JSON字符串转换为哈希的数量）、current、missing、
+                conflicts、failed 计数，以及每个转换应用的次数 migrations
+        """
+        stats: Dict[str, Any] = {
+            "scanned": len(uni_keys), "upgraded": 0, "converted": 0, "current": 0,
+            "missing": 0, "conflicts": 0, "failed": 0, "migrations": {}
+        }
+        pending = list(uni_keys)
+        for _ in range(MIGRATE_ATTEMPTS):
+            if not pending:
+                break
+            pending = self._upgrade_batch_once(pending, dry_run, stats)
+        stats["conflicts"] = len(pending)
+        return stats
+
+    def _upgrade_batch_once(self, uni_keys: List[str], dry_run: bool, stats: Dict[str, Any]) -> List[str]:
+        """执行一轮批量升级，返回需要重试的任务"""
+        keys = [self.storage.get_full_key(uni_key) for uni_key in uni_keys]
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        results = pipe.execute(raise_on_error=False)
+
+        # (uni_key, 脚本, 任务键, 脚本参数, 应用的转换, 是否为JSON字符串转换)
+        writes = []
+        legacy = []
+        for uni_key, key, raw in zip(uni_keys, keys, results):
+            if isinstance(raw, Exception):
+                if not _is_wrongtype(raw):
+                    raise raw
+                legacy.append((uni_key, key))
+                continue
+            if not raw:
+                stats["missing"] += 1
+                continue
+            try:
+                data = decode_task_fields(raw)
+                if not needs_upgrade(data):
+                    stats["current"] += 1
+                    continue
+                applied = upgrade_record(data)
+                writes.append((uni_key, self._upgrade, key, build_upgrade_args(raw, data), applied, False))
+            except Exception as e:
+                logger.error(f"升级任务记录失败 {uni_key}: {str(e)}")
+                stats["failed"] += 1
+
+        retry = []
+        if legacy:
+            values = self.redis.mget([key for _, key in legacy])
+            for (uni_key, key), raw in zip(legacy, values):
+                if raw is None:
+                    # 读取期间被删除或已被其他进程转换为哈希
+                    retry.append(uni_key)
+                    continue
+                try:
+                    data = get_record_codec().decode(raw)
+                    applied = upgrade_record(data)
+                    args = [raw]
+                    for name, value in encode_task_fields(data).items():
+                        args += [name, value]
+                    writes.append((uni_key, self._migrate, key, args, applied, True))
+                except Exception as e:
+                    logger.error(f"转换任务记录失败 {uni_key}: {str(e)}")
+                    stats["failed"] += 1
+
+        if not writes:
+            return retry
+        if dry_run:
+            outcomes = [1] * len(writes)
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            for uni_key, script, key, args, _, _ in writes:
+                script(keys=[key], args=args, client=pipe)
+                self._publish(pipe, uni_key)
+            outcomes = pipe.execute(raise_on_error=False)[0::2]
+
+        for (uni_key, _, _, _, applied, converted), outcome in zip(writes, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"写入升级后的任务记录失败 {uni_key}: {str(outcome)}")
+                stats["failed"] += 1
+            elif outcome == 1:
+                stats["upgraded"] += 1
+                stats["converted"] += int(converted)
+                for name in applied:
+                    stats["migrations"][name] = stats["migrations"].get(name, 0) + 1
+            elif outcome == -1 and not converted:
+                stats["missing"] += 1
+            else:
+                retry.append(uni_key)
+        return retry
+
+    @timed("update")
+    def update(
+        self,
+        uni_key: str,
+        updates: Dict[str, Any],
+        load: bool = False
+    ) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        """
+        只更新给定字段（extra_params 按子字段合并）
+
+        Args:
+            uni_key: 任务唯一标识符
+            updates: 要更新的字段
+            load: 是否在同一事务中读回更新后的完整记录
+
+        Returns:
+            Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+                (更新前的 status、created_at、client_id, 更新后的任务数据或None)，任务不存在时返回None
+        """
+        key = self.storage.get_full_key(uni_key)
+        args = []
+        for name, value in encode_task_fields(updates).items():
+            args += [name, value]
+        if not args:
+            data = self.load(uni_key)
+            if data is None:
+                return None
+            return {name: data.get(name) for name in INDEX_FIELDS}, data
+
+        def run():
+            pipe = self.redis.pipeline(transaction=load)
+            self._update(keys=[key], args=args, client=pipe)
+            if load:
+                pipe.hgetall(key)
+            self._publish(pipe, uni_key)
+            results = pipe.execute()
+            return results[0], results[1] if load else None
+
+        old, raw = self._with_migration(uni_key, run)
+        if old is None:
+            return None
+        old_fields = {
+            name: loads_json(value) if value is not None else None
+            for name, value in zip(INDEX_FIELDS, old)
+        }
+        return old_fields, decode_task_fields(raw) if raw else None
+
+    @timed("transition")
+    def transition(
+        self,
+        uni_key: str,
+        expected_statuses: Tuple[str, ...],
+        updates: Dict[str, Any],
+        owner: Optional[str] = None,
+        increment: Optional[str] = None,
+        expected_version: Optional[int] = None,
+        ttl: int = 0
+    ) -> Optional[Tuple[bool, Optional[str], Dict[str, Any]]]:
+        """
+        比较并设置：当前状态在 expected_statuses 中时写入更新，一次往返返回转换后的记录
+
+        Args:
+            uni_key: 任务唯一标识符
+            expected_statuses: 允许的当前状态
+            updates: 要写入的字段（通常包含新的 status）
+            owner: worker标识，当前状态为processing时要求 claimed_by 与之相同
+            increment: 需要加1的整数字段（例如 retry_count）
+            expected_version: 期望的版本号（可选）
+            ttl: 转换成功时设置的过期时间（秒），0表示不变，-1表示取消过期
+
+        Returns:
+            Optional[Tuple[bool, Optional[str], Dict[str, Any]]]:
+                (是否已转换, 转换前的状态, 转换后的记录或未转换时的当前记录)，任务不存在时返回None
+        """
+        key = self.storage.get_full_key(uni_key)
+        args = [
+            dumps_json(owner) if owner else "",
+            increment or "",
+            str(expected_version) if expected_version is not None else "",
+            ttl,
+            len(expected_statuses)
+        ]
+        args += [dumps_json(status) for status in expected_statuses]
+        for name, value in encode_task_fields(updates).items():
+            args += [name, value]
+
+        def run():
+            pipe = self.redis.pipeline(transaction=False)
+            self._transition(keys=[key], args=args, client=pipe)
+            self._publish(pipe, uni_key)
+            return pipe.execute()[0]
+
+        result = self._with_migration(uni_key, run)
+        if result[0] == -1:
+            return None
+        applied, old_status, pairs = result
+        return (
+            applied == 1,
+            loads_json(old_status) if old_status else None,
+            decode_task_fields(_pairs_to_dict(pairs))
+        )
+
+    @timed("update_progress")
+    def update_progress(self, uni_key: str, progress: int, message: str, owner: Optional[str] = None) -> bool:
+        """
+        写入处理中任务的进度：一次往返，只写入两个字段，不读回记录（进度是最频繁的写入）
+
+        Args:
+            uni_key: 任务唯一标识符
+            progress: 进度百分比
+            message: 进度消息
+            owner: worker标识，要求 claimed_by 与之相同
+
+        Returns:
+            bool: 是否已写入，任务不存在、不在处理中或已由其他worker处理时返回False
+        """
+        key = self.storage.get_full_key(uni_key)
+        args = [dumps_json(owner) if owner else "", dumps_json(progress), dumps_json(message)]
+
+        def run():
+            pipe = self.redis.pipeline(transaction=False)
+            self._progress(keys=[key], args=args, client=pipe)
+            self._publish(pipe, uni_key)
+            return pipe.execute()[0]
+
+        return self._with_migration(uni_key, run) == 1
+
+    @timed("delete")
+    def delete(self, uni_key: str) -> None:
+        """
+        删除任务记录
+
+        Args:
+            uni_key: 任务唯一标识符
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(self.storage.get_full_key(uni_key))
+        self._publish(pipe, uni_key, deleted=True)
+        pipe.execute()
+
+    @staticmethod
+    def _publish(pipe, uni_key: str, **fields: Any) -> None:
+        """
+        在同一个pipeline中发布任务变化事件（与写入一起发送，不增加往返）
+
+        Args:
+            pipe: pipeline
+            uni_key: 任务唯一标识符
+            **fields: 写入时已知的附加信息（创建时的 client_id，删除时的 deleted）
+        """
+        pipe.publish(TASK_EVENTS_CHANNEL, dumps_json({"uni_key": uni_key, **fields}))
+
+
+class MemoryTaskStore(TaskStoreBackend):
+    """
+    进程内的任务存储，语义与 RedisTaskStore 一致（字段编码、按字段合并、版本号、比较并设置、过期时间）
+
+    用于在没有Redis的环境中对API和worker的热点路径做基准测试；数据只在当前进程中可见，
+    不发布变化事件，因此不能用于API进程和Celery worker分开部署的生产环境。
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._records: Dict[str, Dict[bytes, bytes]] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, uni_key: str) -> Optional[Dict[bytes, bytes]]:
+        """读取记录的哈希字段（已过期的记录删除后返回None），调用方需持有锁"""
+        expires_at = self._expires.get(uni_key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._records.pop(uni_key, None)
+            self._expires.pop(uni_key, None)
+        return self._records.get(uni_key)
+
+    @staticmethod
+    def _set_fields(record: Dict[bytes, bytes], fields: Dict[str, bytes]) -> None:
+        for name, value in fields.items():
+            record[name.encode()] = value
+
+    @staticmethod
+    def _incr(record: Dict[bytes, bytes], name: str) -> None:
+        key = name.encode()
+        record[key] = str(int(record.get(key, b"0")) + 1).encode()
+
+    @timed("save")
+    def save(self, data: Dict[str, Any]) -> None:
+        self._save(data)
+
+    @timed("save_many")
+    def save_many(self, items: List[Dict[str, Any]]) -> None:
+        for data in items:
+            self._save(data)
+
+    def _save(self, data: Dict[str, Any]) -> None:
+        record: Dict[bytes, bytes] = {}
+        self._set_fields(record, encode_task_record(data))
+        with self._lock:
+            self._records[data["uni_key"]] = record
+            self._expires.pop(data["uni_key"], None)
+
+    @timed("load")
+    def load(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._get(uni_key)
+            record = dict(record) if record else None
+        return decode_task_fields(record) if record else None
+
+    @timed("load_many")
+    def load_many(self, uni_keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return [self.load(uni_key) for uni_key in uni_keys]
+
+    @timed("load_versions")
+    def load_versions(self, uni_keys: List[str]) -> Optional[List[Optional[Tuple[int, str]]]]:
+        results = []
+        with self._lock:
+            for uni_key in uni_keys:
+                record = self._get(uni_key) or {}
+                results.append([record.get(name.encode()) for name in VERSION_FIELDS])
+        return decode_task_versions(results)
+
+    @timed("update")
+    def update(
+        self,
+        uni_key: str,
+        updates: Dict[str, Any],
+        load: bool = False
+    ) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+        fields = encode_task_fields(updates)
+        with self._lock:
+            record = self._get(uni_key)
+            if record is None:
+                return None
+            old = {name: record.get(name.encode()) for name in INDEX_FIELDS}
+            if fields:
+                self._set_fields(record, fields)
+                self._incr(record, "version")
+            snapshot = dict(record) if load or not fields else None
+        old_fields = {name: loads_json(value) if value is not None else None for name, value in old.items()}
+        return old_fields, decode_task_fields(snapshot) if snapshot else None
+
+    @timed("transition")
+    def transition(
+        self,
+        uni_key: str,
+        expected_statuses: Tuple[str, ...],
+        updates: Dict[str, Any],
+        owner: Optional[str] = None,
+        increment: Optional[str] = None,
+        expected_version: Optional[int] = None,
+        ttl: int = 0
+    ) -> Optional[Tuple[bool, Optional[str], Dict[str, Any]]]:
+        fields = encode_task_fields(updates)
+        with self._lock:
+            record = self._get(uni_key)
+            if record is None:
+                return None
+            current = record.get(b"status")
+            current_status = loads_json(current) if current is not None else None
+            allowed = current_status in expected_statuses
+            if allowed and owner and current_status == "processing" and record.get(b"claimed_by") != dumps_json(owner):
+                allowed = False
+            if allowed and expected_version is not None and record.get(b"version", b"0") != str(expected_version).encode():
+                allowed = False
+            if allowed:
+                self._set_fields(record, fields)
+                if increment:
+                    self._incr(record, increment)
+                self._incr(record, "version")
+                if ttl > 0:
+                    self._expires[uni_key] = time.monotonic() + ttl
+                elif ttl < 0:
+                    self._expires.pop(uni_key, None)
+            snapshot = dict(record)
+        return allowed, current_status, decode_task_fields(snapshot)
+
+    @timed("delete")
+    def delete(self, uni_key: str) -> None:
+        with self._lock:
+            self._records.pop(uni_key, None)
+            self._expires.pop(uni_key, None)
+
+
+class AsyncMemoryTaskStore:
+    """MemoryTaskStore 的异步视图（内存操作不会阻塞事件循环），接口与 AsyncTaskStore 相同"""
+
+    def __init__(self, store: MemoryTaskStore):
+        self.store = store
+
+    async def load(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        return self.store.load(uni_key)
+
+    async def load_many(self, uni_keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        return self.store.load_many(uni_keys)
+
+    async def load_versions(self, uni_keys: List[str]) -> Optional[List[Optional[Tuple[int, str]]]]:
+        return self.store.load_versions(uni_keys)
+
+
+class AsyncTaskStore:
+    """
+    任务存储的异步只读视图，供API进程的 async 接口（状态查询、任务列表、任务详情）使用
+
+    数据格式与 RedisTaskStore 相同；写入和状态转换仍由 RedisTaskStore 完成（与worker共用同一套Lua脚本）。
+    """
+
+    name = "redis_async"
+
+    def __init__(self):
+        self.storage = AsyncRedisService().get_client(prefix="transcription:")
+        self.redis = self.storage.redis
+        self._migrate = self.redis.register_script(MIGRATE_SCRIPT)
+        self._upgrade = self.redis.register_script(UPGRADE_SCRIPT)
+
+    @timed("migrate")
+    async def migrate(self, uni_key: str) -> bool:
+        """
+        将旧的JSON字符串记录转换为哈希（与 RedisTaskStore.migrate 相同）
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            bool: 是否进行了转换
+        """
+        key = self.storage.get_full_key(uni_key)
+        for _ in range(MIGRATE_ATTEMPTS):
+            try:
+                raw = await self.redis.get(key)
+            except ResponseError as e:
+                if _is_wrongtype(e):
+                    return False
+                raise
+            if raw is None:
+                return False
+            data = get_record_codec().decode(raw)
+            upgrade_record(data)
+            args = [raw]
+            for name, value in encode_task_fields(data).items():
+                args += [name, value]
+            result = await self._migrate(keys=[key], args=args)
+            if result == 1:
+                logger.info(f"任务记录已转换为哈希: {uni_key}")
+                return True
+            if result == 0:
+                return False
+        raise RuntimeError(f"转换任务记录失败，记录被频繁改写: {uni_key}")
+
+    @timed("load")
+    async def load(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务记录
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务数据，不存在时返回None
+        """
+        key = self.storage.get_full_key(uni_key)
+        try:
+            raw = await self.redis.hgetall(key)
+        except ResponseError as e:
+            if not _is_wrongtype(e):
+                raise
+            await self.migrate(uni_key)
+            raw = await self.redis.hgetall(key)
+        return await self._decode(uni_key, raw)
+
+    async def _decode(self, uni_key: str, raw: Dict[bytes, bytes]) -> Optional[Dict[str, Any]]:
+        """解码读取到的哈希字段，旧格式版本的记录在返回前升级（与 RedisTaskStore 相同）"""
+        if not raw:
+            return None
+        data = decode_task_fields(raw)
+        if not needs_upgrade(data):
+            return data
+        upgrade_record(data)
+        if settings.TASK_LAZY_UPGRADE:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                await self._upgrade(
+                    keys=[self.storage.get_full_key(uni_key)], args=build_upgrade_args(raw, data), client=pipe
+                )
+                RedisTaskStore._publish(pipe, uni_key)
+                if (await pipe.execute())[0] == 1:
+                    data["version"] = data.get("version", 0) + 1
+            except Exception as e:
+                logger.warning(f"写回升级后的任务记录失败 {uni_key}: {str(e)}")
+        return data
+
+    @timed("load_many")
+    async def load_many(self, uni_keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        通过一个pipeline读取多个任务记录
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: 与参数顺序一致的任务数据，不存在的任务为None
+        """
+        if not uni_keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key in uni_keys:
+            pipe.hgetall(self.storage.get_full_key(uni_key))
+        results = await pipe.execute(raise_on_error=False)
+        tasks = []
+        for uni_key, raw in zip(uni_keys, results):
+            if isinstance(raw, Exception):
+                if not _is_wrongtype(raw):
+                    raise raw
+                tasks.append(await self.load(uni_key))
+            else:
+                tasks.append(await self._decode(uni_key, raw))
+        return tasks
+
+    @timed("load_versions")
+    async def load_versions(self, uni_keys: List[str]) -> Optional[List[Optional[Tuple[int, str]]]]:
+        """
+        通过一个pipeline只读取任务的版本号、创建时间和格式版本（用于ETag，不读取和解析完整记录）
+
+        Args:
+            uni_keys: 任务唯一标识符列表
+
+        Returns:
+            Optional[List[Optional[Tuple[int, str]]]]: 与参数顺序一致的 (version, created_at)，不存在的任务为None；
+                有旧格式的记录时返回None（需要完整读取）
+        """
+        if not uni_keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for uni_key in uni_keys:
+            pipe.hmget(self.storage.get_full_key(uni_key), *VERSION_FIELDS)
+        return decode_task_versions(await pipe.execute(raise_on_error=False))
+
+
+# 单例模式
+_task_store = None
+
+
+def get_task_store() -> TaskStoreBackend:
+    """
+    获取按 TASK_STORE_BACKEND 配置的任务存储实例（单例模式）
+
+    Returns:
+        TaskStoreBackend: 任务存储实例
+    """
+    global _task_store
+    if _task_store is None:
+        _task_store = MemoryTaskStore() if settings.TASK_STORE_BACKEND == "memory" else RedisTaskStore()
+    return _task_store
+
+
+_async_task_store = None
+
+
+def get_async_task_store():
+    """
+    获取异步任务存储实例（单例模式，仅在API进程中使用）
+
+    Returns:
+        AsyncTaskStore: 异步任务存储实例（内存存储时为 AsyncMemoryTaskStore）
+    """
+    global _async_task_store
+    if _async_task_store is None:
+        store = get_task_store()
+        _async_task_store = AsyncMemoryTaskStore(store) if isinstance(store, MemoryTaskStore) else AsyncTaskStore()
+    return _async_task_store
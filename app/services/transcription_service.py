@@ -2,22 +2,50 @@ import os
 import logging
 import time
 import uuid
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.whisperx import WhisperXProcessor
-from app.services.redis_service import RedisService
+from app.services.admission_service import get_admission_service
+from app.services.progress_writer import ProgressWriter
+from app.services.task_index import get_task_index
+from app.services.task_store import get_task_store
 from app.utils.error_codes import (
-     SUCCESS, ERROR_PROCESSING_FAILED, get_error_message
+     SUCCESS, ERROR_PROCESSING_FAILED, ERROR_TASK_NOT_FOUND, get_error_message
 )
-from app.schemas.transcription import TranscriptionTask, TranscriptionExtraParams
+from app.schemas.transcription import TranscriptionTask, TranscriptionExtraParams, ResultSummary
+from app.utils.audio_probe import AudioProbeResult
 from app.utils.gpu_monitor import get_gpu_memory_info, get_celery_concurrency
 
 logger = logging.getLogger(__name__)
 
+# 任务状态
+TASK_STATUSES = ("pending", "processing", "completed", "failed")
+# 结束状态：任务记录按保留时间过期
+TERMINAL_STATUSES = ("completed", "failed")
+# 开始处理：等待中、上次失败（Celery重试），或同一个Celery任务重新投递时仍为处理中
+CLAIMABLE_STATUSES = ("pending", "failed", "processing")
+
+def summarize_result(result: List[Dict[str, Any]]) -> ResultSummary:
+    """
+    统计转写结果的摘要，任务记录中只保存摘要，完整结果保存在结果文件中
+    
+    Args:
+        result: 转写结果分段列表
+        
+    Returns:
+        ResultSummary: 结果摘要
+    """
+    return ResultSummary(
+        segments=len(result),
+        characters=sum(len(segment.get("text", "")) for segment in result),
+        speakers=len({segment.get("speaker") for segment in result if segment.get("speaker")}),
+        language=result[0].get("language") if result else None
+    )
+
 class TranscriptionService:
     """
     转写服务：管理音频转写任务，包括任务创建、获取、删除等操作
@@ -36,8 +64,8 @@ class TranscriptionService:
         os.makedirs(settings.TRANSCRIPTION_DIR, exist_ok=True)
         
         # 初始化数据存储
-        redis_service = RedisService()
-        self.storage = redis_service.get_client(prefix="transcription:")
+        self.store = get_task_store()
+        self.index = get_task_index()
         
         # 初始化转写处理器
         self.processor = WhisperXProcessor()
@@ -54,7 +82,17 @@ class TranscriptionService:
             except Exception as e:
                 logger.error(f"预加载large-v3-turbo模型失败: {str(e)}")
     
-    def create_task(
+    @staticmethod
+    def new_uni_key() -> str:
+        """
+        生成任务唯一标识符
+        
+        Returns:
+            str: 唯一标识符
+        """
+        return f"uni_{uuid.uuid4()}"
+    
+    def build_task(
         self, 
         task_id: str, 
         file_path: str, 
@@ -71,10 +109,15 @@ class TranscriptionService:
         server_id: Optional[str] = None,
         duration: Optional[float] = None,
         file_size: Optional[int] = None,
-        jwt_token: Optional[str] = None
+        jwt_token: Optional[str] = None,
+        uni_key: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        audio_info: Optional[AudioProbeResult] = None,
+        batch_id: Optional[str] = None,
+        item_webhook: bool = True
     ) -> TranscriptionTask:
         """
-        创建新的转写任务
+        构造新的转写任务（不写入存储）
         
         Args:
             task_id: 任务ID
@@ -92,12 +135,17 @@ class TranscriptionService:
             server_id: 服务器ID
             file_size: 文件大小（字节）
             jwt_token: JWT令牌（可选）
+            uni_key: 预先生成的唯一标识符（可选，不提供则自动生成）
+            content_hash: 全文件SHA-256（可选，用于结果缓存）
+            audio_info: 上传时的音频探测结果（可选）
+            batch_id: 所属批次ID（可选）
+            item_webhook: 是否为本任务单独发送webhook
             
         Returns:
-            TranscriptionTask: 创建的任务信息
+            TranscriptionTask: 任务信息
         """
         # 生成唯一标识符
-        uni_key = f"uni_{uuid.uuid4()}"
+        uni_key = uni_key or self.new_uni_key()
         
         # 基于uni_key更新结果文件路径
         result_path = os.path.join(settings.TRANSCRIPTION_DIR, f"{uni_key}.json")
@@ -132,14 +180,64 @@ class TranscriptionService:
             extra_params=extra_params.model_dump() if extra_params else None,
             code=SUCCESS,  # 创建任务时设置为成功状态
             message=get_error_message(SUCCESS),  # 没有错误信息
-            jwt_token=jwt_token  # 存储JWT令牌
+            jwt_token=jwt_token,  # 存储JWT令牌
+            content_hash=content_hash,
+            audio_duration=audio_info.duration if audio_info else None,
+            codec=audio_info.codec if audio_info else None,
+            sample_rate=audio_info.sample_rate if audio_info else None,
+            channels=audio_info.channels if audio_info else None,
+            batch_id=batch_id,
+            item_webhook=item_webhook
         )
         
-        # 存储任务数据
-        self.storage.save(uni_key, task.model_dump())
+        return task
+    
+    def create_task(self, *args, **kwargs) -> TranscriptionTask:
+        """
+        创建新的转写任务并写入存储，参数与 build_task 相同
+        
+        Returns:
+            TranscriptionTask: 创建的任务信息
+        """
+        task = self.build_task(*args, **kwargs)
+        
+        # 存储任务数据并加入列表索引
+        self.store.save(task.model_dump())
+        self.index.add(task.uni_key, task.created_at, task.client_id, task.status)
         
         return task
     
+    def create_tasks(self, task_specs: List[Dict[str, Any]]) -> List[TranscriptionTask]:
+        """
+        批量创建转写任务，通过一个Redis pipeline写入所有任务记录
+        
+        Args:
+            task_specs: 每个任务的 build_task 参数
+            
+        Returns:
+            List[TranscriptionTask]: 创建的任务信息，顺序与参数一致
+        """
+        tasks = [self.build_task(**spec) for spec in task_specs]
+        if tasks:
+            self.store.save_many([task.model_dump() for task in tasks])
+            self.index.add_many([(task.uni_key, task.created_at, task.client_id, task.status) for task in tasks])
+        return tasks
+    
+    def get_tasks(self, uni_keys: List[str]) -> List[Optional[TranscriptionTask]]:
+        """
+        批量获取任务信息
+        
+        Args:
+            uni_keys: 任务唯一标识符列表
+            
+        Returns:
+            List[Optional[TranscriptionTask]]: 任务信息，不存在的任务为None
+        """
+        return [
+            TranscriptionTask(**task_data) if task_data else None
+            for task_data in self.store.load_many(uni_keys)
+        ]
+    
     def get_task(self, uni_key: str) -> Optional[TranscriptionTask]:
         """
         获取任务信息
@@ -150,7 +248,7 @@ class TranscriptionService:
         Returns:
             TranscriptionTask: 任务信息，如果不存在则返回None
         """
-        task_data = self.storage.get(uni_key)
+        task_data = self.store.load(uni_key)
         if not task_data:
             return None
         
@@ -158,7 +256,7 @@ class TranscriptionService:
     
     def update_task(self, uni_key: str, **updates) -> Optional[TranscriptionTask]:
         """
-        更新任务信息
+        更新任务信息，只写入给定字段（extra_params 按子字段合并）
         
         Args:
             uni_key: 任务唯一标识符
@@ -167,44 +265,83 @@ class TranscriptionService:
         Returns:
             TranscriptionTask: 更新后的任务信息，如果不存在则返回None
         """
-        task_data = self.storage.get(uni_key)
+        task_data = self._apply_updates(uni_key, updates, load=True)
         if not task_data:
             return None
         
-        # 特殊处理extra_params字段，确保嵌套字典的正确更新
-        if 'extra_params' in updates:
-            extra_params_update = updates.pop('extra_params')
-            if extra_params_update is not None:
-                # 如果task_data中已有extra_params字段
-                if 'extra_params' in task_data and task_data['extra_params']:
-                    # 确保它是一个字典
-                    if not isinstance(task_data['extra_params'], dict):
-                        # 尝试转换为字典
-                        try:
-                            task_data['extra_params'] = vars(task_data['extra_params'])
-                        except:
-                            task_data['extra_params'] = {}
-                    # 更新内部字段而不是替换整个字典
-                    task_data['extra_params'].update(extra_params_update)
-                else:
-                    # 如果原来没有extra_params，直接赋值
-                    task_data['extra_params'] = extra_params_update
-        
-        # 更新其他字段
-        for key, value in updates.items():
-            if key == 'extra_params' and isinstance(value, dict):
-                # 如果是extra_params且是字典，则合并更新
-                if 'extra_params' in task_data:
-                    task_data['extra_params'].update(value)
-                else:
-                    task_data['extra_params'] = value
-            else:
-                task_data[key] = value
+        return TranscriptionTask(**task_data)
+    
+    def update_task_fields(self, uni_key: str, **updates) -> bool:
+        """
+        更新任务字段但不读回任务（进度、状态等不需要返回值的更新）
         
-        # 保存更新后的数据
-        self.storage.save(uni_key, task_data)
+        Args:
+            uni_key: 任务唯一标识符
+            **updates: 要更新的字段
+            
+        Returns:
+            bool: 任务是否存在
+        """
+        return self._apply_updates(uni_key, updates, load=False) is not None
+    
+    def _apply_updates(self, uni_key: str, updates: Dict[str, Any], load: bool) -> Optional[Dict[str, Any]]:
+        """写入更新，状态变化时移动列表索引；任务不存在时返回None，否则返回更新后的任务数据（load=False时为空字典）"""
+        result = self.store.update(uni_key, updates, load=load)
+        if result is None:
+            return None
+        old, task_data = result
+        new_status = updates.get("status")
+        if new_status and new_status != old["status"]:
+            self.index.move_status(uni_key, old["created_at"], old["client_id"], old["status"], new_status)
+        return task_data or {}
+    
+    def transition_task(
+        self,
+        uni_key: str,
+        expected_statuses: Tuple[str, ...],
+        owner: Optional[str] = None,
+        increment_retry: bool = False,
+        **updates
+    ) -> Tuple[bool, Optional[TranscriptionTask]]:
+        """
+        原子地转换任务状态：当前状态在 expected_statuses 中时才写入，一次往返返回转换后的任务
         
-        return TranscriptionTask(**task_data)
+        处理中的任务只接受 claimed_by 与 owner 相同的worker的转换，避免两个进程互相覆盖
+        （例如任务被重置并重新入队后，旧的worker不能再把它标记为完成）。
+        
+        Args:
+            uni_key: 任务唯一标识符
+            expected_statuses: 允许的当前状态
+            owner: 处理任务的Celery任务ID（可选）
+            increment_retry: 是否同时将 retry_count 加1
+            **updates: 要写入的字段，通常包含新的 status
+            
+        Returns:
+            Tuple[bool, Optional[TranscriptionTask]]: (是否已转换, 转换后的任务或未转换时的当前任务)，任务不存在时为 (False, None)
+        """
+        new_status = updates.get("status")
+        # 进入结束状态时按保留时间设置过期，重新进入其他状态（重试、重置）时取消过期
+        ttl = 0
+        if new_status in TERMINAL_STATUSES:
+            ttl = settings.TASK_RECORD_TTL_HOURS * 3600
+        elif new_status:
+            ttl = -1
+        result = self.store.transition(
+            uni_key,
+            expected_statuses,
+            updates,
+            owner=owner,
+            increment="retry_count" if increment_retry else None,
+            ttl=ttl
+        )
+        if result is None:
+            return False, None
+        applied, old_status, task_data = result
+        if applied and new_status and new_status != old_status:
+            self.index.move_status(uni_key, task_data.get("created_at"), task_data.get("client_id"), old_status, new_status)
+        if not applied:
+            logger.warning(f"任务 {uni_key} 当前状态为 {old_status}，忽略转换为 {new_status} 的请求")
+        return applied, TranscriptionTask(**task_data)
     
     def delete_task(self, uni_key: str) -> bool:
         """
@@ -234,8 +371,13 @@ class TranscriptionService:
             except Exception as e:
                 logger.error(f"删除结果文件失败 {uni_key}: {str(e)}")
         
-        # 删除任务数据
-        self.storage.delete(uni_key)
+        # 删除任务数据和索引，未结束的任务同时从准入控制的积压中扣除，并交出结果缓存的处理权
+        self.store.delete(uni_key)
+        self.index.remove(uni_key, task.client_id, task.status)
+        if task.status not in TERMINAL_STATUSES:
+            get_admission_service().release(uni_key)
+            from app.tasks.transcription_tasks import abandon_result_cache
+            abandon_result_cache(task)
         
         return True
     
@@ -249,57 +391,67 @@ class TranscriptionService:
         Returns:
             TranscriptionTask: 重置后的任务信息
         """
-        task = self.get_task(uni_key)
-        if not task:
-            return None
-        
-        # 更新任务状态
-        task = self.update_task(
+        # 任何状态都可以重置；清除 claimed_by 后，仍在处理旧任务的worker无法再写入结果
+        _, task = self.transition_task(
             uni_key,
+            TASK_STATUSES,
             status="pending",
             progress=0,
             error_message=None,
-            result=None,
+            result_summary=None,
             started_at=None,
             completed_at=None,
+            claimed_by=None,
             code=SUCCESS,  # 重置为成功状态码
             message=get_error_message(SUCCESS)  # 清空错误消息
         )
         
         return task
     
-    def _update_progress(self, uni_key: str, progress: int, message: str) -> None:
-        """更新任务进度"""
-        self.update_task(
-            uni_key,
-            progress=progress,
-            progress_message=message
-        )
+    def _update_progress(self, uni_key: str, progress: int, message: str, owner: Optional[str] = None) -> bool:
+        """
+        更新任务进度（只写入进度两个字段，任务已不属于本worker时不写入）
+
+        Returns:
+            bool: 是否已写入，任务已不存在、已结束或已由其他worker处理时返回False
+        """
+        return self.store.update_progress(uni_key, progress, message, owner=owner)
     
     '''
     同步方法，在celery中使用
     '''
-    def process_task_sync(self, uni_key: str) -> Dict[str, Any]:
+    def process_task_sync(self, uni_key: str, owner: Optional[str] = None) -> Dict[str, Any]:
         """
         同步处理转写任务
         
         Args:
             uni_key: 任务唯一标识符
+            owner: 处理任务的Celery任务ID，用于保证只有一个worker处理并写入结果
             
         Returns:
-            Dict[str, Any]: 处理结果的字典表示
+            Dict[str, Any]: 处理结果的字典表示；任务已由其他worker处理或已结束时 status 为 "skipped"
         """
-        # 获取任务信息 - 仅用于获取任务参数，不做存在性检查
-        task = self.get_task(uni_key)
+        owner = owner or str(uuid.uuid4())
+        # 开始处理：比较并设置状态为处理中，同时取得任务参数
+        claimed, task = self.transition_task(
+            uni_key,
+            CLAIMABLE_STATUSES,
+            owner=owner,
+            status="processing",
+            started_at=datetime.now().isoformat(),
+            claimed_by=owner
+        )
+        if not task:
+            return {"status": "failed", "error": "任务不存在", "code": ERROR_TASK_NOT_FOUND}
+        if not claimed:
+            return {"status": "skipped", "error": f"任务当前状态为{task.status}，已由其他worker处理或已结束", "code": task.code}
+
+        # 处理器的进度按 TASK_PROGRESS_MIN_INTERVAL 合并写入
+        progress_writer = ProgressWriter(
+            lambda progress, message: self._update_progress(uni_key, progress, message, owner)
+        )
         
         try:
-            # 更新任务状态为处理中
-            self.update_task(
-                uni_key,
-                status="processing",
-                started_at=datetime.now().isoformat()
-            )
-            
             # 获取额外参数
             language = task.language
             
@@ -350,11 +502,15 @@ class TranscriptionService:
                 uni_key,  # 使用uni_key替代task_id
                 language=language if language != "auto" else None,
                 speaker_diarization=speaker_diarization,
-                callback=lambda progress, message: self._update_progress(uni_key, progress, message),
-                whisper_arch=whisper_arch
+                callback=progress_writer,
+                whisper_arch=whisper_arch,
+                pcm_path=task.pcm_path
             )
             
             result, audio_duration, detailed_timings = result_data
+            logger.info(f"Task {uni_key} progress: {progress_writer.writes} writes, {progress_writer.coalesced} coalesced")
+            # 完整结果已由处理器写入结果文件，任务记录和Celery结果中只保存摘要
+            result_summary = summarize_result(result)
             
             # 获取转写和说话人分离的时间（如果有）
             transcription_time = detailed_timings.get('transcription_time', time.time() - transcription_start)
@@ -394,11 +550,13 @@ class TranscriptionService:
                 "concurrency": celery_concurrency
             })
             
-            # 更新任务状态和结果
-            self.update_task(
+            # 更新任务状态和结果（任务在处理期间被重置时丢弃本次结果）
+            completed, _ = self.transition_task(
                 uni_key,
+                ("processing",),
+                owner=owner,
                 status="completed",
-                result=result,
+                result_summary=result_summary.model_dump(),
                 completed_at=datetime.now().isoformat(),
                 audio_duration=audio_duration,
                 processing_time=processing_time,
@@ -408,6 +566,8 @@ class TranscriptionService:
                 message=get_error_message(SUCCESS),  # 成功状态消息为空
                 extra_params=extra_params_dict  # 更新额外参数
             )
+            if not completed:
+                return {"status": "skipped", "error": "任务在处理期间被重置，丢弃本次结果", "code": SUCCESS}
 
             # 处理完成的log，包括音频时长、处理耗时和GPU信息
             logger.info(f"Task {uni_key} completed. Audio duration: {audio_duration} seconds, Processing time: {processing_time} seconds")
@@ -418,7 +578,8 @@ class TranscriptionService:
                 "status": "completed",
                 "code": SUCCESS,
                 "audio_duration": audio_duration,
-                "result": result,
+                "result_path": task.result_path,
+                "result_summary": result_summary.model_dump(),
                 "model_loading_time": model_loading_time,
                 "transcription_time": transcription_time,
                 "diarization_time": diarization_time,
@@ -430,10 +591,16 @@ class TranscriptionService:
             }
                 
         except Exception as e:
-            # 更新任务状态为失败
+            # 更新任务状态为失败，先写入合并中的进度，保留失败时的进度
             error_message = str(e)
-            self.update_task(
+            try:
+                progress_writer.flush()
+            except Exception:
+                logger.warning(f"写入任务进度失败: {uni_key}")
+            failed, _ = self.transition_task(
                 uni_key,
+                ("processing",),
+                owner=owner,
                 status="failed",
                 error_message=error_message,
                 completed_at=datetime.now().isoformat(),
@@ -441,6 +608,8 @@ class TranscriptionService:
                 message=get_error_message(ERROR_PROCESSING_FAILED, f"处理失败: {error_message}")
             )
             logger.exception(f"处理任务失败: {uni_key} - {error_message}")
+            if not failed:
+                return {"status": "skipped", "error": "任务在处理期间被重置", "code": ERROR_PROCESSING_FAILED}
             return {
                 "status": "failed", 
                 "error": error_message,
@@ -0,0 +1,244 @@
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, AsyncIterator
+
+import aiofiles
+
+from app.core.config import settings
+from app.services.redis_service import AsyncRedisService
+
+logger = logging.getLogger(__name__)
+
+
+class UploadOffsetMismatchError(ValueError):
+    """
+    客户端提交的偏移量与服务器记录的不一致
+    """
+
+    def __init__(self, expected_offset: int):
+        self.expected_offset = expected_offset
+        super().__init__(f"上传偏移量不匹配，服务器当前偏移量为 {expected_offset}")
+
+
+class UploadLockLostError(RuntimeError):
+    """
+    上传锁已过期并被其他请求获取
+    """
+
+
+class UploadSessionService:
+    """
+    断点续传上传会话服务
+
+    会话状态保存在Redis的 upload:{uni_key} 中（与 transcription:{uni_key} 任务记录相邻），
+    数据追加写入共享上传目录下的 {uni_key}.part 文件，因此任意一个uvicorn worker都可以接收下一个分块。
+    写入和完成时持有 upload:lock:{uni_key} 锁（值为持有者令牌），接收数据期间定期续期，释放时只删除自己持有的锁。
+    只在API进程中使用，通过异步Redis客户端访问，不阻塞事件循环。
+    """
+
+    def __init__(self):
+        redis_service = AsyncRedisService()
+        self.storage = redis_service.get_client(prefix="upload:")
+        self.ttl = settings.UPLOAD_SESSION_TTL
+        self.lock_ttl = settings.UPLOAD_CHUNK_LOCK_TIMEOUT
+        # 每过三分之一的过期时间续期一次，一次续期失败（Redis短暂不可用）前锁不会过期
+        self.lock_refresh_interval = self.lock_ttl / 3
+
+    @staticmethod
+    def get_part_path(uni_key: str) -> str:
+        """
+        获取分块数据的临时文件路径
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            str: 临时文件路径
+        """
+        return os.path.join(settings.UPLOAD_DIR, f"{uni_key}.part")
+
+    async def create_session(
+        self,
+        uni_key: str,
+        params: Dict[str, Any],
+        filename: str,
+        file_size: int,
+        jwt_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        创建上传会话
+
+        Args:
+            uni_key: 任务唯一标识符
+            params: 已验证的extra_params
+            filename: 原始文件名
+            file_size: 客户端声明的文件总大小（字节）
+            jwt_token: JWT令牌
+
+        Returns:
+            Dict[str, Any]: 会话信息
+        """
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        # 创建空的分块文件
+        open(self.get_part_path(uni_key), "wb").close()
+
+        session = {
+            "uni_key": uni_key,
+            "params": params,
+            "filename": filename,
+            "file_size": file_size,
+            "offset": 0,
+            "jwt_token": jwt_token,
+            "created_at": datetime.now().isoformat()
+        }
+        await self.storage.save(uni_key, session, ttl=self.ttl)
+        return session
+
+    async def get_session(self, uni_key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取上传会话
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            Optional[Dict[str, Any]]: 会话信息，不存在或已过期时返回None
+        """
+        return await self.storage.get(uni_key)
+
+    async def delete_session(self, uni_key: str, remove_part: bool = True) -> None:
+        """
+        删除上传会话
+
+        Args:
+            uni_key: 任务唯一标识符
+            remove_part: 是否同时删除分块临时文件
+        """
+        await self.storage.delete(uni_key)
+        part_path = self.get_part_path(uni_key)
+        if remove_part and os.path.exists(part_path):
+            try:
+                os.remove(part_path)
+            except OSError as e:
+                logger.error(f"删除分块文件失败 {part_path}: {str(e)}")
+
+    async def lock(self, uni_key: str) -> Optional[str]:
+        """
+        锁定上传会话，防止并发写入或重复完成
+
+        Args:
+            uni_key: 任务唯一标识符
+
+        Returns:
+            Optional[str]: 持有者令牌，会话已被锁定时返回None
+        """
+        return await self.storage.acquire_lock(f"lock:{uni_key}", ttl=self.lock_ttl)
+
+    async def unlock(self, uni_key: str, token: str) -> None:
+        """
+        解锁上传会话（锁已过期并被其他请求获取时不删除）
+
+        Args:
+            uni_key: 任务唯一标识符
+            token: lock 返回的持有者令牌
+        """
+        if not await self.storage.release_lock(f"lock:{uni_key}", token):
+            logger.warning(f"上传锁已过期或由其他请求持有: {uni_key}")
+
+    async def refresh_lock(self, uni_key: str, token: str) -> bool:
+        """
+        为持有的上传锁续期
+
+        Args:
+            uni_key: 任务唯一标识符
+            token: lock 返回的持有者令牌
+
+        Returns:
+            bool: 是否仍持有锁
+        """
+        return await self.storage.refresh_lock(f"lock:{uni_key}", token, self.lock_ttl)
+
+    async def hold_lock(self, uni_key: str, token: str, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        转发数据流，接收期间定期为上传锁续期，慢速上传不会因锁过期而被其他请求并发写入
+
+        Args:
+            uni_key: 任务唯一标识符
+            token: lock 返回的持有者令牌
+            stream: 数据流
+
+        Yields:
+            bytes: 数据块
+
+        Raises:
+            UploadLockLostError: 锁已过期并被其他请求获取
+        """
+        last_refresh = time.monotonic()
+        async for chunk in stream:
+            if time.monotonic() - last_refresh >= self.lock_refresh_interval:
+                if not await self.refresh_lock(uni_key, token):
+                    raise UploadLockLostError("上传锁已失效，该文件有其他请求正在写入")
+                last_refresh = time.monotonic()
+            yield chunk
+
+    async def append_chunk(
+        self,
+        session: Dict[str, Any],
+        offset: int,
+        stream: AsyncIterator[bytes]
+    ) -> int:
+        """
+        从指定偏移量开始追加一个分块
+
+        连接中断时已写入的字节仍然计入偏移量，客户端可以从新的偏移量继续上传。
+
+        Args:
+            session: 上传会话
+            offset: 客户端声明的起始偏移量
+            stream: 分块数据流
+
+        Returns:
+            int: 追加后的偏移量
+
+        Raises:
+            UploadOffsetMismatchError: 偏移量与服务器记录不一致
+            ValueError: 数据超过声明的文件大小
+            RuntimeError: 同一会话有其他请求正在写入（包括 UploadLockLostError）
+        """
+        uni_key = session["uni_key"]
+        token = await self.lock(uni_key)
+        if not token:
+            raise RuntimeError("该文件有其他分块正在上传")
+
+        part_path = self.get_part_path(uni_key)
+        written = 0
+        lock_lost = False
+        try:
+            # 加锁后重新读取，避免使用其他请求更新前的偏移量
+            session.update(await self.get_session(uni_key) or {})
+            if offset != session["offset"]:
+                raise UploadOffsetMismatchError(session["offset"])
+            offset = session["offset"]
+            async with aiofiles.open(part_path, "r+b") as f:
+                # 丢弃上次中断后没有计入偏移量的数据
+                await f.truncate(offset)
+                await f.seek(offset)
+                async for chunk in self.hold_lock(uni_key, token, stream):
+                    if offset + written + len(chunk) > session["file_size"]:
+                        raise ValueError("上传数据超过声明的文件大小")
+                    await f.write(chunk)
+                    written += len(chunk)
+        except UploadLockLostError:
+            # 会话已由新的持有者写入，不再覆盖其偏移量
+            lock_lost = True
+            raise
+        finally:
+            if written:
+                session["offset"] = offset + written
+            if not lock_lost:
+                await self.storage.save(uni_key, session, ttl=self.ttl)
+                await self.unlock(uni_key, token)
+
+        return session["offset"]
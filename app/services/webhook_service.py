@@ -20,6 +20,7 @@ class WebhookService:
         """初始化webhook服务"""
         # 从配置中读取Webhook接口地址
         self.webhook_url = settings.WEBHOOK_TRANSCRIPTION_URL
+        self.batch_webhook_url = settings.WEBHOOK_BATCH_URL
         self.timeout = settings.WEBHOOK_TIMEOUT
         # 重试相关参数
         self.max_retries = 2  # 最大重试次数
@@ -87,14 +88,50 @@ class WebhookService:
             logger.exception(f"准备webhook数据失败: {str(e)}")
             return False
     
-    def _send_webhook_with_retries(self, webhook_data: Dict[str, Any], headers: Dict[str, str]) -> None:
+    def send_batch_complete(self, batch_data: Dict[str, Any], jwt_token: Optional[str] = None) -> bool:
+        """
+        发送批次完成的汇总webhook通知（非阻塞）
+        
+        Args:
+            batch_data: 批次汇总数据（batch_id、各状态数量、每个文件的结果）
+            jwt_token: JWT令牌，用于认证
+            
+        Returns:
+            bool: 请求是否已提交（不代表发送成功）
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        if jwt_token:
+            headers["Authorization"] = f"Bearer {jwt_token}"
+        try:
+            self.executor.submit(
+                self._send_webhook_with_retries,
+                batch_data,
+                headers,
+                self.batch_webhook_url
+            )
+            return True
+        except Exception as e:
+            logger.exception(f"提交批次webhook失败: {str(e)}")
+            return False
+    
+    def _send_webhook_with_retries(
+        self,
+        webhook_data: Dict[str, Any],
+        headers: Dict[str, str],
+        url: Optional[str] = None
+    ) -> None:
         """
         带重试的webhook发送实现（在线程池中执行）
         
         Args:
             webhook_data: webhook数据
             headers: HTTP请求头
+            url: webhook地址，默认为转写完成通知地址
         """
+        url = url or self.webhook_url
         retry_count = 0
         while retry_count <= self.max_retries:
             try:
@@ -104,7 +141,7 @@ class WebhookService:
                 logger.info(f"发送Webhook通知: {json.dumps(webhook_data)}")
                 
                 response = requests.post(
-                    self.webhook_url,
+                    url,
                     json=webhook_data,
                     timeout=self.timeout,
                     headers=headers
@@ -65,6 +65,7 @@ def cleanup_old_files():
     清理范围包括：
     1. 上传目录中的音频文件
     2. 转写结果目录中的JSON文件
+    3. 即将过期的任务记录（可选归档摘要）和已过期记录的列表索引
     
     清理策略：
     - 基于文件的最后修改时间
@@ -86,6 +87,19 @@ def cleanup_old_files():
         logger.info("开始清理转写结果目录...")
         cleanup_directory(settings.TRANSCRIPTION_DIR, cutoff_time)
         
+        # 清理任务记录
+        logger.info("开始清理任务记录...")
+        from app.services.task_retention_service import get_task_retention_service
+        get_task_retention_service().sweep()
+
+        # 释放任务已不存在或已结束的积压预留（任务没有走到结束处理时）
+        from app.services.admission_service import get_admission_service
+        get_admission_service().reconcile()
+
+        # 重新入队主任务已不存在或已结束的挂靠任务（主任务被强制结束或消息丢失时）
+        from app.tasks.transcription_tasks import reclaim_result_cache_orphans
+        reclaim_result_cache_orphans()
+        
         logger.info("文件清理任务完成")
                             
     except Exception as e:
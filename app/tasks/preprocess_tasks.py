@@ -0,0 +1,48 @@
+import os
+import time
+import logging
+from typing import Optional
+
+from app.core.celery import celery_app
+from app.dependencies.services import get_transcription_service
+from app.utils.audio_pcm import get_pcm_path, decode_to_pcm
+from app.utils.ecm_decoder import get_decode_executor
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="preprocess_audio")
+def preprocess_audio(uni_key: str) -> Optional[str]:
+    """
+    在CPU预处理队列中将上传文件解码为16kHz单声道PCM，供GPU worker内存映射读取
+
+    解码失败不会让任务失败：返回None，转写时回退为直接解码原始文件。
+    已有PCM文件时直接复用（例如任务重试）。ECM文件交给进程池解码，长录音分段并行。
+
+    Args:
+        uni_key: 任务唯一标识符
+
+    Returns:
+        Optional[str]: PCM文件路径，失败时返回None
+    """
+    service = get_transcription_service()
+    task = service.get_task(uni_key)
+    if not task:
+        logger.warning(f"预处理时任务不存在: {uni_key}")
+        return None
+
+    if task.pcm_path and os.path.exists(task.pcm_path):
+        logger.info(f"复用已有的PCM文件: {task.pcm_path}")
+        return task.pcm_path
+
+    pcm_path = get_pcm_path(uni_key)
+    start_time = time.time()
+    try:
+        duration = decode_to_pcm(task.file_path, pcm_path, executor=get_decode_executor())
+    except Exception as e:
+        logger.warning(f"预解码失败，转写时将直接解码原始文件 {uni_key}: {str(e)}")
+        return None
+
+    service.update_task(uni_key, pcm_path=pcm_path)
+    logger.info(f"预解码完成: {uni_key}, 时长: {duration:.2f}秒, 耗时: {time.time() - start_time:.2f}秒")
+    return pcm_path
@@ -1,15 +1,25 @@
 from datetime import datetime
 import os
+import shutil
 import logging
 import time
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+
+from celery import chain, group
+from celery.canvas import Signature
 
 from app.core.celery import celery_app
 from app.core.config import settings
-from app.services.transcription_service import TranscriptionService
+from app.services.transcription_service import TranscriptionService, CLAIMABLE_STATUSES
+from app.schemas.transcription import TranscriptionTask
 from app.services.cloud_stats import CloudStatsService
 from app.services.mqtt_service import get_mqtt_service
 from app.services.webhook_service import get_webhook_service
+from app.services.result_cache_service import get_result_cache_service
+from app.services.batch_service import get_batch_service
+from app.services.admission_service import get_admission_service
+from app.tasks.preprocess_tasks import preprocess_audio
+from app.utils.audio_pcm import remove_pcm
 from app.dependencies.services import get_worker_transcription_service
 from app.utils.error_codes import (
     SUCCESS, ERROR_TASK_NOT_FOUND, ERROR_FILE_NOT_FOUND, 
@@ -40,7 +50,7 @@ def create_task_result(
     创建统一的任务结果格式
     
     Args:
-        status: 任务状态 ('completed', 'failed', 'processing')
+        status: 任务状态 ('completed', 'failed', 'processing', 'skipped')
         task_id: 任务ID
         uni_key: 任务唯一标识符
         error: 错误信息(如果有)
@@ -70,13 +80,14 @@ def create_task_result(
     
     return result
 
-def check_task_prerequisites(uni_key: str, start_time: float) -> Tuple[Optional[Dict], Optional[Dict]]:
+def check_task_prerequisites(uni_key: str, start_time: float, owner: Optional[str] = None) -> Tuple[Optional[Dict], Optional[Dict]]:
     """
     检查任务的前置条件（任务是否存在，文件是否存在等）
     
     Args:
         uni_key: 任务唯一标识符
         start_time: 任务开始时间
+        owner: 处理任务的Celery任务ID
         
     Returns:
         Tuple[Optional[Dict], Optional[Dict]]: (task, error_result)
@@ -98,8 +109,10 @@ def check_task_prerequisites(uni_key: str, start_time: float) -> Tuple[Optional[
     
     # 检查文件是否存在
     if not os.path.exists(task.file_path):
-        get_worker_transcription_service().update_task(
+        get_worker_transcription_service().transition_task(
             uni_key,
+            CLAIMABLE_STATUSES,
+            owner=owner,
             status="failed",
             error_message=get_error_message(ERROR_FILE_NOT_FOUND),
             code=ERROR_FILE_NOT_FOUND,
@@ -120,6 +133,206 @@ def check_task_prerequisites(uni_key: str, start_time: float) -> Tuple[Optional[
     
     return task, None
 
+def finish_cached_task(uni_key: str, entry: Dict[str, Any], start_time: Optional[float] = None) -> bool:
+    """
+    用缓存的结果直接完成任务：复制结果文件、更新任务状态并发送通知，不再进行转写
+    
+    Args:
+        uni_key: 任务唯一标识符
+        entry: 结果缓存条目（uni_key, result_path, audio_duration）
+        start_time: 任务开始时间，用于计算use_time
+        
+    Returns:
+        bool: 是否成功完成，复制结果文件失败时返回False，调用方应继续正常转写
+    """
+    start_time = start_time or time.time()
+    service = get_worker_transcription_service()
+    task = service.get_task(uni_key)
+    if not task:
+        logger.warning(f"复用缓存结果时任务不存在: {uni_key}")
+        return False
+    
+    try:
+        os.makedirs(os.path.dirname(task.result_path) or ".", exist_ok=True)
+        shutil.copyfile(entry["result_path"], task.result_path)
+    except (OSError, KeyError) as e:
+        logger.error(f"复制缓存结果失败 {uni_key}: {str(e)}")
+        return False
+    
+    audio_duration = entry.get("audio_duration")
+    now = datetime.now().isoformat()
+    completed, task = service.transition_task(
+        uni_key,
+        ("pending", "failed"),
+        status="completed",
+        started_at=task.started_at or now,
+        completed_at=now,
+        progress=100,
+        progress_message="复用已有转写结果",
+        audio_duration=audio_duration,
+        processing_time=time.time() - start_time,
+        cached_from=entry.get("uni_key"),
+        code=SUCCESS,
+        message=get_error_message(SUCCESS)
+    )
+    if not completed:
+        # 任务已经完成或正在由worker处理，不重复通知
+        return True
+    logger.info(f"任务 {uni_key} 复用了任务 {entry.get('uni_key')} 的转写结果")
+    
+    cloud_stats_service.report_task_completion(task.client_id, audio_duration)
+    send_task_webhook(task, get_download_url(task.result_path), SUCCESS, int(time.time() - start_time))
+    get_mqtt_service().send_transcription_complete(task.task_id, code=SUCCESS)
+    finalize_task(task)
+    return True
+
+def send_task_webhook(task: TranscriptionTask, result: str, code: int, use_time: int) -> None:
+    """
+    发送单个任务的webhook通知；批量提交且只要求汇总通知的任务不单独发送
+    
+    Args:
+        task: 转写任务
+        result: JSON文件下载地址，失败时为空
+        code: 错误码
+        use_time: 任务耗时（秒）
+    """
+    if not task.item_webhook:
+        return
+    webhook_service.send_transcription_complete(
+        extra_params=task.extra_params or {},
+        result=result,
+        code=code,
+        use_time=use_time,
+        jwt_token=task.jwt_token
+    )
+
+def finalize_task(task: Optional[TranscriptionTask]) -> None:
+    """
+    任务结束（成功或失败）时的收尾：从准入控制的积压中扣除，记入所属批次
+    
+    Args:
+        task: 已结束的转写任务（状态已更新为completed或failed）
+    """
+    if not task:
+        return
+    get_admission_service().release(task.uni_key)
+    settle_batch(task)
+
+def settle_batch(task: Optional[TranscriptionTask]) -> None:
+    """
+    任务结束时记入所属批次，批次中最后一个任务结束时发送汇总webhook
+    
+    Args:
+        task: 已结束的转写任务（状态已更新为completed或failed）
+    """
+    if not task or not task.batch_id:
+        return
+    batch_service = get_batch_service()
+    batch = batch_service.mark_done(task.batch_id, task.uni_key)
+    if batch:
+        notify_batch_complete(batch)
+
+def notify_batch_complete(batch: Dict[str, Any]) -> None:
+    """
+    批次完成时发送汇总webhook
+    
+    Args:
+        batch: 批次记录
+    """
+    logger.info(f"批次 {batch['batch_id']} 的所有任务已结束")
+    if not batch.get("batch_webhook"):
+        return
+    tasks = get_worker_transcription_service().get_tasks(batch["uni_keys"])
+    webhook_service.send_batch_complete(get_batch_service().summarize(batch, tasks), jwt_token=batch.get("jwt_token"))
+
+def settle_result_cache(task: Optional[TranscriptionTask], success: bool, audio_duration: Optional[float] = None) -> None:
+    """
+    任务结束时更新结果缓存：成功时写入缓存并完成挂靠的重复任务，失败时把处理权交给下一个挂靠的任务
+    
+    Args:
+        task: 转写任务
+        success: 任务是否成功
+        audio_duration: 音频时长（秒）
+    """
+    if not task:
+        return
+    result_cache = get_result_cache_service()
+    cache_key = result_cache.cache_key_for_task(task)
+    if not cache_key:
+        return
+    
+    if success:
+        waiters = result_cache.complete(cache_key, task.uni_key, task.result_path, audio_duration)
+        for waiter in waiters:
+            if not finish_cached_task(waiter, {
+                "uni_key": task.uni_key,
+                "result_path": task.result_path,
+                "audio_duration": audio_duration
+            }):
+                enqueue_transcription(waiter)
+    else:
+        next_owner = result_cache.release(cache_key, task.uni_key)
+        if next_owner:
+            logger.info(f"任务 {task.uni_key} 失败，由挂靠的任务 {next_owner} 重新转写")
+            enqueue_transcription(next_owner)
+
+def abandon_result_cache(task: TranscriptionTask) -> None:
+    """
+    未结束的任务被删除时交出结果缓存：主任务把处理权交给下一个挂靠的任务并重新入队，挂靠的任务退出等待列表
+    
+    Args:
+        task: 被删除的任务
+    """
+    result_cache = get_result_cache_service()
+    cache_key = result_cache.cache_key_for_task(task)
+    if not cache_key:
+        return
+    next_owner = result_cache.release(cache_key, task.uni_key)
+    if next_owner:
+        logger.info(f"任务 {task.uni_key} 已删除，由挂靠的任务 {next_owner} 重新转写")
+        enqueue_transcription(next_owner)
+    else:
+        result_cache.detach(cache_key, task.uni_key)
+
+def reclaim_result_cache_orphans() -> None:
+    """重新入队主任务已不存在或已结束、一直在等待的挂靠任务（定期清理任务中调用）"""
+    enqueue_transcriptions(get_result_cache_service().reclaim_orphans())
+
+def transcription_signature(uni_key: str) -> Signature:
+    """
+    构造任务的转写流程签名；启用预处理时先在CPU队列预解码PCM，完成后再进入GPU队列
+    
+    Args:
+        uni_key: 任务唯一标识符
+        
+    Returns:
+        Signature: Celery签名
+    """
+    if settings.AUDIO_PREPROCESS_ENABLED:
+        return chain(preprocess_audio.si(uni_key), process_transcription.si(uni_key))
+    return process_transcription.si(uni_key)
+
+def enqueue_transcription(uni_key: str) -> None:
+    """
+    将任务加入转写队列，并按音频时长计入积压
+    
+    Args:
+        uni_key: 任务唯一标识符
+    """
+    get_admission_service().reserve(get_worker_transcription_service().get_tasks([uni_key]))
+    transcription_signature(uni_key).delay()
+
+def enqueue_transcriptions(uni_keys: List[str]) -> None:
+    """
+    将一批任务作为Celery group一次加入转写队列
+    
+    Args:
+        uni_keys: 任务唯一标识符列表
+    """
+    if uni_keys:
+        get_admission_service().reserve(get_worker_transcription_service().get_tasks(uni_keys))
+        group(transcription_signature(uni_key) for uni_key in uni_keys).apply_async()
+
 @celery_app.task(name="process_transcription", bind=True)
 def process_transcription(self, uni_key: str):
     """
@@ -133,9 +346,16 @@ def process_transcription(self, uni_key: str):
     start_time = time.time()
     logger.info(f"开始处理转写任务: {uni_key}")
     
+    # Celery任务ID：重新投递和重试时保持不变，用于认领任务
+    owner = self.request.id
+    
     # 检查任务前置条件
-    task, error_result = check_task_prerequisites(uni_key, start_time)
+    task, error_result = check_task_prerequisites(uni_key, start_time, owner)
     if error_result:
+        failed_task = get_worker_transcription_service().get_task(uni_key)
+        settle_result_cache(failed_task, success=False)
+        finalize_task(failed_task)
+        
         # 发送失败通知
         get_mqtt_service().send_transcription_complete(
             task_id=error_result.get("task_id", "unknown"),
@@ -163,8 +383,10 @@ def process_transcription(self, uni_key: str):
         error_msg = f"任务重试次数已达上限({MAX_RETRY_COUNT}次)"
         
         # 更新任务状态
-        get_worker_transcription_service().update_task(
+        get_worker_transcription_service().transition_task(
             uni_key,
+            CLAIMABLE_STATUSES,
+            owner=owner,
             status="failed",
             error_message=error_msg,
             code=ERROR_MAX_RETRY_EXCEEDED,
@@ -179,13 +401,7 @@ def process_transcription(self, uni_key: str):
         )
         
         # 发送失败的Webhook通知
-        webhook_service.send_transcription_complete(
-            extra_params=task.extra_params or {},
-            result="",  # 失败时没有 JSON 文件下载地址
-            code=ERROR_MAX_RETRY_EXCEEDED,
-            use_time=int(time.time() - start_time),
-            jwt_token=task.jwt_token
-        )
+        send_task_webhook(task, "", ERROR_MAX_RETRY_EXCEEDED, int(time.time() - start_time))  # 失败时没有 JSON 文件下载地址
         
         error_result = create_task_result(
             status="failed",
@@ -196,19 +412,25 @@ def process_transcription(self, uni_key: str):
             timings={"task_received": time.time() - start_time}
         )
         
+        settle_result_cache(task, success=False)
+        finalize_task(task)
         return error_result
     
     try:
-        # 更新任务状态为处理中
-        get_worker_transcription_service().update_task(
-            uni_key,
-            status="processing",
-            started_at=datetime.now().isoformat()
-        )
-        
-        # 执行转写处理
-        result = get_worker_transcription_service().process_task_sync(uni_key)
-        # 重新获取一次任务信息
+        # 执行转写处理（开始时原子地将任务认领为处理中）
+        result = get_worker_transcription_service().process_task_sync(uni_key, owner=owner)
+        if result['status'] == 'skipped':
+            # 任务已由其他worker处理、已结束或在处理期间被重置，不发送通知
+            logger.warning(f"跳过任务 {uni_key}: {result.get('error')}")
+            return create_task_result(
+                status="skipped",
+                task_id=task.task_id,
+                uni_key=uni_key,
+                error=result.get('error'),
+                code=result.get('code', SUCCESS),
+                timings={"total_time": time.time() - start_time}
+            )
+        # 重新获取一次任务信息（包含GPU和并发信息等最新的extra_params）
         task = get_worker_transcription_service().get_task(uni_key)
         
         if result['status'] == 'completed':
@@ -217,23 +439,26 @@ def process_transcription(self, uni_key: str):
             # 报告任务完成
             cloud_stats_service.report_task_completion(task.client_id, audio_duration)
             
-            # 重新获取任务信息，确保获取最新的extra_params（包含GPU和并发信息）
-            updated_task = get_worker_transcription_service().get_task(uni_key)
+            # 更新实时率，用于估计排队时间
+            get_admission_service().record_throughput(audio_duration, time.time() - start_time)
+            
+            # 写入结果缓存，完成挂靠在本任务上的重复任务
+            settle_result_cache(task, success=True, audio_duration=audio_duration)
+            
+            # 转写成功后不再需要预解码的PCM（失败时保留，供重试复用）
+            remove_pcm(task.pcm_path)
             
             # 使用结果文件的文件名拼出下载URL
             download_url = get_download_url(task.result_path)
             # 发送Webhook通知
-            webhook_service.send_transcription_complete(
-                extra_params=updated_task.extra_params or {},
-                result= download_url,  # JSON 文件下载地址
-                code=SUCCESS,
-                use_time=int(time.time() - start_time),
-                jwt_token=task.jwt_token if task else None
-            )
+            send_task_webhook(task, download_url, SUCCESS, int(time.time() - start_time))  # JSON 文件下载地址
             
             # 发送成功的MQTT通知
             get_mqtt_service().send_transcription_complete(task.task_id, code=SUCCESS)
             
+            # 记入所属批次，批次完成时发送汇总通知
+            finalize_task(task)
+            
             # 创建成功结果
             return create_task_result(
                 status="completed",
@@ -241,7 +466,8 @@ def process_transcription(self, uni_key: str):
                 uni_key=uni_key,
                 code=SUCCESS,
                 audio_duration=audio_duration,
-                result=result.get('result', {}),
+                result_path=task.result_path,
+                result_summary=result.get('result_summary'),
                 timings={
                     "total_time": time.time() - start_time,
                     "model_loading": result.get('model_loading_time', 0),
@@ -272,14 +498,10 @@ def process_transcription(self, uni_key: str):
             )
             
             # 发送失败情况的Webhook通知
-            webhook_service.send_transcription_complete(
-                extra_params=task.extra_params or {},
-                result="",  # 失败时没有 JSON 文件下载地址
-                code=error_code,
-                use_time=int(time.time() - start_time),
-                jwt_token=task.jwt_token if task else None
-            )
+            send_task_webhook(task, "", error_code, int(time.time() - start_time))  # 失败时没有 JSON 文件下载地址
             
+            settle_result_cache(task, success=False)
+            finalize_task(task)
             return error_result
             
     except Exception as e:
@@ -287,21 +509,31 @@ def process_transcription(self, uni_key: str):
         error_msg = str(e)
         logger.exception(f"处理任务异常: {uni_key} - {error_msg}")
         
-        # 更新任务状态
-        get_worker_transcription_service().update_task(
+        # 更新任务状态，未达到最大重试次数时在同一次转换中增加重试次数
+        new_retry_count = current_retry_count + 1
+        failed, _ = get_worker_transcription_service().transition_task(
             uni_key,
+            CLAIMABLE_STATUSES,
+            owner=owner,
+            increment_retry=new_retry_count < MAX_RETRY_COUNT,
             status="failed",
             error_message=error_msg,
             code=ERROR_PROCESSING_FAILED,
             message=get_error_message(ERROR_PROCESSING_FAILED, error_msg)
         )
+        if not failed:
+            # 任务已被重置或由其他worker处理
+            return create_task_result(
+                status="skipped",
+                task_id=task.task_id,
+                uni_key=uni_key,
+                error=error_msg,
+                code=ERROR_PROCESSING_FAILED,
+                timings={"total_time": time.time() - start_time}
+            )
         
-        # 增加重试次数并将任务重新排队（如果未达到最大重试次数）
-        new_retry_count = current_retry_count + 1
+        # 将任务重新排队（如果未达到最大重试次数）
         if new_retry_count < MAX_RETRY_COUNT:
-            # 更新重试计数
-            get_worker_transcription_service().update_task(uni_key, retry_count=new_retry_count)
-            
             # 重新排队
             logger.info(f"重新排队任务 {uni_key}，重试次数: {new_retry_count}/{MAX_RETRY_COUNT}")
             self.retry(countdown=5, max_retries=MAX_RETRY_COUNT, exc=e)
@@ -314,13 +546,7 @@ def process_transcription(self, uni_key: str):
         )
         
         # 发送失败的Webhook通知
-        webhook_service.send_transcription_complete(
-            extra_params=task.extra_params or {},
-            result="",  # 失败时没有 JSON 文件下载地址
-            code=ERROR_PROCESSING_FAILED,
-            use_time=int(time.time() - start_time),
-            jwt_token=task.jwt_token
-        )
+        send_task_webhook(task, "", ERROR_PROCESSING_FAILED, int(time.time() - start_time))  # 失败时没有 JSON 文件下载地址
         
         error_result = create_task_result(
             status="failed",
@@ -331,4 +557,6 @@ def process_transcription(self, uni_key: str):
             timings={"total_time": time.time() - start_time}
         )
         
+        settle_result_cache(task, success=False)
+        finalize_task(task)
         return error_result 
\ No newline at end of file
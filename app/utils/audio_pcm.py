@@ -0,0 +1,117 @@
+"""
+预解码PCM工具
+
+上传的音频在CPU预处理队列中只解码一次，生成16kHz单声道float32的原始PCM文件（{uni_key}.pcm），
+GPU worker通过内存映射直接读取，转写和说话人分离不再各自调用ffmpeg解码。
+"""
+import os
+import logging
+import subprocess
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.ecm_decoder import is_ecm_file, ecm_to_pcm
+
+logger = logging.getLogger(__name__)
+
+# 与whisperx.audio.SAMPLE_RATE一致
+PCM_SAMPLE_RATE = 16000
+PCM_DTYPE = np.float32
+
+
+def get_pcm_path(uni_key: str) -> str:
+    """
+    获取任务的PCM文件路径（位于上传目录，随上传文件一起被定期清理）
+
+    Args:
+        uni_key: 任务唯一标识符
+
+    Returns:
+        str: PCM文件路径
+    """
+    return os.path.join(settings.UPLOAD_DIR, f"{uni_key}.pcm")
+
+
+def decode_to_pcm(input_path: str, output_path: str, executor: Optional[Executor] = None) -> float:
+    """
+    将音频解码为16kHz单声道float32 PCM：ECM文件直接解码Opus帧，其他格式使用ffmpeg
+
+    先写入临时文件再重命名，中途失败或进程被杀时不会留下不完整的PCM文件。
+
+    Args:
+        input_path: 输入音频文件路径
+        output_path: 输出PCM文件路径
+        executor: ECM解码使用的进程池（可选，长录音分段并行解码）
+
+    Returns:
+        float: 音频时长（秒）
+
+    Raises:
+        RuntimeError: ffmpeg解码失败
+    """
+    if is_ecm_file(input_path):
+        return ecm_to_pcm(input_path, output_path, executor=executor)
+
+    tmp_path = f"{output_path}.tmp"
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-y",
+        "-i", input_path,
+        "-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le", "-ar", str(PCM_SAMPLE_RATE),
+        tmp_path
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+        os.replace(tmp_path, output_path)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg解码失败: {e.stderr.decode(errors='ignore')[-500:]}") from e
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return get_pcm_duration(output_path)
+
+
+def get_pcm_duration(path: str) -> float:
+    """
+    根据文件大小计算PCM时长
+
+    Args:
+        path: PCM文件路径
+
+    Returns:
+        float: 时长（秒）
+    """
+    return os.path.getsize(path) / np.dtype(PCM_DTYPE).itemsize / PCM_SAMPLE_RATE
+
+
+def load_pcm(path: Optional[str]) -> Optional[np.ndarray]:
+    """
+    以内存映射方式加载PCM文件
+
+    使用写时复制模式（mode="c"），数据按需从页缓存读取，torch.from_numpy也不会因为只读数组发出警告。
+
+    Args:
+        path: PCM文件路径
+
+    Returns:
+        Optional[np.ndarray]: float32音频数组，文件不存在或为空时返回None
+    """
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    return np.memmap(path, dtype=PCM_DTYPE, mode="c")
+
+
+def remove_pcm(path: Optional[str]) -> None:
+    """
+    删除PCM文件
+
+    Args:
+        path: PCM文件路径
+    """
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"删除PCM文件失败 {path}: {str(e)}")
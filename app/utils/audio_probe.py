@@ -0,0 +1,434 @@
+"""
+音频文件头探测工具
+
+只解析容器/帧头，不解码音频，用于在上传阶段：
+1. 根据魔数识别真实格式，拒绝非音频或损坏的文件
+2. 获取真实的时长、编码、采样率和声道数
+
+支持 WAV / MP3 / FLAC / OGG(Vorbis, Opus, FLAC, Speex) / M4A(MP4) / ECM。
+"""
+import os
+import struct
+import logging
+from typing import Optional, BinaryIO, Tuple
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# 格式识别需要的文件头长度
+SNIFF_SIZE = 12
+# 在文件开头查找MP3帧同步的范围
+MP3_SYNC_SEARCH_SIZE = 64 * 1024
+# 从文件末尾查找最后一个Ogg页的范围
+OGG_TAIL_SIZE = 64 * 1024
+# moov盒子读入内存的上限
+MP4_MAX_MOOV_SIZE = 16 * 1024 * 1024
+
+# ECM: 20字节文件头 + 每60字节一个20ms的Opus帧（16kHz单声道）
+ECM_HEADER_SIZE = 20
+ECM_FRAME_SIZE = 60
+ECM_FRAME_DURATION = 0.02
+
+# MP3 比特率表（kbps），按 (MPEG版本是否为1, 层) 索引
+MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# MP3 采样率表，按版本位索引（0: MPEG2.5, 2: MPEG2, 3: MPEG1）
+MP3_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+# WAV fmt 编码
+WAV_CODECS = {
+    0x0001: "pcm",
+    0x0003: "pcm_float",
+    0x0006: "pcm_alaw",
+    0x0007: "pcm_mulaw",
+    0x0055: "mp3",
+    0xFFFE: "pcm",
+}
+
+
+class AudioProbeError(ValueError):
+    """
+    文件不是可识别的音频，或文件头已损坏
+    """
+
+
+class AudioProbeResult(BaseModel):
+    """
+    音频探测结果
+    """
+    format: str = Field(..., description="容器格式：wav, mp3, flac, ogg, m4a, ecm")
+    codec: Optional[str] = Field(None, description="音频编码")
+    sample_rate: Optional[int] = Field(None, description="采样率（Hz）")
+    channels: Optional[int] = Field(None, description="声道数")
+    duration: Optional[float] = Field(None, description="时长（秒），无法从文件头得出时为None")
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    根据文件开头的魔数识别格式
+
+    Args:
+        header: 文件开头至少 SNIFF_SIZE 字节
+
+    Returns:
+        Optional[str]: 格式名，无法识别时返回None
+    """
+    if header[:3] == b"ECM":
+        return "ecm"
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if header[:3] == b"ID3":
+        return "mp3"
+    if len(header) >= 4 and _parse_mp3_frame_header(header[:4]):
+        return "mp3"
+    return None
+
+
+def probe_audio_file(path: str) -> AudioProbeResult:
+    """
+    探测音频文件的格式、编码、采样率、声道数和时长
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        AudioProbeResult: 探测结果
+
+    Raises:
+        AudioProbeError: 不是可识别的音频文件或文件头损坏
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(SNIFF_SIZE)
+        audio_format = sniff_audio_format(header)
+        if audio_format is None:
+            raise AudioProbeError("无法识别的音频格式")
+        f.seek(0)
+        try:
+            result = PROBERS[audio_format](f, file_size)
+        except (struct.error, IndexError) as e:
+            raise AudioProbeError(f"{audio_format}文件头已损坏: {str(e)}")
+    if result.sample_rate is not None and result.sample_rate <= 0:
+        raise AudioProbeError(f"{audio_format}文件的采样率无效")
+    if result.channels is not None and result.channels <= 0:
+        raise AudioProbeError(f"{audio_format}文件的声道数无效")
+    return result
+
+
+def _probe_ecm(f: BinaryIO, file_size: int) -> AudioProbeResult:
+    """ECM：固定16kHz单声道Opus帧，时长由帧数得出"""
+    frames = max(file_size - ECM_HEADER_SIZE, 0) // ECM_FRAME_SIZE
+    if frames == 0:
+        raise AudioProbeError("ECM文件没有音频帧")
+    return AudioProbeResult(
+        format="ecm", codec="opus", sample_rate=16000, channels=1,
+        duration=round(frames * ECM_FRAME_DURATION, 3)
+    )
+
+
+def _probe_wav(f: BinaryIO, file_size: int) -> AudioProbeResult:
+    """WAV：遍历RIFF块，读取fmt和data块"""
+    f.seek(12)
+    fmt = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+        chunk_start = f.tell()
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", f.read(16))
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioProbeError("WAV文件缺少fmt块")
+            audio_format, channels, sample_rate, byte_rate, _, bits = fmt
+            # 流式写入的WAV可能没有回填data大小
+            data_size = min(chunk_size, file_size - chunk_start)
+            codec = WAV_CODECS.get(audio_format, f"wav_0x{audio_format:04x}")
+            if codec.startswith("pcm") and bits:
+                codec = f"{codec}_{bits}bit"
+            return AudioProbeResult(
+                format="wav", codec=codec, sample_rate=sample_rate, channels=channels,
+                duration=round(data_size / byte_rate, 3) if byte_rate else None
+            )
+        # RIFF块按偶数字节对齐
+        f.seek(chunk_start + chunk_size + (chunk_size & 1))
+    raise AudioProbeError("WAV文件缺少fmt或data块")
+
+
+def _parse_mp3_frame_header(data: bytes) -> Optional[Tuple[int, int, int, int, int]]:
+    """
+    解析4字节MP3帧头
+
+    Returns:
+        Optional[Tuple[int, int, int, int, int]]: (版本位, 层, 比特率kbps, 采样率, 帧长度)，无效时返回None
+    """
+    b0, b1, b2, b3 = data[0], data[1], data[2], data[3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    layer = 4 - layer_bits
+    is_mpeg1 = version_bits == 3
+    bitrate = MP3_BITRATES[(is_mpeg1, layer)][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    if layer == 1:
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    elif layer == 3 and not is_mpeg1:
+        frame_length = 72 * bitrate * 1000 // sample_rate + padding
+    else:
+        frame_length = 144 * bitrate * 1000 // sample_rate + padding
+    return version_bits, layer, bitrate, sample_rate, frame_length
+
+
+def _probe_mp3(f: BinaryIO, file_size: int) -> AudioProbeResult:
+    """MP3：跳过ID3v2，找到连续两个有效帧头，优先用Xing/Info/VBRI帧数计算时长，否则按CBR估算"""
+    audio_start = 0
+    header = f.read(10)
+    if header[:3] == b"ID3":
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        audio_start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+        f.seek(audio_start)
+        # ID3包裹的FLAC
+        if f.read(4) == b"fLaC":
+            f.seek(audio_start)
+            return _probe_flac(f, file_size, offset=audio_start)
+
+    f.seek(audio_start)
+    data = f.read(MP3_SYNC_SEARCH_SIZE)
+    pos = data.find(b"\xFF")
+    while 0 <= pos <= len(data) - 4:
+        frame = _parse_mp3_frame_header(data[pos:pos + 4])
+        if frame:
+            next_pos = pos + frame[4]
+            # 文件只有一帧，或下一帧头也有效
+            if next_pos + 4 > len(data) or _parse_mp3_frame_header(data[next_pos:next_pos + 4]):
+                break
+        pos = data.find(b"\xFF", pos + 1)
+    else:
+        raise AudioProbeError("MP3文件中找不到有效的帧")
+
+    version_bits, layer, bitrate, sample_rate, _ = frame
+    is_mpeg1 = version_bits == 3
+    channel_mode = data[pos + 3] >> 6
+    channels = 1 if channel_mode == 3 else 2
+    samples_per_frame = 384 if layer == 1 else (1152 if layer == 2 or is_mpeg1 else 576)
+
+    duration = None
+    # Xing/Info（VBR头）位于侧信息之后
+    side_info = (32 if channels == 2 else 17) if is_mpeg1 else (17 if channels == 2 else 9)
+    xing_pos = pos + 4 + side_info
+    vbri_pos = pos + 4 + 32
+    if data[xing_pos:xing_pos + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing_pos + 4:xing_pos + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing_pos + 8:xing_pos + 12])[0]
+            duration = frames * samples_per_frame / sample_rate
+    elif data[vbri_pos:vbri_pos + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri_pos + 14:vbri_pos + 18])[0]
+        duration = frames * samples_per_frame / sample_rate
+    if duration is None:
+        audio_size = file_size - audio_start - pos
+        f.seek(max(file_size - 128, 0))
+        if f.read(3) == b"TAG":
+            audio_size -= 128
+        duration = audio_size * 8 / (bitrate * 1000)
+
+    return AudioProbeResult(
+        format="mp3", codec=f"mp{layer}", sample_rate=sample_rate, channels=channels,
+        duration=round(duration, 3)
+    )
+
+
+def _probe_flac(f: BinaryIO, file_size: int, offset: int = 0) -> AudioProbeResult:
+    """FLAC：读取STREAMINFO元数据块"""
+    f.seek(offset)
+    if f.read(4) != b"fLaC":
+        raise AudioProbeError("FLAC文件头无效")
+    block_header = f.read(4)
+    if block_header[0] & 0x7F != 0:
+        raise AudioProbeError("FLAC文件缺少STREAMINFO")
+    return _parse_flac_streaminfo(f.read(34), "flac")
+
+
+def _parse_flac_streaminfo(streaminfo: bytes, container: str) -> AudioProbeResult:
+    """解析34字节的FLAC STREAMINFO"""
+    if len(streaminfo) < 18:
+        raise AudioProbeError("FLAC STREAMINFO不完整")
+    packed = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    return AudioProbeResult(
+        format=container, codec="flac", sample_rate=sample_rate, channels=channels,
+        duration=round(total_samples / sample_rate, 3) if total_samples and sample_rate else None
+    )
+
+
+def _probe_ogg(f: BinaryIO, file_size: int) -> AudioProbeResult:
+    """OGG：第一页的识别包给出编码和采样率，最后一页的granule position给出时长"""
+    page_header = f.read(27)
+    if len(page_header) < 27 or page_header[:4] != b"OggS":
+        raise AudioProbeError("OGG页头无效")
+    serial = page_header[14:18]
+    segments = f.read(page_header[26])
+    packet = f.read(sum(segments))
+
+    pre_skip = 0
+    if packet.startswith(b"\x01vorbis"):
+        channels = packet[11]
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        codec, granule_rate = "vorbis", sample_rate
+    elif packet.startswith(b"OpusHead"):
+        channels = packet[9]
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        sample_rate = struct.unpack("<I", packet[12:16])[0] or 48000
+        # Opus的granule position固定为48kHz
+        codec, granule_rate = "opus", 48000
+    elif packet.startswith(b"\x7fFLAC"):
+        result = _parse_flac_streaminfo(packet[17:51], "ogg")
+        codec, sample_rate, channels, granule_rate = "flac", result.sample_rate, result.channels, result.sample_rate
+    elif packet.startswith(b"Speex   "):
+        sample_rate = struct.unpack("<I", packet[36:40])[0]
+        channels = struct.unpack("<I", packet[48:52])[0]
+        codec, granule_rate = "speex", sample_rate
+    else:
+        raise AudioProbeError("OGG文件中没有可识别的音频流")
+
+    # 从文件末尾找同一逻辑流的最后一页
+    tail_start = max(file_size - OGG_TAIL_SIZE, 0)
+    f.seek(tail_start)
+    tail = f.read()
+    duration = None
+    pos = tail.rfind(b"OggS")
+    while pos >= 0:
+        if len(tail) - pos >= 27 and tail[pos + 14:pos + 18] == serial:
+            granule = struct.unpack("<q", tail[pos + 6:pos + 14])[0]
+            if granule >= 0 and granule_rate:
+                duration = round(max(granule - pre_skip, 0) / granule_rate, 3)
+                break
+        pos = tail.rfind(b"OggS", 0, pos)
+
+    return AudioProbeResult(
+        format="ogg", codec=codec, sample_rate=sample_rate, channels=channels, duration=duration
+    )
+
+
+def _iter_mp4_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """遍历内存中的MP4盒子，返回 (类型, 内容起点, 内容终点)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[pos:pos + 8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            raise AudioProbeError("MP4盒子大小无效")
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _find_mp4_box(data: bytes, path: Tuple[bytes, ...], start: int = 0, end: Optional[int] = None):
+    """按路径查找第一个匹配的盒子，trak会逐个尝试直到找到音频轨"""
+    if not path:
+        return start, end
+    for box_type, box_start, box_end in _iter_mp4_boxes(data, start, end):
+        if box_type == path[0]:
+            found = _find_mp4_box(data, path[1:], box_start, box_end)
+            if found:
+                return found
+    return None
+
+
+def _probe_m4a(f: BinaryIO, file_size: int) -> AudioProbeResult:
+    """M4A/MP4：在文件顶层找到moov，读取音频轨的mdhd和stsd"""
+    moov = None
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise AudioProbeError("MP4盒子大小无效")
+        if box_type == b"moov":
+            if size > MP4_MAX_MOOV_SIZE:
+                raise AudioProbeError("MP4的moov盒子过大")
+            moov = f.read(size - header_size)
+            break
+        pos += size
+    if moov is None:
+        raise AudioProbeError("MP4文件缺少moov盒子（文件可能不完整）")
+
+    for box_type, trak_start, trak_end in _iter_mp4_boxes(moov):
+        if box_type != b"trak":
+            continue
+        hdlr = _find_mp4_box(moov, (b"mdia", b"hdlr"), trak_start, trak_end)
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"soun":
+            continue
+
+        mdhd = _find_mp4_box(moov, (b"mdia", b"mdhd"), trak_start, trak_end)
+        duration = None
+        if mdhd:
+            version = moov[mdhd[0]]
+            if version == 1:
+                timescale, track_duration = struct.unpack(">IQ", moov[mdhd[0] + 20:mdhd[0] + 32])
+            else:
+                timescale, track_duration = struct.unpack(">II", moov[mdhd[0] + 12:mdhd[0] + 20])
+            if timescale:
+                duration = round(track_duration / timescale, 3)
+
+        codec = sample_rate = channels = None
+        stsd = _find_mp4_box(moov, (b"mdia", b"minf", b"stbl", b"stsd"), trak_start, trak_end)
+        if stsd:
+            # stsd: 版本/标志(4) 条目数(4)，之后是第一个采样描述
+            entry = stsd[0] + 8
+            codec = moov[entry + 4:entry + 8].decode("latin-1").strip()
+            channels = struct.unpack(">H", moov[entry + 24:entry + 26])[0]
+            sample_rate = struct.unpack(">I", moov[entry + 32:entry + 36])[0] >> 16
+
+        return AudioProbeResult(
+            format="m4a", codec=codec, sample_rate=sample_rate, channels=channels, duration=duration
+        )
+
+    raise AudioProbeError("MP4文件中没有音频轨")
+
+
+PROBERS = {
+    "ecm": _probe_ecm,
+    "wav": _probe_wav,
+    "mp3": _probe_mp3,
+    "flac": _probe_flac,
+    "ogg": _probe_ogg,
+    "m4a": _probe_m4a,
+}
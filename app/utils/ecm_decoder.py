@@ -0,0 +1,497 @@
+"""
+ECM流式解码器
+
+ECM文件体由固定60字节、每帧20ms的Opus帧组成（16kHz单声道），其中可能插入60字节的误操作防护标记。
+本模块：
+1. 分块读取数据，流式去除防护标记并切分帧，内存占用与文件大小无关
+2. 按帧数预分配输出缓冲区，通过ctypes调用libopus直接解码为float32写入缓冲区
+3. 直接输出16kHz PCM（与 app.utils.audio_pcm 的PCM文件格式一致），不再生成WAV
+4. 提供进程池入口，供API进程在不阻塞事件循环的情况下解码
+5. 长录音按帧切分为多段并行解码，每段先解码一段重叠帧预热解码器状态，与顺序解码的差异可以忽略
+"""
+import os
+import asyncio
+import bisect
+import ctypes
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ECM_MAGIC = b"ECM"
+ECM_HEADER_SIZE = 20
+ECM_FRAME_SIZE = 60
+ECM_SAMPLE_RATE = 16000
+ECM_CHANNELS = 1
+# 每帧20ms，16kHz下为320个采样点
+ECM_FRAME_SAMPLES = ECM_SAMPLE_RATE // 50
+# 误操作防护标记
+GUARD_MARKER = b"\xEE\xEE\xEE" + b"\x00" * 57
+# 读取块大小
+READ_CHUNK_SIZE = 1024 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def is_ecm_file(path: str) -> bool:
+    """
+    根据文件头判断是否为ECM文件
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        bool: 是否为ECM文件
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(ECM_MAGIC)) == ECM_MAGIC
+    except OSError:
+        return False
+
+
+def max_frame_count(file_size: int) -> int:
+    """
+    根据文件大小计算帧数上限（防护标记会被去除，实际帧数可能更少）
+
+    Args:
+        file_size: ECM文件大小（字节）
+
+    Returns:
+        int: 帧数上限
+    """
+    return max(file_size - ECM_HEADER_SIZE, 0) // ECM_FRAME_SIZE
+
+
+class EcmFrameSplitter:
+    """
+    流式去除防护标记并切分Opus帧
+
+    去除规则与 body.replace(GUARD_MARKER, b"") 一致：按顺序删除所有不重叠的标记（不要求帧对齐），
+    剩余数据每60字节为一帧，末尾不足一帧的数据丢弃。
+    """
+
+    def __init__(self):
+        self.header = b""
+        self.markers_removed = 0
+        self._pending = b""
+        self._clean = bytearray()
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        输入一块原始数据
+
+        Args:
+            chunk: 原始数据（包含文件头）
+
+        Returns:
+            bytes: 已完整的帧数据，长度为60的整数倍
+        """
+        if len(self.header) < ECM_HEADER_SIZE:
+            needed = ECM_HEADER_SIZE - len(self.header)
+            self.header += chunk[:needed]
+            chunk = chunk[needed:]
+            if len(self.header) == ECM_HEADER_SIZE and self.header[:3] != ECM_MAGIC:
+                raise ValueError("不是有效的ECM文件")
+
+        data = self._pending + chunk
+        start = 0
+        while True:
+            pos = data.find(GUARD_MARKER, start)
+            if pos < 0:
+                break
+            self._clean += data[start:pos]
+            start = pos + len(GUARD_MARKER)
+            self.markers_removed += 1
+        # 末尾可能是被分块截断的防护标记，留到下一块再判断
+        safe = max(len(data) - (len(GUARD_MARKER) - 1), start)
+        self._clean += data[start:safe]
+        self._pending = data[safe:]
+        return self._take_frames()
+
+    def flush(self) -> bytes:
+        """
+        输入结束，返回剩余的完整帧
+
+        Returns:
+            bytes: 剩余的帧数据
+        """
+        self._clean += self._pending
+        self._pending = b""
+        frames = self._take_frames()
+        if self._clean:
+            logger.debug(f"ECM末尾丢弃不完整的帧: {len(self._clean)} 字节")
+            self._clean.clear()
+        return frames
+
+    def _take_frames(self) -> bytes:
+        size = len(self._clean) // ECM_FRAME_SIZE * ECM_FRAME_SIZE
+        frames = bytes(self._clean[:size])
+        del self._clean[:size]
+        return frames
+
+
+def scan_guard_markers(path: str) -> Tuple[int, List[int]]:
+    """
+    扫描文件体中的防护标记（与 EcmFrameSplitter 的去除规则一致）
+
+    Args:
+        path: ECM文件路径
+
+    Returns:
+        Tuple[int, List[int]]: (去除标记后的文件体大小, 每个标记在去除后数据中的位置)
+    """
+    marker_size = len(GUARD_MARKER)
+    positions = []
+    raw_offset = 0
+    pending = b""
+    with open(path, "rb") as f:
+        f.seek(ECM_HEADER_SIZE)
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            data = pending + chunk
+            data_offset = raw_offset - len(pending)
+            start = 0
+            while True:
+                pos = data.find(GUARD_MARKER, start)
+                if pos < 0:
+                    break
+                # 去除之前所有标记后的位置
+                positions.append(data_offset + pos - marker_size * len(positions))
+                start = pos + marker_size
+            keep_from = max(len(data) - (marker_size - 1), start)
+            pending = data[keep_from:]
+            raw_offset += len(chunk)
+    return raw_offset - marker_size * len(positions), positions
+
+
+def clean_to_raw_offset(offset: int, markers: List[int], end: bool = False) -> int:
+    """
+    将去除标记后数据中的偏移量换算为文件中的偏移量
+
+    Args:
+        offset: 去除标记后数据中的偏移量
+        markers: scan_guard_markers 返回的标记位置
+        end: 是否为区间终点（不包含恰好位于终点处的标记）
+
+    Returns:
+        int: 文件中的偏移量（包含文件头）
+    """
+    count = bisect.bisect_left(markers, offset) if end else bisect.bisect_right(markers, offset)
+    return ECM_HEADER_SIZE + offset + len(GUARD_MARKER) * count
+
+
+def plan_ecm_segments(path: str, segments: int, warmup_frames: int) -> Tuple[int, List[Tuple[int, int, int, int, int]]]:
+    """
+    将ECM帧流切分为多段
+
+    Args:
+        path: ECM文件路径
+        segments: 段数
+        warmup_frames: 每段预热帧数
+
+    Returns:
+        Tuple[int, List[Tuple[int, int, int, int, int]]]: (总帧数, 每段的
+            (预热起始帧, 输出起始帧, 输出结束帧, 文件读取起点, 文件读取终点))
+    """
+    clean_size, markers = scan_guard_markers(path)
+    total_frames = clean_size // ECM_FRAME_SIZE
+    segments = max(1, min(segments, total_frames))
+    plan = []
+    for i in range(segments):
+        frame_start = total_frames * i // segments
+        frame_end = total_frames * (i + 1) // segments
+        decode_start = max(frame_start - warmup_frames, 0)
+        plan.append((
+            decode_start, frame_start, frame_end,
+            clean_to_raw_offset(decode_start * ECM_FRAME_SIZE, markers),
+            clean_to_raw_offset(frame_end * ECM_FRAME_SIZE, markers, end=True)
+        ))
+    return total_frames, plan
+
+
+class EcmDecoder:
+    """
+    将Opus帧直接解码到预分配的float32缓冲区
+    """
+
+    def __init__(self):
+        # 导入opuslib时会加载libopus，只在真正解码的进程中加载
+        import opuslib.api
+        import opuslib.api.decoder
+        self._api = opuslib.api
+        self._decoder = opuslib.api.decoder
+        self._state = opuslib.api.decoder.create_state(ECM_SAMPLE_RATE, ECM_CHANNELS)
+        self.failed_frames = 0
+
+    def decode_into(self, frames: bytes, out: np.ndarray, frame_offset: int) -> int:
+        """
+        解码一段帧数据写入输出缓冲区，解码失败的帧保持为静音，时间轴不变
+
+        Args:
+            frames: 帧数据，长度为60的整数倍
+            out: C连续的float32输出缓冲区
+            frame_offset: 写入位置（帧序号）
+
+        Returns:
+            int: 本次写入的帧数
+        """
+        count = len(frames) // ECM_FRAME_SIZE
+        if (frame_offset + count) * ECM_FRAME_SAMPLES > out.shape[0]:
+            raise ValueError("ECM帧数超过输出缓冲区大小")
+        frame_bytes = ECM_FRAME_SAMPLES * out.itemsize
+        base = out.ctypes.data + frame_offset * frame_bytes
+        float_pointer = self._api.c_float_pointer
+        decode_float = self._decoder.libopus_decode_float
+        for i in range(count):
+            result = decode_float(
+                self._state,
+                frames[i * ECM_FRAME_SIZE:(i + 1) * ECM_FRAME_SIZE],
+                ECM_FRAME_SIZE,
+                ctypes.cast(base + i * frame_bytes, float_pointer),
+                ECM_FRAME_SAMPLES,
+                0
+            )
+            if result < 0:
+                out[(frame_offset + i) * ECM_FRAME_SAMPLES:(frame_offset + i + 1) * ECM_FRAME_SAMPLES] = 0
+                self.failed_frames += 1
+        return count
+
+    def close(self) -> None:
+        """释放解码器"""
+        if self._state is not None:
+            self._decoder.destroy(self._state)
+            self._state = None
+
+    def __enter__(self) -> "EcmDecoder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def iter_file_chunks(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterable[bytes]:
+    """
+    分块读取文件
+
+    Args:
+        path: 文件路径
+        chunk_size: 块大小
+
+    Returns:
+        Iterable[bytes]: 数据块
+    """
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def decode_ecm_stream(chunks: Iterable[bytes], out: np.ndarray) -> int:
+    """
+    流式解码ECM数据到预分配的缓冲区
+
+    Args:
+        chunks: 原始数据块（包含文件头）
+        out: float32输出缓冲区，大小至少为 帧数上限 * 320
+
+    Returns:
+        int: 实际解码的采样点数
+    """
+    splitter = EcmFrameSplitter()
+    frame_offset = 0
+    with EcmDecoder() as decoder:
+        for chunk in chunks:
+            frame_offset += decoder.decode_into(splitter.feed(chunk), out, frame_offset)
+        frame_offset += decoder.decode_into(splitter.flush(), out, frame_offset)
+        if decoder.failed_frames:
+            logger.warning(f"ECM解码失败的帧: {decoder.failed_frames}/{frame_offset}，已填充静音")
+    if splitter.markers_removed:
+        logger.info(f"ECM已去除误操作防护标记: {splitter.markers_removed} 处")
+    return frame_offset * ECM_FRAME_SAMPLES
+
+
+def decode_ecm_segment(
+    input_path: str,
+    output_path: str,
+    total_frames: int,
+    decode_start: int,
+    frame_start: int,
+    frame_end: int,
+    raw_start: int,
+    raw_end: int
+) -> int:
+    """
+    解码一段帧，写入共享的PCM输出文件（在进程池中执行）
+
+    先解码 decode_start 到 frame_start 之间的预热帧并丢弃，使解码器状态接近顺序解码时的状态
+    （默认预热1秒，分段处的误差在1e-2以内并很快衰减为0）。
+
+    Args:
+        input_path: ECM文件路径
+        output_path: 已按总帧数预分配的PCM文件
+        total_frames: 总帧数
+        decode_start: 预热起始帧
+        frame_start: 输出起始帧
+        frame_end: 输出结束帧
+        raw_start: 文件读取起点
+        raw_end: 文件读取终点
+
+    Returns:
+        int: 解码失败的帧数
+    """
+    with open(input_path, "rb") as f:
+        f.seek(raw_start)
+        frames = f.read(raw_end - raw_start).replace(GUARD_MARKER, b"")
+    warmup_bytes = (frame_start - decode_start) * ECM_FRAME_SIZE
+    if len(frames) != (frame_end - decode_start) * ECM_FRAME_SIZE:
+        raise ValueError("ECM分段数据长度与计划不一致")
+
+    out = np.memmap(output_path, dtype=np.float32, mode="r+", shape=(total_frames * ECM_FRAME_SAMPLES,))
+    try:
+        with EcmDecoder() as decoder:
+            if warmup_bytes:
+                scratch = np.zeros((frame_start - decode_start) * ECM_FRAME_SAMPLES, dtype=np.float32)
+                decoder.decode_into(frames[:warmup_bytes], scratch, 0)
+                decoder.failed_frames = 0
+            decoder.decode_into(frames[warmup_bytes:], out, frame_start)
+        out.flush()
+    finally:
+        del out
+    return decoder.failed_frames
+
+
+def decode_ecm_file(path: str) -> np.ndarray:
+    """
+    解码ECM文件为内存中的16kHz单声道float32数组
+
+    Args:
+        path: ECM文件路径
+
+    Returns:
+        np.ndarray: 音频数据
+    """
+    out = np.zeros(max_frame_count(os.path.getsize(path)) * ECM_FRAME_SAMPLES, dtype=np.float32)
+    samples = decode_ecm_stream(iter_file_chunks(path), out)
+    return out[:samples]
+
+
+def ecm_to_pcm(input_path: str, output_path: str, executor: Optional[Executor] = None) -> float:
+    """
+    解码ECM文件，直接写出16kHz单声道float32 PCM文件
+
+    输出文件按帧数预分配并内存映射写入，完成后截断到实际长度再重命名。
+    提供进程池且录音足够长时按段并行解码。
+
+    Args:
+        input_path: ECM文件路径
+        output_path: 输出PCM文件路径
+        executor: 并行解码使用的进程池（可选）
+
+    Returns:
+        float: 音频时长（秒）
+    """
+    max_frames = max_frame_count(os.path.getsize(input_path))
+    if max_frames == 0:
+        raise ValueError("ECM文件没有音频帧")
+    if executor is not None and max_frames < settings.ECM_PARALLEL_MIN_FRAMES:
+        # 短录音整体交给进程池解码，调用方线程只等待结果
+        return executor.submit(ecm_to_pcm, input_path, output_path).result()
+    tmp_path = f"{output_path}.tmp"
+    try:
+        if executor is not None:
+            total_frames, plan = plan_ecm_segments(input_path, settings.ECM_DECODE_WORKERS, settings.ECM_DECODE_WARMUP_FRAMES)
+            if total_frames == 0:
+                raise ValueError("ECM文件没有音频帧")
+            _allocate_pcm_file(tmp_path, total_frames)
+            failed = sum(executor.map(
+                decode_ecm_segment,
+                *zip(*[(input_path, tmp_path, total_frames) + segment for segment in plan])
+            ))
+            samples = _finish_parallel_decode(tmp_path, output_path, total_frames, failed, len(plan))
+        else:
+            out = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(max_frames * ECM_FRAME_SAMPLES,))
+            samples = decode_ecm_stream(iter_file_chunks(input_path), out)
+            out.flush()
+            del out
+            with open(tmp_path, "r+b") as f:
+                f.truncate(samples * np.dtype(np.float32).itemsize)
+            os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return samples / ECM_SAMPLE_RATE
+
+
+def _allocate_pcm_file(path: str, total_frames: int) -> None:
+    """按帧数预分配PCM文件（稀疏文件，未写入的部分为静音）"""
+    with open(path, "wb") as f:
+        f.truncate(total_frames * ECM_FRAME_SAMPLES * np.dtype(np.float32).itemsize)
+
+
+def _finish_parallel_decode(tmp_path: str, output_path: str, total_frames: int, failed: int, segments: int) -> int:
+    """并行解码完成后重命名输出文件，返回采样点数"""
+    if failed:
+        logger.warning(f"ECM解码失败的帧: {failed}/{total_frames}，已填充静音")
+    logger.info(f"ECM分{segments}段并行解码完成: {total_frames} 帧")
+    os.replace(tmp_path, output_path)
+    return total_frames * ECM_FRAME_SAMPLES
+
+
+def get_decode_executor() -> ProcessPoolExecutor:
+    """
+    获取ECM解码进程池（单例，首次使用时创建）
+
+    Celery prefork的子进程是守护进程，不能再创建子进程，因此只在API进程和预处理Worker（threads池）中使用。
+
+    Returns:
+        ProcessPoolExecutor: 进程池
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.ECM_DECODE_WORKERS)
+    return _executor
+
+
+async def ecm_to_pcm_async(input_path: str, output_path: str) -> float:
+    """
+    在进程池中解码ECM为PCM，不阻塞事件循环；长录音按段分发到多个进程并行解码
+
+    Args:
+        input_path: ECM文件路径
+        output_path: 输出PCM文件路径
+
+    Returns:
+        float: 音频时长（秒）
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_decode_executor()
+    if max_frame_count(os.path.getsize(input_path)) < settings.ECM_PARALLEL_MIN_FRAMES:
+        return await loop.run_in_executor(executor, ecm_to_pcm, input_path, output_path)
+
+    total_frames, plan = await loop.run_in_executor(
+        executor, plan_ecm_segments, input_path, settings.ECM_DECODE_WORKERS, settings.ECM_DECODE_WARMUP_FRAMES
+    )
+    if total_frames == 0:
+        raise ValueError("ECM文件没有音频帧")
+    tmp_path = f"{output_path}.tmp"
+    try:
+        _allocate_pcm_file(tmp_path, total_frames)
+        failed = sum(await asyncio.gather(*[
+            loop.run_in_executor(executor, decode_ecm_segment, input_path, tmp_path, total_frames, *segment)
+            for segment in plan
+        ]))
+        samples = _finish_parallel_decode(tmp_path, output_path, total_frames, failed, len(plan))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return samples / ECM_SAMPLE_RATE
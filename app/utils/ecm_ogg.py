@@ -0,0 +1,170 @@
+"""
+ECM转Ogg/Opus封装
+
+ECM文件体已经是标准Opus帧（16kHz单声道，每帧20ms），只需去除防护标记后按RFC 7845重新封装为Ogg/Opus，
+不解码、不重新编码。封装后的文件可以直接由ffmpeg等标准工具读取，大小与原ECM文件基本相同。
+"""
+import os
+import struct
+import logging
+import zlib
+from typing import BinaryIO, List
+
+from app.utils.ecm_decoder import (
+    ECM_FRAME_SIZE, ECM_SAMPLE_RATE, ECM_CHANNELS, EcmFrameSplitter, iter_file_chunks
+)
+
+logger = logging.getLogger(__name__)
+
+OGG_OPUS_EXTENSION = ".opus"
+# Opus的granule position固定为48kHz，每个20ms的帧为960
+OPUS_GRANULE_RATE = 48000
+FRAME_GRANULE = OPUS_GRANULE_RATE // 50
+# 每页的帧数（每帧一个分段，不超过255个分段），每页约1秒音频
+FRAMES_PER_PAGE = 50
+# 固定的逻辑流序列号（文件中只有一个流）
+STREAM_SERIAL = 0x45434D00
+VENDOR = b"asr-ecm-remux"
+
+_HEADER_FLAG_BOS = 0x02
+_HEADER_FLAG_EOS = 0x04
+# 字节内比特反转表：Ogg使用不反射的CRC32（多项式0x04C11DB7，初值0），
+# 把输入字节和结果都做比特反转后即可用zlib的反射CRC32计算
+_BIT_REVERSE = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def ogg_crc(data: bytes) -> int:
+    """
+    计算Ogg页校验和
+
+    Args:
+        data: 校验和字段置0的完整页数据
+
+    Returns:
+        int: 校验和
+    """
+    crc = zlib.crc32(data.translate(_BIT_REVERSE), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f"{crc:032b}"[::-1], 2)
+
+
+def build_ogg_page(packets: List[bytes], granule: int, sequence: int, flags: int = 0) -> bytes:
+    """
+    构造一个Ogg页（每个包都在本页结束，不跨页）
+
+    Args:
+        packets: 包数据
+        granule: 本页最后一个包结束时的granule position
+        sequence: 页序号
+        flags: 页头标志（BOS/EOS）
+
+    Returns:
+        bytes: 页数据
+    """
+    lacing = bytearray()
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    if len(lacing) > 255:
+        raise ValueError("Ogg页的分段数超过255")
+    header = struct.pack("<4sBBqIIIB", b"OggS", 0, flags, granule, STREAM_SERIAL, sequence, 0, len(lacing))
+    page = bytearray(header + lacing + b"".join(packets))
+    struct.pack_into("<I", page, 22, ogg_crc(bytes(page)))
+    return bytes(page)
+
+
+def build_opus_head() -> bytes:
+    """OpusHead识别头：ECM解码时不跳过起始采样，pre-skip为0，与直接解码的时间轴一致"""
+    return struct.pack("<8sBBHIhB", b"OpusHead", 1, ECM_CHANNELS, 0, ECM_SAMPLE_RATE, 0, 0)
+
+
+def build_opus_tags() -> bytes:
+    """OpusTags注释头（没有用户注释）"""
+    return b"OpusTags" + struct.pack("<I", len(VENDOR)) + VENDOR + struct.pack("<I", 0)
+
+
+def write_ogg_opus(frames_iter, out: BinaryIO) -> int:
+    """
+    将Opus帧流封装写入Ogg/Opus
+
+    Args:
+        frames_iter: 帧数据块的迭代器，每块长度为60的整数倍
+        out: 输出文件对象
+
+    Returns:
+        int: 写入的帧数
+    """
+    out.write(build_ogg_page([build_opus_head()], 0, 0, _HEADER_FLAG_BOS))
+    out.write(build_ogg_page([build_opus_tags()], 0, 1))
+    sequence = 2
+    frame_count = 0
+    pending: List[bytes] = []
+    # 最后一页需要EOS标志，因此总是保留一页到下一页出现或输入结束
+    held_page = None
+    for block in frames_iter:
+        for i in range(0, len(block), ECM_FRAME_SIZE):
+            pending.append(block[i:i + ECM_FRAME_SIZE])
+            if len(pending) == FRAMES_PER_PAGE:
+                if held_page:
+                    out.write(build_ogg_page(*held_page))
+                frame_count += len(pending)
+                held_page = (pending, frame_count * FRAME_GRANULE, sequence)
+                sequence += 1
+                pending = []
+    if pending:
+        if held_page:
+            out.write(build_ogg_page(*held_page))
+        frame_count += len(pending)
+        held_page = (pending, frame_count * FRAME_GRANULE, sequence)
+    if held_page is None:
+        raise ValueError("ECM文件没有音频帧")
+    out.write(build_ogg_page(*held_page, _HEADER_FLAG_EOS))
+    return frame_count
+
+
+def ecm_to_ogg(input_path: str, output_path: str) -> float:
+    """
+    将ECM文件封装为Ogg/Opus文件（不解码）
+
+    先写入临时文件再重命名，失败时不会留下不完整的文件。
+
+    Args:
+        input_path: ECM文件路径
+        output_path: 输出Ogg/Opus文件路径
+
+    Returns:
+        float: 音频时长（秒）
+    """
+    splitter = EcmFrameSplitter()
+
+    def iter_frames():
+        for chunk in iter_file_chunks(input_path):
+            frames = splitter.feed(chunk)
+            if frames:
+                yield frames
+        frames = splitter.flush()
+        if frames:
+            yield frames
+
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            frame_count = write_ogg_opus(iter_frames(), f)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if splitter.markers_removed:
+        logger.info(f"已去除 {splitter.markers_removed} 个误操作防护标记")
+    return frame_count * FRAME_GRANULE / OPUS_GRANULE_RATE
+
+
+def get_ogg_path(ecm_path: str) -> str:
+    """
+    获取ECM文件封装后的存储路径（替换扩展名为.opus）
+
+    Args:
+        ecm_path: ECM文件路径
+
+    Returns:
+        str: Ogg/Opus文件路径
+    """
+    return os.path.splitext(ecm_path)[0] + OGG_OPUS_EXTENSION
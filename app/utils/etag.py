@@ -0,0 +1,67 @@
+import zlib
+import hashlib
+from typing import List, Optional, Tuple
+
+# 任务的版本信息：(version, created_at)
+TaskVersion = Tuple[int, str]
+
+
+def task_etag(version: int, created_at: str) -> str:
+    """
+    任务记录的ETag
+
+    任务每次写入 version 加1；created_at 区分删除后用相同 uni_key 重新创建的任务（version 从0重新开始）。
+
+    Args:
+        version: 任务的版本号
+        created_at: 任务的创建时间
+
+    Returns:
+        str: 带引号的强ETag
+    """
+    return f'"{version}-{zlib.crc32(str(created_at).encode()):08x}"'
+
+
+def list_etag(uni_keys: List[str], versions: List[Optional[TaskVersion]], next_cursor: Optional[str] = None) -> str:
+    """
+    任务列表（一页）的ETag，由本页每个任务的版本信息和下一页游标计算
+
+    Args:
+        uni_keys: 本页读取的任务唯一标识符
+        versions: 与 uni_keys 顺序一致的版本信息，不存在的任务为None
+        next_cursor: 下一页游标
+
+    Returns:
+        str: 带引号的强ETag
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for uni_key, version in zip(uni_keys, versions):
+        entry = f"{uni_key}\0{version[0]}\0{version[1]}\n" if version else f"{uni_key}\0\n"
+        digest.update(entry.encode())
+    digest.update((next_cursor or "").encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """
+    检查 If-None-Match 请求头是否包含当前ETag（弱比较，"*" 匹配任何存在的资源）
+
+    Args:
+        if_none_match: If-None-Match 请求头
+        etag: 当前ETag，资源不存在时为None
+
+    Returns:
+        bool: 是否应返回304
+    """
+    if not if_none_match or not etag:
+        return False
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
@@ -6,6 +6,41 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+class ContentIdHasher:
+    """
+    增量计算内容ID，供流式读取上传文件时使用
+
+    与 generate_content_id 的结果一致：MD5(用户ID + 文件前 CONTENT_ID_MAX_SAMPLE_SIZE 字节)
+    """
+
+    def __init__(self, user_id: int):
+        """
+        Args:
+            user_id: 用户ID
+        """
+        self._md5 = hashlib.md5(f"{user_id}".encode('utf8'))
+        self._remaining = settings.CONTENT_ID_MAX_SAMPLE_SIZE
+
+    def update(self, chunk: bytes) -> None:
+        """
+        追加一段文件内容，超出采样大小的部分会被忽略
+
+        Args:
+            chunk: 文件字节内容
+        """
+        if self._remaining <= 0:
+            return
+        sample = chunk[:self._remaining]
+        self._md5.update(sample)
+        self._remaining -= len(sample)
+
+    def hexdigest(self) -> str:
+        """
+        Returns:
+            str: 内容ID(MD5哈希值)
+        """
+        return self._md5.hexdigest()
+
 def generate_content_id(file_content: bytes, user_id: int) -> str:
     """
     根据文件内容和用户ID生成内容ID
@@ -18,17 +53,9 @@ def generate_content_id(file_content: bytes, user_id: int) -> str:
         str: 生成的内容ID(MD5哈希值)
     """
     try:
-        # 限制文件样本大小
-        sample_size = min(len(file_content), settings.CONTENT_ID_MAX_SAMPLE_SIZE)
-        sample = file_content[:sample_size]
-        
-        # 组合用户ID和文件样本
-        user_id_bytes = f"{user_id}".encode('utf8')
-        combined_data = user_id_bytes + sample
-        
-        # 计算MD5哈希
-        content_id = hashlib.md5(combined_data).hexdigest()
-        return content_id
+        hasher = ContentIdHasher(user_id)
+        hasher.update(file_content)
+        return hasher.hexdigest()
     except Exception as e:
         logger.error(f"生成内容ID失败: {str(e)}")
         # 生成备用ID
@@ -55,6 +82,19 @@ def validate_content_id(file_content: bytes, user_id: int, provided_content_id:
         
     # 生成内容ID
     calculated_content_id = generate_content_id(file_content, user_id)
+    return match_content_id(calculated_content_id, provided_content_id)
+
+def match_content_id(calculated_content_id: str, provided_content_id: str) -> bool:
+    """
+    比较服务器计算的content_id与客户端提供的content_id
+    
+    Args:
+        calculated_content_id: 服务器计算的content_id
+        provided_content_id: 客户端提供的content_id
+    
+    Returns:
+        bool: 是否一致
+    """
     logger.info(f"收到的content_id:{provided_content_id} ，服务器计算的content_id: {calculated_content_id}")
     
     # 比较计算的哈希值与提供的content_id
@@ -14,30 +14,6 @@ from app.core.config import settings
 CHUNK_SIZE = 1024 * 1024  # 1MB 的块大小
 logger = logging.getLogger(__name__)
 
-async def validate_audio_file(file: UploadFile) -> bool:
-    """
-    验证上传文件是否为有效的音频文件
-    
-    Args:
-        file: 上传的文件对象
-        
-    Returns:
-        bool: 是否为有效的音频文件
-    """
-    # 检查文件类型
-    valid_extensions = [".mp3", ".wav", ".m4a", ".ogg", ".flac"]
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    
-    # 检查MIME类型（如果可用）
-    content_type = file.content_type
-    valid_mime_types = [
-        "audio/mpeg", "audio/mp3", "audio/wav", "audio/x-wav", 
-        "audio/m4a", "audio/ogg", "audio/flac", "audio/x-flac"
-    ]
-    
-    # 至少需要满足一个条件：扩展名有效或MIME类型有效
-    return (file_ext in valid_extensions) or (content_type in valid_mime_types)
-
 async def get_file_size_bytes(file: UploadFile) -> int:
     """
     获取上传文件的大小（字节）- 优化的异步实现
@@ -0,0 +1,133 @@
+"""
+multipart/form-data 请求体的流式解析
+
+Starlette解析表单时把文件部分写入 SpooledTemporaryFile（超过阈值即写入临时文件），上传接口再把它复制到最终路径，
+大文件因此被写入磁盘两次。这里直接从 request.stream() 增量解析请求体，按顺序产出每个部分的开始、数据和结束事件，
+调用方可以把文件数据直接写入最终路径。
+"""
+from typing import AsyncIterator, List, Optional, Tuple
+
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from starlette.datastructures import Headers
+
+# 解析事件
+PART_BEGIN = "begin"
+PART_DATA = "data"
+PART_END = "end"
+
+
+class MultipartStreamError(ValueError):
+    """
+    请求体不是有效的 multipart/form-data
+    """
+
+
+class MultipartPart:
+    """multipart请求体中的一个部分（表单字段或文件）"""
+
+    __slots__ = ("name", "filename", "content_type")
+
+    def __init__(self, name: str, filename: Optional[str] = None, content_type: Optional[str] = None):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+
+    @property
+    def is_file(self) -> bool:
+        """是否为文件部分"""
+        return self.filename is not None
+
+
+class _PartEvents:
+    """python-multipart解析器的回调，把解析结果收集为事件列表"""
+
+    def __init__(self, charset: str):
+        self.charset = charset
+        self.events: List[Tuple[str, MultipartPart, bytes]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._part: Optional[MultipartPart] = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = []
+        self._part = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers.append((self._header_name.lower(), self._header_value))
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        headers = Headers(raw=self._headers)
+        _, options = parse_options_header(headers.get("content-disposition", ""))
+        if b"name" not in options:
+            raise MultipartStreamError("multipart部分缺少Content-Disposition的name")
+        filename = options.get(b"filename")
+        self._part = MultipartPart(
+            name=options[b"name"].decode(self.charset, errors="replace"),
+            filename=filename.decode(self.charset, errors="replace") if filename is not None else None,
+            content_type=headers.get("content-type")
+        )
+        self.events.append((PART_BEGIN, self._part, b""))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self.events.append((PART_DATA, self._part, data[start:end]))
+
+    def on_part_end(self) -> None:
+        self.events.append((PART_END, self._part, b""))
+
+
+async def iter_multipart(headers: Headers, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, MultipartPart, bytes]]:
+    """
+    增量解析 multipart/form-data 请求体
+
+    每读取一块请求体就产出其中解析出的事件，数据只在内存中停留一个请求体块的时间。
+
+    Args:
+        headers: 请求头（读取Content-Type中的boundary和charset）
+        stream: 请求体数据流，例如 request.stream()
+
+    Yields:
+        Tuple[str, MultipartPart, bytes]: (PART_BEGIN/PART_DATA/PART_END, 所属部分, 数据块（只有PART_DATA非空）)
+
+    Raises:
+        MultipartStreamError: 请求体不是有效的 multipart/form-data
+    """
+    content_type, params = parse_options_header(headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise MultipartStreamError("请求体不是multipart/form-data")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+
+    collector = _PartEvents(charset)
+    parser = multipart.MultipartParser(params[b"boundary"], collector.callbacks())
+    async for chunk in stream:
+        try:
+            parser.write(chunk)
+        except MultipartParseError as e:
+            raise MultipartStreamError(f"multipart请求体格式错误: {str(e)}")
+        events, collector.events = collector.events, []
+        for event in events:
+            yield event
+    parser.finalize()
+    for event in collector.events:
+        yield event
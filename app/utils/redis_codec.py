@@ -0,0 +1,197 @@
+"""
+Redis值的编解码
+
+新写入的值带有版本头：MAGIC(0xC1) + 格式版本 + 编码方式 + 压缩方式，之后是编码（并可能压缩）后的数据。
+0xC1 既不是合法的JSON开头，也是msgpack中保留不用的字节，因此没有版本头的值按旧的JSON格式读取。
+
+编码方式和压缩方式可以配置（REDIS_CODEC、REDIS_COMPRESSION），对应的库未安装时退回JSON和zlib，
+读取时按版本头选择解码方式，与写入时的配置无关。
+"""
+import json
+import zlib
+import logging
+from typing import Any, Callable, Dict, Tuple
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"\xc1"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4
+
+CODEC_JSON = 1
+CODEC_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+
+def dumps_json(value: Any) -> bytes:
+    """
+    JSON编码（有orjson时使用orjson），输出与 json.dumps(ensure_ascii=False) 紧凑格式等价的UTF-8字节
+
+    Args:
+        value: 要编码的值
+
+    Returns:
+        bytes: JSON字节
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data: Any) -> Any:
+    """
+    JSON解码（有orjson时使用orjson）
+
+    Args:
+        data: JSON字节或字符串
+
+    Returns:
+        Any: 解码后的值
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+_SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    CODEC_JSON: (dumps_json, loads_json),
+    CODEC_MSGPACK: (_msgpack_dumps, _msgpack_loads),
+}
+
+_COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESSION_ZLIB: (zlib.compress, zlib.decompress),
+    COMPRESSION_ZSTD: (_zstd_compress, _zstd_decompress),
+}
+
+
+class RecordCodec:
+    """
+    带版本头的记录编解码器
+
+    写入时使用配置的编码方式，序列化结果超过阈值时压缩（压缩后没有变小则不压缩）；
+    读取时按版本头解码，没有版本头的旧值按JSON解码。
+    """
+
+    def __init__(self, codec: str = "msgpack", compression: str = "zstd", compress_threshold: int = 1024):
+        """
+        初始化编解码器
+
+        Args:
+            codec: 编码方式，msgpack 或 json
+            compression: 压缩方式，zstd、zlib 或 none
+            compress_threshold: 超过该字节数时压缩
+        """
+        self.codec = CODEC_MSGPACK if codec == "msgpack" else CODEC_JSON
+        if self.codec == CODEC_MSGPACK and msgpack is None:
+            logger.warning("未安装msgpack，Redis值使用JSON编码")
+            self.codec = CODEC_JSON
+
+        self.compression = {
+            "zstd": COMPRESSION_ZSTD, "zlib": COMPRESSION_ZLIB
+        }.get(compression, COMPRESSION_NONE)
+        if self.compression == COMPRESSION_ZSTD and zstandard is None:
+            logger.warning("未安装zstandard，Redis值使用zlib压缩")
+            self.compression = COMPRESSION_ZLIB
+        self.compress_threshold = compress_threshold
+
+    def encode(self, value: Any) -> bytes:
+        """
+        编码一个值
+
+        Args:
+            value: 要编码的值
+
+        Returns:
+            bytes: 带版本头的数据
+        """
+        data = _SERIALIZERS[self.codec][0](value)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(data) > self.compress_threshold:
+            compressed = _COMPRESSORS[self.compression][0](data)
+            if len(compressed) < len(data):
+                data, compression = compressed, self.compression
+        return MAGIC + bytes((FORMAT_VERSION, self.codec, compression)) + data
+
+    def decode(self, data: bytes) -> Any:
+        """
+        解码一个值（兼容没有版本头的旧JSON值）
+
+        Args:
+            data: Redis中读取的数据
+
+        Returns:
+            Any: 解码后的值
+
+        Raises:
+            ValueError: 版本或编码方式不支持（例如读取方没有安装对应的库）
+        """
+        if data[:1] != MAGIC:
+            return loads_json(data)
+        version, codec, compression = data[1], data[2], data[3]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的Redis值格式版本: {version}")
+        payload = data[HEADER_SIZE:]
+        if compression != COMPRESSION_NONE:
+            if compression == COMPRESSION_ZSTD and zstandard is None:
+                raise ValueError("Redis值使用zstd压缩，但未安装zstandard")
+            payload = _COMPRESSORS[compression][1](payload)
+        if codec == CODEC_MSGPACK and msgpack is None:
+            raise ValueError("Redis值使用msgpack编码，但未安装msgpack")
+        return _SERIALIZERS[codec][1](payload)
+
+
+# 单例模式
+_record_codec = None
+
+
+def get_record_codec() -> RecordCodec:
+    """
+    获取按配置创建的RecordCodec实例（单例模式）
+
+    Returns:
+        RecordCodec: 记录编解码器实例
+    """
+    global _record_codec
+    if _record_codec is None:
+        _record_codec = RecordCodec(
+            codec=settings.REDIS_CODEC,
+            compression=settings.REDIS_COMPRESSION,
+            compress_threshold=settings.REDIS_COMPRESS_THRESHOLD
+        )
+    return _record_codec
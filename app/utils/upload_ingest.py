@@ -0,0 +1,336 @@
+"""
+上传文件入库工具
+
+一次读取上传数据流，同时完成：
+1. content_id 哈希计算（前 CONTENT_ID_MAX_SAMPLE_SIZE 字节）
+2. 全文件 SHA-256 内容哈希（用于结果缓存）
+3. 文件头识别（ECM 等格式）
+4. 文件大小上下限检查
+5. 写入 UPLOAD_DIR 下的最终路径
+6. 写入完成后只解析文件头探测真实时长、编码和采样率
+"""
+import os
+import hashlib
+import logging
+from typing import Optional, AsyncIterator, Callable
+
+import aiofiles
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.utils.file_validation import ContentIdHasher, match_content_id
+from app.utils.audio_probe import AudioProbeError, AudioProbeResult, probe_audio_file, sniff_audio_format
+from app.utils.error_codes import (
+    ERROR_FILE_TOO_LARGE, ERROR_FILE_TOO_SMALL, ERROR_PROCESSING_FAILED,
+    ERROR_INVALID_FILE_FORMAT, get_error_message
+)
+
+logger = logging.getLogger(__name__)
+
+# 读取块大小
+CHUNK_SIZE = 1024 * 1024  # 1MB
+# 文件头保留长度，用于格式识别
+HEADER_SIZE = 20
+# ECM文件头魔数 (0x45, 0x43, 0x4D 对应 'E', 'C', 'M')
+ECM_MAGIC = b"ECM"
+
+
+class UploadRejectedError(ValueError):
+    """
+    上传文件未通过校验
+    """
+
+    def __init__(self, code: int, message: Optional[str] = None):
+        """
+        Args:
+            code: 错误码，见 app.utils.error_codes
+            message: 自定义错误信息
+        """
+        self.code = code
+        super().__init__(get_error_message(code, message))
+
+
+def is_ecm_header(header: bytes) -> bool:
+    """
+    根据文件头判断是否为ECM格式
+
+    Args:
+        header: 文件开头的字节
+
+    Returns:
+        bool: 是否为ECM格式
+    """
+    return header[:3] == ECM_MAGIC
+
+
+def is_audio_header(header: bytes) -> bool:
+    """
+    根据魔数判断文件头是否为支持的音频格式（含ECM）
+
+    Args:
+        header: 文件开头的字节
+
+    Returns:
+        bool: 是否为支持的音频格式
+    """
+    return sniff_audio_format(header) is not None
+
+
+def build_upload_path(uni_key: str, filename: str) -> str:
+    """
+    生成上传文件的最终存储路径，格式为 {uni_key}_{原文件名}
+
+    Args:
+        uni_key: 任务唯一标识符
+        filename: 原始文件名
+
+    Returns:
+        str: 存储路径
+    """
+    filename_without_ext, file_ext = os.path.splitext(os.path.basename(filename or "upload"))
+    return os.path.join(settings.UPLOAD_DIR, f"{uni_key}_{filename_without_ext}{file_ext}")
+
+
+class UploadIngestor:
+    """
+    单次读取完成上传文件的入库
+
+    使用方式:
+        async with UploadIngestor(path, u_id=u_id) as ingestor:
+            async for chunk in stream:
+                await ingestor.write(chunk)
+        ingestor.content_id / ingestor.is_ecm / ingestor.size / ingestor.audio_info
+
+    超出大小上限时立即中止并删除已写入的文件；退出上下文时检查大小下限、content_id，
+    并探测音频文件头，无法识别或已损坏的文件会被拒绝。
+
+    参数在文件之后才能得到时（multipart表单中文件在 extra_params 之前），可以分步调用：
+    open() → write() → close()，得到参数后 bind_params()，再调用 finish() 完成校验。
+    """
+
+    def __init__(
+        self,
+        target_path: str,
+        u_id: Optional[int] = None,
+        expected_content_id: Optional[str] = None,
+        max_size_bytes: Optional[int] = None,
+        min_size_bytes: Optional[int] = None,
+        header_validator: Optional[Callable[[bytes], bool]] = None,
+        probe_audio: bool = True
+    ):
+        """
+        Args:
+            target_path: 最终写入路径
+            u_id: 用户ID，提供时计算content_id
+            expected_content_id: 客户端提供的content_id，提供时在结束时校验
+            max_size_bytes: 大小上限，默认 MAX_UPLOAD_SIZE_MB
+            min_size_bytes: 大小下限，默认 MIN_UPLOAD_SIZE_BYTES
+            header_validator: 文件头校验函数，读到足够的文件头后调用一次，返回False时拒绝
+            probe_audio: 是否在写入完成后探测音频信息
+        """
+        self.target_path = target_path
+        self.u_id = u_id
+        self.expected_content_id = expected_content_id
+        self.max_size_bytes = max_size_bytes if max_size_bytes is not None else settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        self.min_size_bytes = min_size_bytes if min_size_bytes is not None else settings.MIN_UPLOAD_SIZE_BYTES
+        self.size = 0
+        self.header = b""
+        self._hasher = ContentIdHasher(u_id) if u_id is not None else None
+        self._sha256 = hashlib.sha256()
+        self._header_validator = header_validator
+        self._probe_audio = probe_audio
+        self._file = None
+        self.audio_info: Optional[AudioProbeResult] = None
+
+    @property
+    def is_ecm(self) -> bool:
+        """是否为ECM格式"""
+        return is_ecm_header(self.header)
+
+    @property
+    def content_id(self) -> Optional[str]:
+        """服务器计算的content_id（未提供u_id时为None）"""
+        return self._hasher.hexdigest() if self._hasher else None
+
+    @property
+    def content_hash(self) -> str:
+        """全文件内容的SHA-256哈希"""
+        return self._sha256.hexdigest()
+
+    async def __aenter__(self) -> "UploadIngestor":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+        if exc_type is None:
+            await self.finish()
+        else:
+            self.discard()
+
+    async def open(self) -> None:
+        """打开最终路径准备写入"""
+        os.makedirs(os.path.dirname(self.target_path) or ".", exist_ok=True)
+        self._file = await aiofiles.open(self.target_path, "wb")
+
+    async def close(self) -> None:
+        """关闭写入的文件（可重复调用）"""
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    def bind_params(self, u_id: Optional[int], expected_content_id: Optional[str]) -> None:
+        """
+        写入完成后再提供用户ID和content_id（创建时未提供），finish() 时从文件开头补算content_id
+
+        Args:
+            u_id: 用户ID
+            expected_content_id: 客户端提供的content_id
+        """
+        self.u_id = u_id
+        self.expected_content_id = expected_content_id
+
+    async def finish(self) -> None:
+        """
+        写入完成后的校验，失败时删除已写入的文件
+
+        Raises:
+            UploadRejectedError: 校验失败
+        """
+        try:
+            await self._check_complete()
+        except Exception:
+            self.discard()
+            raise
+
+    async def write(self, chunk: bytes) -> None:
+        """
+        写入一段数据，同时更新哈希、文件头和大小
+
+        Args:
+            chunk: 数据块
+
+        Raises:
+            UploadRejectedError: 文件超过大小上限
+        """
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_size_bytes:
+            raise UploadRejectedError(ERROR_FILE_TOO_LARGE)
+        if len(self.header) < HEADER_SIZE:
+            self.header += chunk[:HEADER_SIZE - len(self.header)]
+            if len(self.header) >= HEADER_SIZE:
+                self._validate_header()
+        if self._hasher:
+            self._hasher.update(chunk)
+        self._sha256.update(chunk)
+        await self._file.write(chunk)
+
+    async def write_stream(self, stream: AsyncIterator[bytes]) -> None:
+        """
+        写入整个数据流
+
+        Args:
+            stream: 异步字节流，例如 request.stream()
+        """
+        async for chunk in stream:
+            await self.write(chunk)
+
+    async def write_upload_file(self, file: UploadFile) -> None:
+        """
+        分块读取FastAPI上传文件并写入
+
+        Args:
+            file: 上传的文件对象
+        """
+        # 已知大小时提前拒绝，避免无谓的读写
+        if file.size is not None and file.size > self.max_size_bytes:
+            raise UploadRejectedError(ERROR_FILE_TOO_LARGE)
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await self.write(chunk)
+
+    async def adopt_file(self, source_path: str) -> None:
+        """
+        接管磁盘上已写好的完整文件（例如断点续传拼接完成的文件），不需要进入上下文
+
+        文件被移动到最终路径后顺序读取一遍以补做哈希和文件头识别，校验规则与流式写入一致。
+
+        Args:
+            source_path: 已完整写入的文件路径
+
+        Raises:
+            UploadRejectedError: 校验失败，文件会被删除
+        """
+        self.size = os.path.getsize(source_path)
+        os.replace(source_path, self.target_path)
+        try:
+            if self.size > self.max_size_bytes:
+                raise UploadRejectedError(ERROR_FILE_TOO_LARGE)
+            async with aiofiles.open(self.target_path, "rb") as f:
+                while True:
+                    chunk = await f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if not self.header:
+                        self.header = chunk[:HEADER_SIZE]
+                    if self._hasher:
+                        self._hasher.update(chunk)
+                    self._sha256.update(chunk)
+            await self._check_complete()
+        except Exception:
+            self.discard()
+            raise
+
+    def discard(self) -> None:
+        """删除已写入的文件"""
+        try:
+            if os.path.exists(self.target_path):
+                os.remove(self.target_path)
+        except OSError as e:
+            logger.error(f"删除未通过校验的上传文件失败 {self.target_path}: {str(e)}")
+
+    def _validate_header(self) -> None:
+        """
+        调用文件头校验函数（只调用一次）
+
+        Raises:
+            UploadRejectedError: 文件头校验失败
+        """
+        validator, self._header_validator = self._header_validator, None
+        if validator and not validator(self.header):
+            raise UploadRejectedError(ERROR_INVALID_FILE_FORMAT)
+
+    async def _hash_content_id(self) -> None:
+        """从已写入的文件开头补算content_id（只读取 CONTENT_ID_MAX_SAMPLE_SIZE 字节）"""
+        self._hasher = ContentIdHasher(self.u_id)
+        async with aiofiles.open(self.target_path, "rb") as f:
+            self._hasher.update(await f.read(settings.CONTENT_ID_MAX_SAMPLE_SIZE))
+
+    async def _check_complete(self) -> None:
+        """
+        写入完成后的校验：文件头、大小下限、content_id和音频文件头探测（探测在线程池中执行）
+
+        Raises:
+            UploadRejectedError: 校验失败
+        """
+        self._validate_header()
+        if self.size < self.min_size_bytes:
+            logger.error(f"文件太小: {self.size} 字节")
+            raise UploadRejectedError(ERROR_FILE_TOO_SMALL)
+        if self._hasher is None and self.u_id is not None:
+            await self._hash_content_id()
+        if self.expected_content_id and self._hasher and settings.CONTENT_ID_VERIFICATION_ENABLED:
+            if not match_content_id(self.content_id, self.expected_content_id):
+                logger.error(f"内容验证失败: {self.expected_content_id}")
+                raise UploadRejectedError(ERROR_PROCESSING_FAILED, "内容验证失败")
+        if self._probe_audio:
+            try:
+                self.audio_info = await run_in_threadpool(probe_audio_file, self.target_path)
+            except AudioProbeError as e:
+                logger.error(f"音频文件探测失败 {self.target_path}: {str(e)}")
+                raise UploadRejectedError(ERROR_INVALID_FILE_FORMAT)
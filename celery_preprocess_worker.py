@@ -0,0 +1,37 @@
+"""
+Celery 音频预处理Worker启动脚本
+
+只消费预处理队列，在CPU上把上传文件预解码为16kHz PCM，不加载转写模型。
+使用threads池：解码工作在ffmpeg子进程或ECM解码进程池中进行（prefork的子进程不能再创建进程池），
+长ECM录音按段分发到 ECM_DECODE_WORKERS 个进程并行解码。
+
+使用方式:
+    python celery_preprocess_worker.py
+"""
+import logging
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.utils.logging_config import setup_logging
+
+if __name__ == "__main__":
+    # 设置日志
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    concurrency = settings.PREPROCESS_WORKER_CONCURRENCY
+    logger.info(f"启动预处理Worker，队列：{settings.PREPROCESS_QUEUE}，并发数：{concurrency}")
+
+    try:
+        celery_app.worker_main([
+            "worker",
+            "--loglevel=info",
+            "-P", "threads",
+            "-Q", settings.PREPROCESS_QUEUE,
+            "-n", "preprocess@%h",
+            "--concurrency", str(concurrency),
+            "--time-limit", str(settings.CELERY_TASK_TIME_LIMIT),
+            "--without-gossip",
+            "--without-mingle"
+        ])
+    except Exception as e:
+        logger.error(f"预处理Worker启动失败: {str(e)}")
@@ -14,6 +14,7 @@ from app.core.celery import celery_app
 from app.core.config import settings
 from app.utils.logging_config import setup_logging
 from app.dependencies.services import get_worker_transcription_service
+from app.services.admission_service import start_worker_heartbeat
 
 
 # 设置资源限制
@@ -91,6 +92,9 @@ if __name__ == "__main__":
         
         logger.info(f"启动Celery Worker，并发数：{concurrency}，任务超时时间：{time_limit}秒，每个子进程最大任务数：{max_tasks_per_child}")
 
+        # 定期上报心跳和并发数，API据此估计排队时间
+        start_worker_heartbeat(concurrency)
+
         # 启动Worker
         celery_app.worker_main([
             "worker",
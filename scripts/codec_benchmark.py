@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Redis值编解码基准测试
+
+对典型任务记录和最坏情况的记录（长文件名、较多参数、带完整转写结果的旧记录）分别测试
+各种编码/压缩组合的编码耗时、解码耗时和存储字节数，以及任务哈希字段（状态查询路径）的编解码耗时。
+未安装的库（orjson、msgpack、zstandard）对应的组合会被跳过。不需要连接Redis。
+
+使用方式:
+    python scripts/codec_benchmark.py --iterations 2000 --segments 3000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import redis_codec
+from app.utils.redis_codec import RecordCodec
+from app.services.task_store import decode_task_fields, encode_task_fields
+
+
+def build_task(uni_key: str) -> Dict[str, Any]:
+    """典型的任务记录（与 TranscriptionService.build_task 字段一致）"""
+    return {
+        "task_id": f"UID:1_{uni_key}",
+        "uni_key": uni_key,
+        "client_id": "1",
+        "status": "completed",
+        "filename": "会议记录.mp3",
+        "file_path": f"/uploads/{uni_key}.mp3",
+        "file_size": 20485760,
+        "result_path": f"/transcriptions/{uni_key}.json",
+        "language": "zh",
+        "created_at": datetime.now().isoformat(),
+        "started_at": datetime.now().isoformat(),
+        "completed_at": datetime.now().isoformat(),
+        "progress": 100,
+        "progress_message": "处理完成",
+        "error_message": None,
+        "audio_duration": 1800.0,
+        "codec": "mp3",
+        "sample_rate": 44100,
+        "channels": 2,
+        "pcm_path": None,
+        "processing_time": 123.4,
+        "extra_params": {
+            "u_id": 1, "record_file_name": "会议记录.mp3", "task_id": f"UID:1_{uni_key}", "mode_id": 1,
+            "language": "zh", "ai_mode": None, "speaker": True, "whisper_arch": "large-v3-turbo",
+            "content_id": None, "server_id": None, "duration": 1800.0,
+            "total_gpu_memory": 24576.0, "free_gpu_memory": 8192.0, "concurrency": 2
+        },
+        "code": 0,
+        "message": "",
+        "retry_count": 0,
+        "jwt_token": "eyJhbGciOiJIUzI1NiJ9." + "x" * 200,
+        "content_hash": "0" * 64,
+        "cached_from": None,
+        "batch_id": None,
+        "item_webhook": True,
+        "claimed_by": "0b7f3c5e-6d1a-4a8e-9f57-3c2d1e0a9b88",
+        "version": 24,
+        "result_summary": {"segments": 420, "characters": 18000, "speakers": 2, "language": "zh"}
+    }
+
+
+def build_worst_case(uni_key: str, segments: int) -> Dict[str, Any]:
+    """最坏情况：长文件名、较多参数，并带有完整转写结果（旧记录中曾保存在任务里）"""
+    data = build_task(uni_key)
+    filename = "二〇二四年度第三季度全体员工大会暨产品发布会现场录音（完整版）" * 4 + ".m4a"
+    data["filename"] = filename
+    data["extra_params"]["record_file_name"] = filename
+    data["extra_params"].update({f"custom_param_{i}": f"value-{i}" * 4 for i in range(20)})
+    data["error_message"] = "CUDA out of memory. Tried to allocate 2.00 GiB " * 10
+    data["result"] = {
+        "language": "zh",
+        "segments": [
+            {
+                "start": round(i * 2.4, 3),
+                "end": round(i * 2.4 + 2.2, 3),
+                "text": "这是一段用于测试的转写文本，内容大致与真实会议记录的长度相当。",
+                "speaker": f"SPEAKER_{i % 3:02d}"
+            }
+            for i in range(segments)
+        ]
+    }
+    return data
+
+
+def build_codecs() -> List[Tuple[str, Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    """待测试的编码方式：(名称, 编码函数, 解码函数)"""
+    codecs = [(
+        "json(旧格式)",
+        lambda value: json.dumps(value, ensure_ascii=False).encode("utf-8"),
+        json.loads
+    )]
+    combinations = [("json", "none"), ("json", "zlib"), ("json", "zstd"),
+                    ("msgpack", "none"), ("msgpack", "zlib"), ("msgpack", "zstd")]
+    for codec, compression in combinations:
+        if codec == "msgpack" and redis_codec.msgpack is None:
+            continue
+        if compression == "zstd" and redis_codec.zstandard is None:
+            continue
+        record_codec = RecordCodec(codec=codec, compression=compression, compress_threshold=1024)
+        name = codec + ("" if compression == "none" else f"+{compression}")
+        if codec == "json" and redis_codec.orjson is not None:
+            name = "orjson" + name[4:]
+        codecs.append((name, record_codec.encode, record_codec.decode))
+    return codecs
+
+
+def timeit(func: Callable[[], Any], iterations: int) -> float:
+    """平均每次调用的耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_records(name: str, data: Dict[str, Any], iterations: int) -> None:
+    print(f"\n== {name} ==")
+    print(f"{'编码方式':<20}{'字节数':>10}{'编码(us)':>12}{'解码(us)':>12}")
+    for codec_name, encode, decode in build_codecs():
+        encoded = encode(data)
+        assert decode(encoded) == data
+        encode_us = timeit(lambda: encode(data), iterations)
+        decode_us = timeit(lambda: decode(encoded), iterations)
+        print(f"{codec_name:<20}{len(encoded):>10}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+def bench_hash_fields(data: Dict[str, Any], iterations: int) -> None:
+    """任务哈希字段：每个字段单独JSON编码，对比标准库json与当前实现（有orjson时使用orjson）"""
+    print("\n== 任务哈希字段（HGETALL解码，即状态查询路径） ==")
+    print(f"{'实现':<20}{'字节数':>10}{'编码(us)':>12}{'解码(us)':>12}")
+
+    def stdlib_encode():
+        fields = {}
+        for name, value in data.items():
+            if name == "extra_params":
+                for sub_name, sub_value in value.items():
+                    fields[f"{name}.{sub_name}"] = json.dumps(sub_value, ensure_ascii=False).encode("utf-8")
+            else:
+                fields[name] = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        return fields
+
+    def stdlib_decode(raw):
+        result: Dict[str, Any] = {}
+        for key, value in raw.items():
+            name, dot, sub_name = key.decode().partition(".")
+            if dot:
+                result.setdefault(name, {})[sub_name] = json.loads(value)
+            else:
+                result[name] = json.loads(value)
+        return result
+
+    def current_encode():
+        return {name: value if isinstance(value, bytes) else value.encode("utf-8")
+                for name, value in encode_task_fields(data).items()}
+
+    implementations = [
+        ("json", stdlib_encode, stdlib_decode),
+        ("orjson" if redis_codec.orjson is not None else "json(当前)", current_encode, decode_task_fields)
+    ]
+    for name, encode, decode in implementations:
+        raw = {key.encode(): value for key, value in encode().items()}
+        assert decode(raw) == data
+        size = sum(len(key) + len(value) for key, value in raw.items())
+        encode_us = timeit(encode, iterations)
+        decode_us = timeit(lambda: decode(raw), iterations)
+        print(f"{name:<20}{size:>10}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis值编解码基准测试")
+    parser.add_argument("--iterations", type=int, default=2000, help="每项测试的重复次数")
+    parser.add_argument("--segments", type=int, default=3000, help="最坏情况记录中的转写分段数")
+    args = parser.parse_args()
+
+    print(f"orjson: {'有' if redis_codec.orjson else '无'}  msgpack: {'有' if redis_codec.msgpack else '无'}  "
+          f"zstandard: {'有' if redis_codec.zstandard else '无'}")
+    typical = build_task("bench_typical")
+    bench_records("典型任务记录", typical, args.iterations)
+    bench_records(f"最坏情况（{args.segments}个转写分段）", build_worst_case("bench_worst", args.segments),
+                  max(args.iterations // 100, 10))
+    bench_hash_fields(typical, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+ECM分段并行解码基准测试
+
+对同一个ECM文件分别用顺序解码和不同进程数的分段并行解码生成PCM，输出吞吐量（帧/秒）、
+相对顺序解码的加速比，以及与顺序解码结果的最大绝对误差（用于确认预热帧数足够）。
+
+使用方式:
+    python scripts/ecm_decode_benchmark.py recording.ecm --workers 1,2,4,8 --repeat 3
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.utils.ecm_decoder import ECM_FRAME_SAMPLES, ecm_to_pcm
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def run_decode(input_path: str, output_path: str, repeat: int, executor=None) -> float:
+    """重复解码，返回最快一次的耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ecm_to_pcm(input_path, output_path, executor=executor)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ECM分段并行解码基准测试")
+    parser.add_argument("input", help="ECM文件路径")
+    parser.add_argument("--workers", default="1,2,4,8", help="进程数列表，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每种配置重复次数（取最快一次）")
+    parser.add_argument("--warmup-frames", type=int, default=settings.ECM_DECODE_WARMUP_FRAMES, help="每段预热帧数")
+    args = parser.parse_args()
+
+    # 基准测试中总是分段并行
+    settings.ECM_PARALLEL_MIN_FRAMES = 0
+    settings.ECM_DECODE_WARMUP_FRAMES = args.warmup_frames
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference_path = os.path.join(tmp_dir, "sequential.pcm")
+        sequential_time = run_decode(args.input, reference_path, args.repeat)
+        reference = np.fromfile(reference_path, dtype=np.float32)
+        frames = len(reference) // ECM_FRAME_SAMPLES
+        logger.info(f"CPU核数: {os.cpu_count()}, 帧数: {frames}, 时长: {frames / 50:.1f}秒, 预热帧数: {args.warmup_frames}")
+        logger.info(f"{'模式':<10}{'耗时(秒)':>10}{'帧/秒':>12}{'加速比':>8}{'最大误差':>12}")
+        logger.info(f"{'顺序':<10}{sequential_time:>10.3f}{frames / sequential_time:>12.0f}{1.0:>8.2f}{0.0:>12.2e}")
+
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            settings.ECM_DECODE_WORKERS = workers
+            output_path = os.path.join(tmp_dir, f"parallel_{workers}.pcm")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # 先提交一个空任务启动子进程，不计入耗时
+                executor.submit(int).result()
+                elapsed = run_decode(args.input, output_path, args.repeat, executor=executor)
+            result = np.fromfile(output_path, dtype=np.float32)
+            if result.shape != reference.shape:
+                logger.error(f"{workers}进程: 输出长度不一致 {result.shape} != {reference.shape}")
+                continue
+            max_diff = float(np.max(np.abs(result - reference))) if len(result) else 0.0
+            logger.info(
+                f"{str(workers) + '进程':<10}{elapsed:>10.3f}{frames / elapsed:>12.0f}"
+                f"{sequential_time / elapsed:>8.2f}{max_diff:>12.2e}"
+            )
+
+
+if __name__ == "__main__":
+    main()
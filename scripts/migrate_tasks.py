@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+把Redis中的任务记录升级到当前格式版本
+
+按 app/services/task_migrations.py 中的版本化转换（时间戳转为ISO格式、补全 whisper_arch、删除旧的 result 字段等）
+升级所有任务记录。用SCAN遍历，按批通过pipeline读取和带版本检查地写回，多个线程并行处理，不会像KEYS一样阻塞Redis；
+中断后重新运行会从检查点继续。未迁移的记录在被读取时也会自动升级，本脚本用于一次性处理长期不被读取的记录。
+
+使用方式:
+    python scripts/migrate_tasks.py --dry-run
+    python scripts/migrate_tasks.py --workers 4 --batch-size 500 --max-rate 5000
+"""
+import sys
+import json
+import logging
+import argparse
+
+from app.services.task_migration_runner import TaskMigrationRunner
+from app.services.task_migrations import CURRENT_SCHEMA_VERSION, MIGRATIONS
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="升级Redis中的任务记录格式")
+    parser.add_argument("--dry-run", action="store_true", help="只统计需要升级的记录，不写入")
+    parser.add_argument("--batch-size", type=int, default=500, help="每次SCAN的COUNT（每批的大致键数）")
+    parser.add_argument("--workers", type=int, default=4, help="并行处理批次的线程数")
+    parser.add_argument("--max-rate", type=float, default=0, help="每秒最多扫描的键数，0表示不限制")
+    parser.add_argument("--checkpoint", default="migrate_tasks.checkpoint.json", help="检查点文件路径")
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有的检查点，从头开始")
+    parser.add_argument("--report-interval", type=float, default=10, help="输出进度的间隔（秒）")
+    parser.add_argument("--list", action="store_true", help="列出所有转换后退出")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        for migration in MIGRATIONS:
+            print(f"{migration.version}\t{migration.name}\t{migration.transform.__doc__ or ''}")
+        print(f"当前格式版本: {CURRENT_SCHEMA_VERSION}")
+        return
+
+    try:
+        runner = TaskMigrationRunner(
+            batch_size=args.batch_size,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            checkpoint_path=args.checkpoint,
+            max_rate=args.max_rate,
+            report_interval=args.report_interval
+        )
+        report = runner.run(resume=not args.no_resume)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if report["failed"] or report["conflicts"]:
+            sys.exit(2)
+    except KeyboardInterrupt:
+        logger.warning("迁移已中断，重新运行将从检查点继续")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"迁移过程中发生错误: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+重建任务列表的二级索引
+
+首次部署索引、或索引更新失败后运行：清空 task_index:* 后用SCAN遍历所有任务，按批通过pipeline写入索引。
+重建期间新建的任务会同时写入索引，不会丢失。
+"""
+import logging
+import sys
+from typing import List
+
+from app.services.task_index import get_task_index
+from app.services.task_store import RedisTaskStore
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def rebuild_task_index():
+    """清空并重建任务索引"""
+    try:
+        store = RedisTaskStore()
+        index = get_task_index()
+
+        stale = list(index.storage.scan_keys("*"))
+        if stale:
+            index.storage.redis.delete(*[index.storage.get_full_key(key) for key in stale])
+            logger.info(f"已清空 {len(stale)} 个旧索引")
+
+        indexed = 0
+        skipped = 0
+        batch: List[str] = []
+
+        def flush():
+            nonlocal indexed, skipped
+            entries = []
+            for uni_key, task_data in zip(batch, store.load_many(batch)):
+                # 跳过非任务数据
+                if not isinstance(task_data, dict) or not task_data.get('created_at'):
+                    skipped += 1
+                    continue
+                entries.append((uni_key, task_data['created_at'], task_data.get('client_id'), task_data.get('status')))
+            index.add_many(entries)
+            indexed += len(entries)
+            batch.clear()
+
+        for uni_key in store.storage.scan_keys("*", count=BATCH_SIZE):
+            batch.append(uni_key)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+                logger.info(f"已索引 {indexed} 个任务")
+        if batch:
+            flush()
+
+        logger.info(f"重建完成！索引: {indexed}, 跳过: {skipped}")
+
+    except Exception as e:
+        logger.error(f"重建索引时发生错误: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    rebuild_task_index()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+任务存储基准测试：JSON读改写 与 哈希字段更新 的对比
+
+按一个任务的典型生命周期（创建、开始处理、若干次进度更新、完成）分别执行：
+  - json: 旧的存储方式，每次更新 GET 整个JSON、合并后 SET 回去
+  - hash: TaskStore，每次更新只写入变化的字段
+输出每种状态变化平均的发送字节数、接收字节数和网络往返次数。
+发送字节数和往返次数在客户端统计，接收字节数取自服务端 INFO stats 的 total_net_output_bytes。
+需要连接真实的Redis（使用 .env 中的 REDIS_* 配置），测试数据在结束时删除。
+
+使用方式:
+    python scripts/task_store_benchmark.py --tasks 200 --progress-updates 20
+"""
+import os
+import sys
+import uuid
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from redis.connection import Connection
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.redis_service import RedisService
+from app.services.task_store import RedisTaskStore
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+_stats = {"round_trips": 0, "bytes_sent": 0}
+_original_send = Connection.send_packed_command
+
+
+def _counting_send(self, command, check_health=True):
+    """统计往返次数（pipeline一次发送算一次）和发送字节数"""
+    _stats["round_trips"] += 1
+    chunks = command if isinstance(command, (list, tuple)) else [command]
+    _stats["bytes_sent"] += sum(len(chunk) for chunk in chunks)
+    return _original_send(self, command, check_health)
+
+
+Connection.send_packed_command = _counting_send
+
+
+def build_task(uni_key: str) -> Dict[str, Any]:
+    """构造与 TranscriptionService.build_task 字段一致的任务数据"""
+    return {
+        "task_id": f"UID:1_{uni_key}",
+        "uni_key": uni_key,
+        "client_id": "1",
+        "status": "pending",
+        "filename": "会议记录.mp3",
+        "file_path": f"/uploads/{uni_key}.mp3",
+        "file_size": 20485760,
+        "result_path": f"/transcriptions/{uni_key}.json",
+        "language": "zh",
+        "created_at": datetime.now().isoformat(),
+        "started_at": None,
+        "completed_at": None,
+        "progress": 0,
+        "progress_message": None,
+        "error_message": None,
+        "audio_duration": 1800.0,
+        "codec": "mp3",
+        "sample_rate": 44100,
+        "channels": 2,
+        "pcm_path": None,
+        "processing_time": None,
+        "extra_params": {
+            "u_id": 1, "record_file_name": "会议记录.mp3", "task_id": f"UID:1_{uni_key}", "mode_id": 1,
+            "language": "zh", "ai_mode": None, "speaker": True, "whisper_arch": "large-v3-turbo",
+            "content_id": None, "server_id": None, "duration": 1800.0,
+            "total_gpu_memory": None, "free_gpu_memory": None, "concurrency": None
+        },
+        "code": 0,
+        "message": "",
+        "retry_count": 0,
+        "jwt_token": "eyJhbGciOiJIUzI1NiJ9." + "x" * 200,
+        "content_hash": "0" * 64,
+        "cached_from": None,
+        "batch_id": None,
+        "item_webhook": True
+    }
+
+
+def build_transitions(progress_updates: int) -> List[tuple]:
+    """一个任务生命周期中的状态变化：(名称, 更新字段)"""
+    transitions = [("processing", {"status": "processing", "started_at": datetime.now().isoformat()})]
+    for i in range(progress_updates):
+        progress = int((i + 1) * 100 / (progress_updates + 1))
+        transitions.append(("progress", {"progress": progress, "progress_message": f"转写中 {progress}%"}))
+    transitions.append(("completed", {
+        "status": "completed",
+        "result_summary": {"segments": 420, "characters": 18000, "speakers": 2, "language": "zh"},
+        "completed_at": datetime.now().isoformat(),
+        "processing_time": 123.4,
+        "progress": 100,
+        "progress_message": "处理完成",
+        "extra_params": {"total_gpu_memory": 24576.0, "free_gpu_memory": 8192.0, "concurrency": 2}
+    }))
+    return transitions
+
+
+def json_create(client, data: Dict[str, Any]) -> None:
+    client.save(data["uni_key"], data)
+
+
+def json_update(client, uni_key: str, updates: Dict[str, Any]) -> None:
+    """旧的 update_task：读取整个JSON，合并后写回"""
+    task_data = client.get(uni_key)
+    updates = dict(updates)
+    if "extra_params" in updates:
+        task_data["extra_params"].update(updates.pop("extra_params"))
+    task_data.update(updates)
+    client.save(uni_key, task_data)
+
+
+def hash_create(store, data: Dict[str, Any]) -> None:
+    store.save(data)
+
+
+def hash_update(store, uni_key: str, updates: Dict[str, Any]) -> None:
+    store.update(uni_key, updates)
+
+
+def net_output_bytes(redis) -> int:
+    return int(redis.info("stats").get("total_net_output_bytes", 0))
+
+
+def measure(redis, operation: Callable[[], None]) -> Dict[str, int]:
+    """执行操作并统计发送字节、接收字节和往返次数（扣除统计用的INFO命令本身）"""
+    before = net_output_bytes(redis)
+    info_overhead = net_output_bytes(redis) - before
+    start = net_output_bytes(redis)
+    _stats["round_trips"] = 0
+    _stats["bytes_sent"] = 0
+    operation()
+    round_trips, bytes_sent = _stats["round_trips"], _stats["bytes_sent"]
+    received = net_output_bytes(redis) - start - info_overhead
+    return {"round_trips": round_trips, "bytes_sent": bytes_sent, "bytes_received": max(received, 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务存储基准测试：JSON读改写 vs 哈希字段更新")
+    parser.add_argument("--tasks", type=int, default=200, help="模拟的任务数")
+    parser.add_argument("--progress-updates", type=int, default=20, help="每个任务的进度更新次数")
+    args = parser.parse_args()
+
+    json_client = RedisService().get_client(prefix="transcription:")
+    store = RedisTaskStore()
+    redis = store.redis
+    transitions = build_transitions(args.progress_updates)
+    # 预先加载Lua脚本，避免第一次调用的SCRIPT LOAD计入统计
+    store.update(f"bench_{uuid.uuid4()}", {"progress": 0})
+
+    modes = {
+        "json": (json_client, json_create, json_update),
+        "hash": (store, hash_create, hash_update)
+    }
+    keys = []
+    try:
+        print(f"{'方式':<6}{'状态变化':<12}{'次数':>8}{'发送字节/次':>14}{'接收字节/次':>14}{'往返/次':>10}")
+        for mode, (client, create, update) in modes.items():
+            totals: Dict[str, Dict[str, int]] = {}
+
+            def record(name, result):
+                total = totals.setdefault(name, {"count": 0, "round_trips": 0, "bytes_sent": 0, "bytes_received": 0})
+                total["count"] += 1
+                for field in ("round_trips", "bytes_sent", "bytes_received"):
+                    total[field] += result[field]
+
+            for _ in range(args.tasks):
+                uni_key = f"bench_{uuid.uuid4()}"
+                keys.append(uni_key)
+                data = build_task(uni_key)
+                record("create", measure(redis, lambda: create(client, data)))
+                for name, updates in transitions:
+                    record(name, measure(redis, lambda: update(client, uni_key, updates)))
+
+            for name, total in totals.items():
+                count = total["count"]
+                print(
+                    f"{mode:<6}{name:<12}{count:>8}{total['bytes_sent'] / count:>14.0f}"
+                    f"{total['bytes_received'] / count:>14.0f}{total['round_trips'] / count:>10.1f}"
+                )
+    finally:
+        for i in range(0, len(keys), 500):
+            redis.delete(*[store.storage.get_full_key(key) for key in keys[i:i + 500]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+任务存储热点路径基准测试
+
+按API和worker的实际调用顺序执行任务的生命周期：创建（save）、认领（transition）、若干次进度更新
+（带owner的transition）、完成（transition并设置过期时间），期间穿插状态查询（load并解析为 TranscriptionTask）。
+多个线程并发执行（模拟多个Celery worker线程和API线程），结束后输出每个存储操作的延迟分位数和错误次数。
+
+--backend memory 使用进程内存储，不需要Redis，可以单独衡量编解码和业务逻辑的开销；
+--backend redis 使用 .env 中的 REDIS_* 配置，测试数据在结束时删除。
+
+使用方式:
+    python scripts/task_store_hotpath_benchmark.py --backend memory --tasks 2000 --threads 4
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime
+from typing import List
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="任务存储热点路径基准测试")
+    parser.add_argument("--backend", choices=("memory", "redis"), default="memory", help="任务存储后端")
+    parser.add_argument("--tasks", type=int, default=2000, help="模拟的任务数")
+    parser.add_argument("--threads", type=int, default=4, help="并发线程数")
+    parser.add_argument("--progress-updates", type=int, default=10, help="每个任务的进度更新次数")
+    parser.add_argument("--polls", type=int, default=20, help="每个任务的状态查询次数")
+    return parser.parse_args()
+
+
+args = parse_args()
+# 必须在导入配置之前设置
+os.environ["TASK_STORE_BACKEND"] = args.backend
+os.environ["STORE_METRICS_FLUSH_SECONDS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.transcription import TranscriptionTask, TranscriptionExtraParams
+from app.services.store_metrics import get_store_metrics
+from app.services.task_store import get_task_store
+
+
+def build_task(uni_key: str) -> dict:
+    """构造与 TranscriptionService.build_task 一致的任务数据"""
+    return TranscriptionTask(
+        task_id=f"UID:1_{uni_key}",
+        uni_key=uni_key,
+        client_id="1",
+        status="pending",
+        filename="会议记录.mp3",
+        file_path=f"/uploads/{uni_key}.mp3",
+        file_size=20485760,
+        result_path=f"/transcriptions/{uni_key}.json",
+        language="zh",
+        created_at=datetime.now().isoformat(),
+        audio_duration=1800.0,
+        extra_params=TranscriptionExtraParams(
+            u_id=1, record_file_name="会议记录.mp3", task_id=f"UID:1_{uni_key}", mode_id=1,
+            language="zh", speaker=True, whisper_arch="large-v3-turbo", duration=1800.0
+        ),
+        jwt_token="eyJhbGciOiJIUzI1NiJ9." + "x" * 200,
+        content_hash="0" * 64
+    ).model_dump()
+
+
+def run_lifecycle(store, uni_key: str, progress_updates: int, polls: int) -> None:
+    """一个任务的完整生命周期，状态查询均匀穿插在各个阶段之间"""
+    owner = str(uuid.uuid4())
+    steps = []
+    steps.append(lambda: store.save(build_task(uni_key)))
+    steps.append(lambda: store.transition(
+        uni_key, ("pending", "failed", "processing"),
+        {"status": "processing", "claimed_by": owner, "started_at": datetime.now().isoformat()},
+        owner=owner, ttl=-1
+    ))
+    for i in range(progress_updates):
+        progress = int((i + 1) * 100 / (progress_updates + 1))
+        steps.append(lambda progress=progress: store.update_progress(
+            uni_key, progress, f"转写中 {progress}%", owner=owner
+        ))
+    steps.append(lambda: store.transition(
+        uni_key, ("processing",),
+        {
+            "status": "completed", "progress": 100, "progress_message": "处理完成",
+            "completed_at": datetime.now().isoformat(), "processing_time": 123.4,
+            "result_summary": {"segments": 420, "characters": 18000, "speakers": 2, "language": "zh"}
+        },
+        owner=owner, ttl=3600
+    ))
+
+    def poll():
+        data = store.load(uni_key)
+        if data:
+            TranscriptionTask(**data)
+
+    polls_per_step = polls / len(steps)
+    done = 0.0
+    for step in steps:
+        step()
+        done += polls_per_step
+        while done >= 1:
+            poll()
+            done -= 1
+
+
+def main():
+    store = get_task_store()
+    keys: List[str] = [f"bench_{uuid.uuid4()}" for _ in range(args.tasks)]
+    chunks = [keys[i::args.threads] for i in range(args.threads)]
+
+    def worker(chunk: List[str]):
+        for uni_key in chunk:
+            run_lifecycle(store, uni_key, args.progress_updates, args.polls)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        for uni_key in keys:
+            store.delete(uni_key)
+
+    print(f"后端: {store.name}  任务: {args.tasks}  线程: {args.threads}  耗时: {elapsed:.2f}秒  "
+          f"任务/秒: {args.tasks / elapsed:.1f}")
+    print(f"{'操作':<22}{'次数':>10}{'错误':>8}{'平均(ms)':>10}{'P50(ms)':>10}{'P90(ms)':>10}{'P99(ms)':>10}{'最大(ms)':>10}")
+    for op, stats in get_store_metrics().snapshot().items():
+        if op.endswith(".delete"):
+            continue
+        print(f"{op:<22}{stats['count']:>10}{stats['errors']:>8}{stats['avg_ms']:>10.3f}{stats['p50_ms']:>10}"
+              f"{stats['p90_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+并发上传时任务状态查询的延迟测试
+
+一组用户持续上传音频文件，同时另一组客户端持续轮询 /api/get_task_status，
+统计状态查询的 P50/P90/P99/最大延迟。分别在改动前后的版本上运行，对比状态查询是否被上传请求拖慢。
+--long-poll 秒数 使用长轮询（wait + since_version），对比相同时间内的请求数（RPS）；此时延迟包含等待时间。
+--etag 带上每个任务上一次响应的ETag（If-None-Match），统计304的比例和响应体字节数。
+
+使用方法:
+    python tests/status_latency_test.py --base-url http://localhost:8000 --uploaders 10 --pollers 50 --duration 60
+    python tests/status_latency_test.py --uploaders 0 --pollers 50 --interval 1 --long-poll 20
+    python tests/status_latency_test.py --uploaders 0 --pollers 50 --etag
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import List
+
+import aiohttp
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("status_latency_test")
+
+
+class LatencyStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.not_modified = 0
+        self.body_bytes = 0
+
+    def add(self, latency: float, success: bool):
+        if success:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+    def print_summary(self, name: str, duration: float):
+        if not self.latencies:
+            logger.error(f"{name}: 没有成功的请求 (失败 {self.errors})")
+            return
+        logger.info(
+            f"{name}: 请求 {len(self.latencies)} 失败 {self.errors} RPS {len(self.latencies) / duration:.1f} | "
+            f"P50 {self.percentile(0.5) * 1000:.1f}ms P90 {self.percentile(0.9) * 1000:.1f}ms "
+            f"P99 {self.percentile(0.99) * 1000:.1f}ms 最大 {max(self.latencies) * 1000:.1f}ms"
+        )
+        if self.not_modified or self.body_bytes:
+            logger.info(
+                f"{name}: 304 {self.not_modified} ({self.not_modified / len(self.latencies):.1%})，"
+                f"响应体 {self.body_bytes / len(self.latencies):.0f} 字节/请求"
+            )
+
+
+async def uploader(session: aiohttp.ClientSession, base_url: str, audio_files: List[str],
+                   stats: LatencyStats, end_time: float):
+    """持续上传音频文件"""
+    while time.time() < end_time:
+        audio_file = random.choice(audio_files)
+        filename = os.path.basename(audio_file)
+        extra_params = {
+            "u_id": 123,
+            "record_file_name": filename,
+            "task_id": uuid.uuid4().hex,
+            "mode_id": 10001,
+            "language": "auto",
+            "ai_mode": "GPT-4o",
+            "speaker": False
+        }
+        data = aiohttp.FormData()
+        data.add_field('file', open(audio_file, 'rb'), filename=filename, content_type='audio/mpeg')
+        data.add_field('extra_params', json.dumps(extra_params), content_type='application/json')
+        start = time.time()
+        try:
+            async with session.post(f"{base_url}/api/uploadfile", data=data, timeout=300) as response:
+                await response.read()
+                stats.add(time.time() - start, response.status == 200)
+        except Exception as e:
+            logger.debug(f"上传失败: {e}")
+            stats.add(time.time() - start, False)
+
+
+async def poller(session: aiohttp.ClientSession, base_url: str, uni_keys: List[str],
+                 stats: LatencyStats, end_time: float, interval: float, long_poll: float = 0,
+                 use_etag: bool = False):
+    """持续轮询任务状态（long_poll 大于0时带上已知的版本号长轮询，use_etag 时带上 If-None-Match）"""
+    versions = {}
+    etags = {}
+    while time.time() < end_time:
+        uni_key = random.choice(uni_keys)
+        params = {"uni_key": uni_key}
+        if long_poll and uni_key in versions:
+            params.update(wait=long_poll, since_version=versions[uni_key])
+        headers = {"If-None-Match": etags[uni_key]} if use_etag and uni_key in etags else {}
+        start = time.time()
+        try:
+            async with session.get(
+                f"{base_url}/api/get_task_status", params=params, headers=headers, timeout=30 + long_poll
+            ) as response:
+                content = await response.read()
+                if response.status == 304:
+                    stats.not_modified += 1
+                else:
+                    body = json.loads(content)
+                    if "version" in body:
+                        versions[uni_key] = body["version"]
+                    if "ETag" in response.headers:
+                        etags[uni_key] = response.headers["ETag"]
+                stats.body_bytes += len(content)
+                stats.add(time.time() - start, response.status in (200, 304))
+        except Exception as e:
+            logger.debug(f"状态查询失败: {e}")
+            stats.add(time.time() - start, False)
+        await asyncio.sleep(interval)
+
+
+async def fetch_uni_keys(session: aiohttp.ClientSession, base_url: str) -> List[str]:
+    """从任务列表中取最近的任务用于轮询，没有任务时使用随机的uni_key（同样需要读取Redis）"""
+    try:
+        async with session.get(f"{base_url}/api/tasks", params={"limit": 100}) as response:
+            tasks = await response.json()
+            uni_keys = [task["uni_key"] for task in tasks if task.get("uni_key")]
+    except Exception as e:
+        logger.warning(f"获取任务列表失败: {e}")
+        uni_keys = []
+    return uni_keys or [f"uni_{uuid.uuid4()}" for _ in range(100)]
+
+
+async def run(args, audio_files: List[str]):
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        uni_keys = await fetch_uni_keys(session, args.base_url)
+        logger.info(f"轮询 {len(uni_keys)} 个任务，上传用户 {args.uploaders}，轮询客户端 {args.pollers}，持续 {args.duration}秒")
+        upload_stats, status_stats = LatencyStats(), LatencyStats()
+        start = time.time()
+        end_time = start + args.duration
+        await asyncio.gather(
+            *[uploader(session, args.base_url, audio_files, upload_stats, end_time) for _ in range(args.uploaders)],
+            *[
+                poller(session, args.base_url, uni_keys, status_stats, end_time, args.interval, args.long_poll, args.etag)
+                for _ in range(args.pollers)
+            ]
+        )
+        duration = time.time() - start
+        status_stats.print_summary("状态查询", duration)
+        upload_stats.print_summary("上传", duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发上传时任务状态查询的延迟测试')
+    parser.add_argument('--base-url', type=str, default='http://localhost:8000', help='服务地址')
+    parser.add_argument('--uploaders', type=int, default=10, help='并发上传用户数（0表示只测试轮询）')
+    parser.add_argument('--pollers', type=int, default=50, help='并发轮询客户端数')
+    parser.add_argument('--interval', type=float, default=0.1, help='每个轮询客户端两次查询的间隔(秒)')
+    parser.add_argument('--long-poll', type=float, default=0, help='长轮询的等待时间(秒)，0表示普通轮询')
+    parser.add_argument('--etag', action='store_true', help='带上上一次响应的ETag（If-None-Match）')
+    parser.add_argument('--duration', type=int, default=60, help='测试持续时间(秒)')
+    parser.add_argument('--audio-dir', type=str, default='./uploads', help='音频样本存放目录')
+    args = parser.parse_args()
+
+    audio_files = []
+    if args.uploaders:
+        for ext in ['.mp3', '.wav', '.m4a', '.ogg', '.flac']:
+            audio_files.extend(str(f) for f in Path(args.audio_dir).glob(f"**/*{ext}"))
+        if not audio_files:
+            logger.error(f"在目录 {args.audio_dir} 中未找到音频文件")
+            sys.exit(1)
+
+    asyncio.run(run(args, audio_files))
+
+
+if __name__ == "__main__":
+    main()